@@ -34,22 +34,46 @@ def read_api_key():
         return ""
 
 
+_my_session_id = None
+
+
+def _parent_pid(pid):
+    """Parent of `pid` from /proc/<pid>/stat, or None."""
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # "pid (comm) state ppid ..."; comm may contain spaces and parens, so split after the last ")"
+    fields = stat[stat.rfind(b")") + 2:].split()
+    return int(fields[1]) if len(fields) > 1 else None
+
+
 def find_my_session_id():
-    """Walk the PID tree to find which ACP chat session owns this process."""
+    """Which ACP chat session owns this process, resolved once per MCP server process.
+
+    kiro-cli started for a session carries FERNANDO_SESSION_ID, which its MCP
+    servers inherit. Warm-pool processes are spawned before they have an
+    owner, so without the variable walk up to 5 ancestors via /proc and look
+    each PID up in the session registry. Only a hit is cached: a warm process
+    gets its owner when a chat claims it.
+    """
+    global _my_session_id
+    if _my_session_id:
+        return _my_session_id
     try:
-        with open(os.path.join(PROJECT_ROOT, "data", "acp_pid_map.json")) as f:
-            pid_map = json.load(f)
-        pid = os.getpid()
+        from src.services import session_catalog
+        session_id = os.environ.get(session_catalog.SESSION_ENV)
+        pid = os.getppid()
         for _ in range(5):
-            pid = os.popen(f"ps -o ppid= -p {pid}").read().strip()
-            if not pid:
+            if session_id or not pid or pid <= 1:
                 break
-            session_id = pid_map.get(pid)
-            if session_id:
-                return session_id
+            session_id = session_catalog.session_for_pid(pid)
+            pid = _parent_pid(pid)
     except Exception:
-        pass
-    return None
+        session_id = None
+    _my_session_id = session_id or None
+    return _my_session_id
 
 
 def save_continuation(continuation):
@@ -6,8 +6,8 @@ Tools: create_automation_rule, list_automation_rules, delete_automation_rule
 import _mcp_common  # noqa: F401  (activates venv + sys.path)
 
 import asyncio
-import json
 
+from src.services import json_codec
 from src.services.automation import create_rule, list_rules, delete_rule, load_meta_policy
 from mcp.server import Server
 from mcp.types import Tool, TextContent
@@ -85,7 +85,7 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
         result = {"status": "deleted", "rule_id": arguments["rule_id"]}
     else:
         return [TextContent(type="text", text=f"Unknown tool: {name}")]
-    return [TextContent(type="text", text=json.dumps(result, indent=2))]
+    return [TextContent(type="text", text=json_codec.dumps(result, indent=2))]
 
 
 async def main():
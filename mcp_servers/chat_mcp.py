@@ -12,8 +12,9 @@ import json
 import os
 import subprocess
 import urllib.request
+from datetime import datetime
 
-from src.services import rag
+from src.services import json_codec, rag, session_catalog
 from mcp.server import Server
 from mcp.types import Tool, TextContent
 
@@ -47,6 +48,33 @@ def _set_chat_name(name):
     return {"status": "error", "error": "Could not determine session"}
 
 
+def _session_ids(state):
+    try:
+        return session_catalog.ids(state)
+    except Exception:
+        return set()
+
+
+def _search_filters(arguments):
+    """Translate search_conversations filter arguments into rag.search keyword arguments."""
+    filters = {}
+    session_ids = None
+    if arguments.get("session_id"):
+        session_ids = {arguments["session_id"]}
+    if arguments.get("archived") is not None:
+        archived = _session_ids(session_catalog.ARCHIVED)
+        scoped = archived if arguments["archived"] else _session_ids(session_catalog.ACTIVE)
+        session_ids = scoped if session_ids is None else session_ids & scoped
+    if session_ids is not None:
+        filters["session_ids"] = sorted(session_ids)
+    for key in ("since", "until"):
+        if arguments.get(key):
+            filters[key] = datetime.fromisoformat(arguments[key]).timestamp()
+    if arguments.get("model"):
+        filters["model"] = arguments["model"]
+    return filters
+
+
 @app.list_tools()
 async def list_tools() -> list[Tool]:
     return [
@@ -86,12 +114,23 @@ async def list_tools() -> list[Tool]:
         ),
         Tool(
             name="search_conversations",
-            description="Search past chat conversations using semantic/vector search (RAG). Returns matching snippets with session IDs. Use get_conversation to fetch full context for a specific session.",
+            description="Search past chat conversations (RAG). Hybrid mode (default) combines semantic/vector search with exact keyword matching, so error codes, file names and ticket IDs are found too. Optional filters narrow the search to one session, archived or active chats, a date range, or a model. Returns snippets centered on the match (with match offsets), session IDs and turn timestamps; set context_turns to get the surrounding dialogue in the same call. Use get_conversation to fetch full context for a specific session.",
             inputSchema={
                 "type": "object",
                 "properties": {
                     "query": {"type": "string", "description": "Search query"},
                     "limit": {"type": "integer", "description": "Max results (default 5)"},
+                    "mode": {
+                        "type": "string",
+                        "enum": ["hybrid", "vector", "lexical"],
+                        "description": "hybrid (default), vector (semantic only) or lexical (exact terms only)",
+                    },
+                    "session_id": {"type": "string", "description": "Only search this session"},
+                    "archived": {"type": "boolean", "description": "true: only archived chats; false: only active chats"},
+                    "since": {"type": "string", "description": "Only turns on/after this ISO date or datetime (e.g. 2025-06-01)"},
+                    "until": {"type": "string", "description": "Only turns before this ISO date or datetime"},
+                    "model": {"type": "string", "description": "Only turns answered by this model"},
+                    "context_turns": {"type": "integer", "description": "Include K turns before and after each hit (0-5, default 0)"},
                 },
                 "required": ["query"],
             },
@@ -160,7 +199,12 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
             rel_path = os.path.relpath(cached_path, home)
             result = {"status": "attached", "name": display_name, "path": cached_path, "url_path": rel_path}
     elif name == "search_conversations":
-        result = rag.search(arguments["query"], limit=arguments.get("limit", 5))
+        try:
+            filters = _search_filters(arguments)
+            result = rag.search(arguments["query"], limit=arguments.get("limit", 5), mode=arguments.get("mode", "hybrid"),
+                                context_turns=arguments.get("context_turns", 0), **filters)
+        except ValueError as e:
+            result = {"error": str(e)}
     elif name == "get_conversation":
         conv = rag.get_conversation(arguments["session_id"], offset=arguments.get("offset", 0), limit=arguments.get("limit"))
         result = conv if conv is not None else {"error": "Session history not found"}
@@ -169,7 +213,7 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
         return [TextContent(type="text", text=f"IMPORTANT: To render this canvas, you MUST include the following code block verbatim in your response message (not in a tool call). Copy it exactly:\n\n```html-canvas\n{html}\n```")]
     else:
         return [TextContent(type="text", text=f"Unknown tool: {name}")]
-    return [TextContent(type="text", text=json.dumps(result, indent=2))]
+    return [TextContent(type="text", text=json_codec.dumps(result, indent=2))]
 
 
 async def main():
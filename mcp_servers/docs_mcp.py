@@ -6,8 +6,8 @@ Tools: create_pdf, create_docx
 import _mcp_common  # noqa: F401  (activates venv + sys.path)
 
 import asyncio
-import json
 
+from src.services import json_codec
 from mcp.server import Server
 from mcp.types import Tool, TextContent
 
@@ -58,7 +58,7 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
         result = {"status": "created", "path": out}
     else:
         return [TextContent(type="text", text=f"Unknown tool: {name}")]
-    return [TextContent(type="text", text=json.dumps(result, indent=2))]
+    return [TextContent(type="text", text=json_codec.dumps(result, indent=2))]
 
 
 async def main():
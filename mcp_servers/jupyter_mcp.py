@@ -13,6 +13,7 @@ import urllib.error
 import urllib.parse
 import urllib.request
 
+from src.services import json_codec
 from mcp.server import Server
 from mcp.types import Tool, TextContent
 
@@ -311,7 +312,7 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
         result = _jupyter_cmd("edit_cell", notebook=arguments["notebook"], index=arguments["index"], source=arguments["source"])
     else:
         return [TextContent(type="text", text=f"Unknown tool: {name}")]
-    return [TextContent(type="text", text=json.dumps(result, indent=2))]
+    return [TextContent(type="text", text=json_codec.dumps(result, indent=2))]
 
 
 async def main():
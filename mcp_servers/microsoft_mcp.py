@@ -26,6 +26,7 @@ import mimetypes
 import msal
 import requests
 from datetime import datetime, timezone
+from src.services import json_codec
 from mcp.server import Server
 from mcp.types import Tool, TextContent
 
@@ -1549,7 +1550,7 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
     else:
         result = {"error": f"Unknown tool: {name}"}
 
-    return [TextContent(type="text", text=json.dumps(result, indent=2))]
+    return [TextContent(type="text", text=json_codec.dumps(result, indent=2))]
 
 
 async def main():
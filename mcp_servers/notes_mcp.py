@@ -8,13 +8,13 @@ import _mcp_common  # noqa: F401  (activates venv + sys.path)
 from _mcp_common import PROJECT_ROOT
 
 import asyncio
-import json
 import os
 import sys
 import urllib.error
 import urllib.parse
 import urllib.request
 
+from src.services import json_codec
 from mcp.server import Server
 from mcp.types import Tool, TextContent
 
@@ -241,7 +241,7 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
         result = _notes_search(arguments["notebook"], arguments["query"])
     else:
         return [TextContent(type="text", text=f"Unknown tool: {name}")]
-    return [TextContent(type="text", text=json.dumps(result, indent=2))]
+    return [TextContent(type="text", text=json_codec.dumps(result, indent=2))]
 
 
 async def main():
@@ -10,6 +10,7 @@ import asyncio
 import json
 import urllib.request
 
+from src.services import json_codec
 from src.services.subagent_core import (
     create_workspace,
     resolve_context_path,
@@ -232,7 +233,7 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
         result = terminate_subagent(arguments["task_id"])
     else:
         return [TextContent(type="text", text=f"Unknown tool: {name}")]
-    return [TextContent(type="text", text=json.dumps(result, indent=2))]
+    return [TextContent(type="text", text=json_codec.dumps(result, indent=2))]
 
 
 async def main():
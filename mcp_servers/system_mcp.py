@@ -20,6 +20,7 @@ import subprocess
 import time
 import urllib.request
 
+from src.services import json_codec
 from mcp.server import Server
 from mcp.types import Tool, TextContent
 
@@ -125,6 +126,13 @@ def _grant_authorization(session_id, auth_name):
     return True
 
 
+def _get_json(path):
+    """GET a Flask API endpoint with the API key and parse the JSON reply."""
+    req = urllib.request.Request(f"http://localhost:5000{path}", headers={"X-API-Key": read_api_key()})
+    with urllib.request.urlopen(req, timeout=2) as resp:
+        return json_codec.loads(resp.read())
+
+
 def _health_check():
     """Gather system health info for Fernando."""
     import multiprocessing
@@ -173,6 +181,14 @@ def _health_check():
     except Exception as e:
         health["processes"] = {"error": str(e)}
 
+    # RAG indexer queue and embedding cache (live in the Flask process)
+    try:
+        rag_status = _get_json("/api/rag/status")
+        health["rag_indexer"] = rag_status.get("indexer")
+        health["rag_embedding_cache"] = rag_status.get("embedding_cache")
+    except Exception as e:
+        health["rag_indexer"] = {"error": str(e)}
+
     # Last 50 lines from available logs
     log_files = [
         ("/tmp/fernando-flask.log", "flask"),
@@ -194,39 +210,25 @@ def _health_check():
         except OSError:
             pass
 
-    # Session load times (from current Flask log - read more for this)
+    # Session restore queue and load times (tracked in the Flask process)
     try:
-        load_times = []
-        starts = {}
-        with open("/tmp/fernando-flask.log", "rb") as f:
-            f.seek(0, 2)
-            size = f.tell()
-            read_size = min(size, 500000)
-            f.seek(size - read_size)
-            flask_tail = f.read().decode(errors="replace")
-        for line in flask_tail.splitlines():
-            if "_load_existing: starting for" in line:
-                parts = line.split("starting for ")
-                if len(parts) > 1:
-                    sid = parts[1].split()[0]
-                    ts = line[:23]
-                    starts[sid] = ts
-            elif "_load_existing: session" in line and "ready" in line:
-                parts = line.split("session ")
-                if len(parts) > 1:
-                    sid = parts[1].split()[0]
-                    ts = line[:23]
-                    if sid in starts:
-                        from datetime import datetime
-                        t0 = datetime.strptime(starts[sid], "%Y-%m-%d %H:%M:%S,%f")
-                        t1 = datetime.strptime(ts, "%Y-%m-%d %H:%M:%S,%f")
-                        dur = (t1 - t0).total_seconds()
-                        load_times.append({"session": sid, "seconds": round(dur, 1)})
-        load_times.sort(key=lambda x: x["seconds"], reverse=True)
-        health["session_load_times"] = load_times[:10]
+        restore = _get_json("/api/acp/restore_status")
+        health["session_restore"] = {k: restore.get(k) for k in ("concurrency", "queued", "running", "pending")}
+        health["session_load_times"] = restore.get("sessions", [])[:10]
     except Exception as e:
         health["session_load_times"] = [{"error": str(e)}]
 
+    # Chat latency breakdown: per-model turn timing and JSON-RPC latency by method
+    try:
+        metrics = _get_json("/api/acp/metrics")
+        health["acp_metrics"] = metrics.get("models", {})
+        health["acp_busiest_sessions"] = [
+            {k: m.get(k) for k in ("session", "name", "model", "turns", "retries", "reloads", "last_turn")}
+            for m in metrics.get("sessions", [])[:5]
+        ]
+    except Exception as e:
+        health["acp_metrics"] = {"error": str(e)}
+
     return health
 
 
@@ -342,7 +344,7 @@ async def list_tools() -> list[Tool]:
         ),
         Tool(
             name="health_check",
-            description="Get Fernando's current system health at a glance: load average, CPU count, memory usage, recent errors from Flask log, session load times, and process count summary.",
+            description="Get Fernando's current system health at a glance: load average, CPU count, memory usage, recent errors from Flask log, session load times, per-model chat latency (time to first chunk, turn duration, JSON-RPC latency by method), and process count summary.",
             inputSchema={
                 "type": "object",
                 "properties": {},
@@ -648,7 +650,7 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
         result = _health_check()
     else:
         return [TextContent(type="text", text=f"Unknown tool: {name}")]
-    return [TextContent(type="text", text=json.dumps(result, indent=2))]
+    return [TextContent(type="text", text=json_codec.dumps(result, indent=2))]
 
 
 async def main():
@@ -17,6 +17,7 @@ import secrets
 import urllib.parse
 import urllib.request
 
+from src.services import json_codec
 from mcp.server import Server
 from mcp.types import Tool, TextContent
 
@@ -258,7 +259,7 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
             result = {"error": str(e)}
     else:
         return [TextContent(type="text", text=f"Unknown tool: {name}")]
-    return [TextContent(type="text", text=json.dumps(result, indent=2))]
+    return [TextContent(type="text", text=json_codec.dumps(result, indent=2))]
 
 
 async def main():
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Encode/decode throughput of each installed JSON backend on chat-shaped payloads.
+
+Uses the entries from data/chat_history/*.jsonl when there are any, otherwise a
+synthetic mix of the messages the hot paths carry: ACP session/update
+notifications (small text chunks, tool calls), history entries and the
+occasional large tool result.
+
+Usage: python scripts/bench_json_codec.py [--messages 20000] [--rounds 5]
+"""
+import argparse
+import glob
+import importlib
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.services import json_codec  # noqa: E402
+
+HISTORY_GLOB = os.path.join(os.path.dirname(__file__), "..", "data", "chat_history", "*.jsonl")
+
+
+def _recorded(limit):
+    lines = []
+    for path in sorted(glob.glob(HISTORY_GLOB)):
+        with open(path, "rb") as f:
+            lines.extend(line.rstrip(b"\n") for line in f if line.strip())
+        if len(lines) >= limit:
+            break
+    return [json.loads(line) for line in lines[:limit]]
+
+
+def _synthetic(n, seed=7):
+    rng = random.Random(seed)
+    words = "the a build failed because config file path error retry deploy test cache token überprüfen 完成".split()
+    messages = []
+    for i in range(n):
+        kind = rng.random()
+        if kind < 0.8:
+            update = {"sessionUpdate": "agent_message_chunk",
+                      "content": {"type": "text", "text": " ".join(rng.choices(words, k=rng.randint(1, 12)))}}
+        elif kind < 0.97:
+            update = {"sessionUpdate": "tool_call", "toolCallId": f"tool_{i}", "title": "Reading file",
+                      "kind": "read", "status": "in_progress",
+                      "locations": [{"path": f"/home/user/project/src/module_{i % 50}.py", "line": i % 400}]}
+        else:
+            update = {"sessionUpdate": "tool_call_update", "toolCallId": f"tool_{i}", "status": "completed",
+                      "content": [{"type": "content", "content": {"type": "text",
+                                                                  "text": "\n".join(rng.choices(words, k=20_000))}}]}
+        messages.append({"jsonrpc": "2.0", "method": "session/update",
+                         "params": {"sessionId": f"sess-{i % 8}", "update": update}, "ts": 1_760_000_000 + i})
+    return messages
+
+
+def _backends():
+    found = [("json", lambda o: json.dumps(o).encode(), json.loads)]
+    for name in ("orjson", "ujson"):
+        try:
+            mod = importlib.import_module(name)
+        except ImportError:
+            continue
+        if name == "orjson":
+            found.append((name, mod.dumps, mod.loads))
+        else:
+            found.append((name, lambda o, m=mod: m.dumps(o, ensure_ascii=False).encode(), mod.loads))
+    return found
+
+
+def _best(fn, rounds):
+    times = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    messages = _recorded(args.messages)
+    source = "recorded history"
+    if not messages:
+        messages = _synthetic(args.messages)
+        source = "synthetic"
+    encoded = [json.dumps(m).encode() for m in messages]
+    mb = sum(len(e) for e in encoded) / 1e6
+    print(f"{len(messages)} {source} messages, {mb:.1f} MB; json_codec backend: {json_codec.BACKEND}")
+    print(f"{'backend':<8} {'loads MB/s':>11} {'dumps MB/s':>11} {'loads us/msg':>13} {'dumps us/msg':>13}")
+    for name, dumps, loads in _backends():
+        t_loads = _best(lambda: [loads(e) for e in encoded], args.rounds)
+        t_dumps = _best(lambda: [dumps(m) for m in messages], args.rounds)
+        print(f"{name:<8} {mb / t_loads:>11.0f} {mb / t_dumps:>11.0f} "
+              f"{t_loads / len(messages) * 1e6:>13.2f} {t_dumps / len(messages) * 1e6:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Recall and latency of rag.search modes on a synthetic conversation corpus.
+
+Builds a throwaway Chroma collection and lexical index in a temp dir, then runs
+two query sets against each search mode:
+  - identifier queries: an error code / ticket / file name that appears in exactly one turn
+  - topic queries: a paraphrase of one turn's subject, no shared identifiers
+
+Usage: python scripts/bench_rag_search.py [--sessions 200] [--turns 20] [--hash-embeddings]
+
+--hash-embeddings swaps the default MiniLM model for a bag-of-words hashing
+embedding, for machines without the model download. Vector numbers are then
+only a smoke test.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.services import embedding_cache, lexical_index, rag  # noqa: E402
+
+TOPICS = {
+    "deploy": ("the deployment pipeline failed while rolling out the new release", "release rollout broke in CI"),
+    "db": ("postgres migrations are slow because of a missing index", "database schema change takes forever"),
+    "auth": ("users cannot log in after the oauth token refresh change", "sign-in broken by token renewal"),
+    "css": ("the sidebar layout overflows on narrow mobile screens", "side panel spills over on phones"),
+    "cache": ("redis cache hit rate dropped after the key format change", "cache misses went up with new keys"),
+    "tests": ("the integration tests are flaky on the build server", "CI test suite randomly fails"),
+    "memory": ("the worker process leaks memory when parsing large files", "parser RAM keeps growing"),
+    "api": ("the REST endpoint returns 500 when the payload is empty", "server error on blank request body"),
+}
+FILLER = "please take a look and tell me what you think we should do next about this".split()
+
+
+def _hash_embedding():
+    from chromadb import Documents, EmbeddingFunction, Embeddings
+
+    class HashEmbedding(EmbeddingFunction):
+        def __init__(self):
+            pass
+
+        def __call__(self, input: Documents) -> Embeddings:
+            out = []
+            for doc in input:
+                vec = [0.0] * 256
+                for word in doc.lower().split():
+                    vec[hash(word) % 256] += 1.0
+                norm = sum(v * v for v in vec) ** 0.5 or 1.0
+                out.append([v / norm for v in vec])
+            return out
+
+    return HashEmbedding()
+
+
+def build_corpus(rng, sessions, turns):
+    corpus = {}  # session_id -> history
+    ident_queries, topic_queries = [], []
+    for s in range(sessions):
+        sid = f"bench-{s:05d}"
+        history = []
+        for t in range(turns):
+            topic = rng.choice(list(TOPICS))
+            ident = rng.choice((f"E_{topic.upper()}_{s}_{t}", f"JIRA-{s * 1000 + t}", f"{topic}_{s}_{t}.py"))
+            prompt = f"{TOPICS[topic][0]}, seen as {ident}. " + " ".join(rng.sample(FILLER, 6))
+            history.append({"type": "user_prompt", "text": prompt})
+            history.append({"method": "session/update", "params": {"update": {
+                "sessionUpdate": "agent_message_chunk",
+                "content": {"type": "text", "text": f"Looking into {ident}. " + " ".join(rng.sample(FILLER, 8))}}}})
+            history.append({"result": {"stopReason": "end_turn"}})
+            ident_queries.append((ident, sid))
+            if t == 0:
+                topic_queries.append((TOPICS[topic][1], sid, topic))
+        corpus[sid] = history
+    return corpus, ident_queries, topic_queries
+
+
+def run(queries, mode, limit):
+    found, latencies = 0, []
+    for query, sid, *topic in queries:
+        t0 = time.perf_counter()
+        hits = rag.search(query, limit=limit, mode=mode)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        if topic:
+            # Many sessions share a topic; count a hit on any turn about it
+            found += any(TOPICS[topic[0]][0] in h["snippet"] for h in hits)
+        else:
+            found += any(h["session_id"] == sid for h in hits)
+    latencies.sort()
+    return {
+        "recall": found / len(queries),
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200, help="identifier queries sampled per mode")
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--hash-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        rag.CHROMA_DIR = os.path.join(tmp, "chroma")
+        rag.INDEX_STATE_FILE = os.path.join(tmp, "state.json")
+        lexical_index.DB_PATH = os.path.join(tmp, "lexical.db")
+        embedding_cache.cache = embedding_cache.EmbeddingCache(os.path.join(tmp, "embeddings.db"))
+        if args.hash_embeddings:
+            import chromadb
+            client = chromadb.PersistentClient(path=rag.CHROMA_DIR)
+            rag._client = client
+            rag._embed_fn = _hash_embedding()
+            rag._collection = client.get_or_create_collection(rag.COLLECTION_NAME, embedding_function=rag._embed_fn)
+
+        corpus, ident_queries, topic_queries = build_corpus(rng, args.sessions, args.turns)
+        t0 = time.perf_counter()
+        for sid, history in corpus.items():
+            rag.index_session(sid, sid, history)
+        print(f"Indexed {args.sessions} sessions x {args.turns} turns "
+              f"({lexical_index.count()} chunks) in {time.perf_counter() - t0:.1f}s")
+
+        ident_queries = rng.sample(ident_queries, min(args.queries, len(ident_queries)))
+        print(f"{'mode':8} {'query set':10} {'recall@' + str(args.limit):>9} {'p50 ms':>8} {'p95 ms':>8}")
+        for mode in rag.SEARCH_MODES:
+            for label, queries in (("identifier", ident_queries), ("topic", topic_queries)):
+                r = run(queries, mode, args.limit)
+                print(f"{mode:8} {label:10} {r['recall']:9.2f} {r['p50_ms']:8.1f} {r['p95_ms']:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
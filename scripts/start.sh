@@ -1,7 +1,8 @@
 #!/bin/bash
 
-# Clean up stale Werkzeug environment variables
-unset WERKZEUG_RUN_MAIN WERKZEUG_SERVER_FD
+# Clean up stale Werkzeug environment variables, and the chat session id
+# inherited when mutate.sh restarts the server from inside a chat session
+unset WERKZEUG_RUN_MAIN WERKZEUG_SERVER_FD FERNANDO_SESSION_ID
 
 REPO_DIR="$(cd "$(dirname "$0")/.." && pwd)"
 cd "$REPO_DIR"
@@ -1,15 +1,29 @@
 from flask import Flask
 from flask_socketio import SocketIO
 from src.config import config
+from src.services import json_codec, prometheus, session_catalog
 import os
 
-socketio = SocketIO()
+
+class _CountingSocketIO(SocketIO):
+    """SocketIO that counts emits per event for /metrics."""
+
+    def emit(self, event, *args, **kwargs):
+        prometheus.socketio_emits.inc(event)
+        return super().emit(event, *args, **kwargs)
+
+
+socketio = _CountingSocketIO()
 
 
 def create_app(config_name=None):
     if config_name is None:
         config_name = os.environ.get("FLASK_ENV", "development")
 
+    # Started from inside a chat (mutate.sh): don't pass that session's id on
+    # to every PTY, tmux and command child of the server
+    os.environ.pop(session_catalog.SESSION_ENV, None)
+
     app = Flask(__name__, template_folder="templates", static_folder="static")
     app.config.from_object(config[config_name])
 
@@ -22,6 +36,7 @@ def create_app(config_name=None):
         app,
         cors_allowed_origins=app.config["ALLOWED_ORIGINS"],
         path=os.environ.get("SOCKET_PATH", "socket.io"),
+        json=json_codec,
     )
 
     from src.routes import web, websocket
@@ -56,4 +71,8 @@ def create_app(config_name=None):
             pass
     threading.Thread(target=_cache_models, daemon=True).start()
 
+    # Open ChromaDB and load the embedding model before the first search needs them
+    from src.services import rag
+    threading.Thread(target=rag.warm_up, daemon=True).start()
+
     return app
@@ -9,6 +9,7 @@ import msal
 from src.services.pty_service import pty_service
 from src.services.docker import docker_service
 from src.services.acp import acp_manager
+from src.services import prometheus
 
 bp = Blueprint("web", __name__)
 
@@ -39,6 +40,18 @@ def _auth_page(title, message):
 from src.microsoft_scopes import SCOPES, REDIRECT_URI
 
 
+def _proxy_request(upstream, **kwargs):
+    """requests.request, timed into the /metrics proxy latency histogram for `upstream`."""
+    t0 = time.monotonic()
+    try:
+        return requests.request(**kwargs)
+    except Exception:
+        prometheus.proxy_errors.inc(upstream)
+        raise
+    finally:
+        prometheus.proxy_latency.observe(upstream, time.monotonic() - t0)
+
+
 @bp.route("/")
 def index():
     sessions = pty_service.list_sessions()
@@ -145,6 +158,40 @@ def api_rename_chat():
     return json.dumps({"ok": True}), 200, {"Content-Type": "application/json"}
 
 
+@bp.route("/api/rag/status")
+def api_rag_status():
+    """Background RAG indexer queue depth and counters, and embedding cache hit rates."""
+    if not _check_api_key():
+        return json.dumps({"error": "Unauthorized"}), 401, {"Content-Type": "application/json"}
+    from src.services import embedding_cache, rag
+    stats = {"indexer": rag.indexer.stats(), "embedding_cache": embedding_cache.cache.stats()}
+    return json.dumps(stats), 200, {"Content-Type": "application/json"}
+
+
+@bp.route("/api/acp/restore_status")
+def api_acp_restore_status():
+    """Session restore queue and per-session start/load timings."""
+    if not _check_api_key():
+        return json.dumps({"error": "Unauthorized"}), 401, {"Content-Type": "application/json"}
+    return json.dumps(acp_manager.restore_status()), 200, {"Content-Type": "application/json"}
+
+
+@bp.route("/api/acp/metrics")
+def api_acp_metrics():
+    """Turn timing, chunk throughput and JSON-RPC latency per model and per session."""
+    if not _check_api_key():
+        return json.dumps({"error": "Unauthorized"}), 401, {"Content-Type": "application/json"}
+    return json.dumps(acp_manager.metrics()), 200, {"Content-Type": "application/json"}
+
+
+@bp.route("/metrics")
+def metrics():
+    """Prometheus text exposition; scrape with the API key as the api_key param or X-API-Key header."""
+    if not _check_api_key():
+        return "Unauthorized\n", 401, {"Content-Type": "text/plain"}
+    return prometheus.render(), 200, {"Content-Type": prometheus.CONTENT_TYPE}
+
+
 @bp.route("/api/mcp/tools")
 def api_mcp_tools():
     """List all available MCP tools from configured servers."""
@@ -266,7 +313,8 @@ def kasm_proxy(path):
             if k.lower() not in ["host", "connection", "upgrade"]
         }
 
-        resp = requests.request(
+        resp = _proxy_request(
+            "kasm",
             method=request.method,
             url=url,
             headers=headers,
@@ -378,7 +426,8 @@ def notes_proxy(notebook, path):
             if k.lower() not in ["host", "connection", "upgrade"]
         }
 
-        resp = requests.request(
+        resp = _proxy_request(
+            "notes",
             method=request.method,
             url=url,
             headers=headers,
@@ -700,7 +749,8 @@ def jupyter_proxy(path):
             if k.lower() not in ["host", "connection", "upgrade"]
         }
 
-        resp = requests.request(
+        resp = _proxy_request(
+            "jupyter",
             method=request.method,
             url=url,
             headers=headers,
@@ -37,6 +37,19 @@ _jupyter_cmd_origins_lock = threading.Lock()
 _acp_subscribers_ref = {}
 
 
+HISTORY_WINDOW_TURNS = 30  # default page size for windowed history replay
+MAX_WINDOW_TURNS = 500
+
+
+def _window_turns(data):
+    """Requested replay window in turns from a subscribe/page payload, or 0 for all."""
+    try:
+        turns = int(data.get("window_turns") or 0)
+    except (TypeError, ValueError):
+        return 0
+    return min(max(turns, 0), MAX_WINDOW_TURNS)
+
+
 def get_acp_subscribers(session_id):
     """Return set of socket sids subscribed to a given ACP session."""
     return set(_acp_subscribers_ref.get(session_id, set()))
@@ -541,6 +554,8 @@ def register_handlers(socketio):
     # Restore persisted chat sessions on startup
     acp_manager.default_on_event = acp_on_event
     acp_manager.restore_sessions(lambda sid: acp_on_event)
+    acp_manager.warm_pool.start()
+    acp_manager.start_idle_monitor()
 
     @socketio.on("acp_create")
     def acp_create(data):
@@ -560,65 +575,36 @@ def register_handlers(socketio):
             acp_subscribers.setdefault(acp_sid, set()).add(request.sid)
             # Replay history for reconnecting clients
             session = acp_manager.get_session(acp_sid)
+            if session and not session.ready:
+                acp_manager.hydrate(acp_sid)
             logger.info(f"acp_subscribe: session_id={acp_sid} found={session is not None} ready={session.ready if session else 'N/A'} history_len={len(session.history) if session else 0}")
             if session:
                 offset = data.get("history_offset", 0)
-                history = session.history[offset:]
-                # Tell client how many events to expect so it can show progress
-                emit("acp_history_size", {"session_id": acp_sid, "count": len(history)})
-                # Collapse consecutive agent_message_chunk text events into single events
-                collapsed = []
-                text_buf = ""
-                text_buf_ts = None
-                text_buf_model = None
-                for evt in history:
-                    su = ((evt.get("params") or {}).get("update") or {}).get("sessionUpdate", "")
-                    content = ((evt.get("params") or {}).get("update") or {}).get("content") or {}
-                    if su == "agent_message_chunk" and content.get("type") == "text":
-                        if not text_buf_ts and evt.get("ts"):
-                            text_buf_ts = evt["ts"]
-                        if not text_buf_model and evt.get("model"):
-                            text_buf_model = evt["model"]
-                        text_buf += content["text"]
-                    else:
-                        if text_buf:
-                            entry = {"method": "session/update", "params": {"update": {"sessionUpdate": "agent_message_chunk", "content": {"type": "text", "text": text_buf}}}}
-                            if text_buf_ts:
-                                entry["ts"] = text_buf_ts
-                            if text_buf_model:
-                                entry["model"] = text_buf_model
-                            collapsed.append(entry)
-                            text_buf = ""
-                            text_buf_ts = None
-                            text_buf_model = None
-                        collapsed.append(evt)
-                if text_buf:
-                    entry = {"method": "session/update", "params": {"update": {"sessionUpdate": "agent_message_chunk", "content": {"type": "text", "text": text_buf}}}}
-                    if text_buf_ts:
-                        entry["ts"] = text_buf_ts
-                    if text_buf_model:
-                        entry["model"] = text_buf_model
-                    collapsed.append(entry)
+                window_turns = _window_turns(data)
+                view = session.replay_view()
+                # Consecutive agent_message_chunk text events come pre-collapsed from the session's view.
+                # Fresh loads may ask for only the last N turns; older ones are paged via acp_history_page.
+                first_turn = 0
+                if offset == 0 and window_turns:
+                    first_turn = max(view.turn_count() - window_turns, 0)
+                    collapsed = view.collapsed_turns(first_turn)
+                else:
+                    collapsed = view.collapsed_history(offset)
+                # Tell client how many events the batch holds so it can show progress
+                emit("acp_history_size", {"session_id": acp_sid, "count": len(collapsed)})
                 # Send history as a single batch to avoid "replay" effect
                 next_seq = acp_event_seq.get(acp_sid, 0)
                 logger.info(f"acp_subscribe: sending history batch ({len(collapsed)} events) sync_seq={next_seq} history_len={len(session.history)} ready={session.ready}")
                 # Append step_progress catch-up events for reconnects
-                step_progress_events = []
-                if offset > 0:
-                    seen_pids = set()
-                    for evt in reversed(session.history):
-                        if evt.get("type") == "step_progress":
-                            pid = (evt.get("data") or {}).get("pipeline_id")
-                            if pid and pid not in seen_pids:
-                                seen_pids.add(pid)
-                                step_progress_events.append(evt)
+                step_progress_events = view.latest_step_progress() if offset > 0 else []
                 emit("acp_history_batch", {
                     "session_id": acp_sid,
                     "events": collapsed,
                     "step_progress": step_progress_events,
                     "sync_seq": next_seq,
-                    "history_length": len(session.history),
+                    "history_length": view.history_length(),
                     "model": session.model,
+                    "first_turn": first_turn,
                 })
                 if session.ready:
                     emit("acp_event", {"session_id": acp_sid, "event": {"type": "session_ready"}})
@@ -639,59 +625,63 @@ def register_handlers(socketio):
                     logger.info(f"acp_subscribe: session {acp_sid} not ready. ready={session.ready} proc={session.proc is not None} poll={session.proc.poll() if session.proc else 'N/A'} prompting={session._is_prompting} idle={time.time() - session._last_activity:.0f}s")
             else:
                 # Archived session — replay from history file as read-only preview
-                from src.services.acp import load_history_file
-                history = load_history_file(acp_sid)
-                if history:
-                    emit("acp_history_size", {"session_id": acp_sid, "count": len(history)})
-                    collapsed = []
-                    text_buf = ""
-                    text_buf_ts = None
-                    text_buf_model = None
-                    for evt in history:
-                        su = ((evt.get("params") or {}).get("update") or {}).get("sessionUpdate", "")
-                        content = ((evt.get("params") or {}).get("update") or {}).get("content") or {}
-                        if su == "agent_message_chunk" and content.get("type") == "text":
-                            if not text_buf_ts and evt.get("ts"):
-                                text_buf_ts = evt["ts"]
-                            if not text_buf_model and evt.get("model"):
-                                text_buf_model = evt["model"]
-                            text_buf += content["text"]
-                        else:
-                            if text_buf:
-                                entry = {"method": "session/update", "params": {"update": {"sessionUpdate": "agent_message_chunk", "content": {"type": "text", "text": text_buf}}}}
-                                if text_buf_ts:
-                                    entry["ts"] = text_buf_ts
-                                if text_buf_model:
-                                    entry["model"] = text_buf_model
-                                collapsed.append(entry)
-                                text_buf = ""
-                                text_buf_ts = None
-                                text_buf_model = None
-                            collapsed.append(evt)
-                    if text_buf:
-                        entry = {"method": "session/update", "params": {"update": {"sessionUpdate": "agent_message_chunk", "content": {"type": "text", "text": text_buf}}}}
-                        if text_buf_ts:
-                            entry["ts"] = text_buf_ts
-                        if text_buf_model:
-                            entry["model"] = text_buf_model
-                        collapsed.append(entry)
+                from src.services.acp import history_turn_count, load_collapsed_history, load_collapsed_turns
+                window_turns = _window_turns(data)
+                first_turn = max(history_turn_count(acp_sid) - window_turns, 0) if window_turns else 0
+                if first_turn:
+                    collapsed = load_collapsed_turns(acp_sid, first_turn)
+                else:
+                    collapsed = load_collapsed_history(acp_sid)
+                if collapsed:
+                    emit("acp_history_size", {"session_id": acp_sid, "count": len(collapsed)})
                     emit("acp_history_batch", {
                         "session_id": acp_sid,
                         "events": collapsed,
                         "step_progress": [],
                         "sync_seq": 0,
-                        "history_length": len(history),
+                        "history_length": len(collapsed),
                         "model": None,
                         "archived": True,
+                        "first_turn": first_turn,
                     })
 
+    @socketio.on("acp_history_page")
+    def acp_history_page(data):
+        """Send an older page of turns for a client using windowed replay."""
+        if not validate_csrf(data):
+            return
+        acp_sid = data.get("session_id")
+        try:
+            before_turn = int(data.get("before_turn", 0))
+        except (TypeError, ValueError):
+            return
+        if not acp_sid or before_turn <= 0:
+            return
+        start = max(before_turn - (_window_turns(data) or HISTORY_WINDOW_TURNS), 0)
+        session = acp_manager.get_session(acp_sid)
+        if session and not session.dormant and session.history:
+            events = session.collapsed_turns(start, before_turn)
+        else:
+            # Archived, or dormant/suspended with no history in memory: page from disk
+            from src.services.acp import load_collapsed_turns
+            events = load_collapsed_turns(acp_sid, start, before_turn)
+        emit("acp_history_page", {
+            "session_id": acp_sid,
+            "events": events,
+            "first_turn": start,
+            "before_turn": before_turn,
+        })
+
     @socketio.on("acp_prompt")
     def acp_prompt(data):
         if not validate_csrf(data):
             return
         session = acp_manager.get_session(data.get("session_id"))
         if session:
-            session.send_prompt(data.get("text", ""))
+            if not session.ready and acp_manager.hydrate(session.id):
+                session.queue_prompt(data.get("text", ""))
+            else:
+                session.send_prompt(data.get("text", ""))
 
     @socketio.on("acp_cancel")
     def acp_cancel(data):
@@ -833,9 +823,9 @@ def register_handlers(socketio):
         # Title matches (substring, case-insensitive)
         q_lower = query.lower()
         title_matches = {s["id"] for s in archived if q_lower in s["name"].lower()}
-        # RAG matches (semantic search across all conversations, then filter to archived only)
-        rag_hits = rag_search(query, limit=20)
-        rag_matches = {h["session_id"] for h in rag_hits if h["session_id"] in archived_ids}
+        # RAG matches (hybrid semantic + keyword search, scoped to archived sessions inside the index)
+        rag_hits = rag_search(query, limit=20, session_ids=archived_ids)
+        rag_matches = {h["session_id"] for h in rag_hits}
         # Merge: title matches first, then RAG-only matches
         all_match_ids = title_matches | rag_matches
         results = [s for s in archived if s["id"] in all_match_ids]
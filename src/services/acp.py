@@ -1,91 +1,107 @@
 """ACP (Agent Client Protocol) service for managing kiro-cli acp subprocesses."""
 
-import glob
+import atexit
 import json
 import logging
 import os
-import select
 import subprocess
 import threading
 import time
 import shutil
 import uuid
 
-from src.services import rag
+from src.config import get_config
+from src.services import acp_io, acp_metrics, history_store, json_codec, rag, session_catalog
 
 logger = logging.getLogger(__name__)
 
 KIRO_CLI = shutil.which("kiro-cli") or os.path.expanduser("~/.local/bin/kiro-cli")
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data")
-SESSIONS_FILE = os.path.join(DATA_DIR, "chat_sessions.json")
-ARCHIVED_FILE = os.path.join(DATA_DIR, "chat_sessions_archived.json")
-PID_MAP_FILE = os.path.join(DATA_DIR, "acp_pid_map.json")
 HISTORY_DIR = os.path.join(DATA_DIR, "chat_history")
 KIRO_SESSIONS_DIR = os.path.expanduser("~/.kiro/sessions/cli")
+ORPHAN_SCAN_EVENTS = 1000  # how far into an orphan's history to look for its ACP session ID
+HISTORY_FLUSH_WINDOW = 2.0  # seconds a streaming text run may be held back for coalescing
+WARM_POOL_SIZE = int(get_config("ACP_WARM_POOL_SIZE", "1"))  # idle initialized processes per model/effort, 0 = off
+WARM_POOL_MODELS = get_config("ACP_WARM_POOL_MODELS", "")  # extra "model[:effort]" pool keys, comma-separated
+WARM_POOL_MAX_AGE = 3600  # seconds an idle warm process is kept before it is recycled
+WARM_POOL_CHECK = 30  # seconds between pool checks when nothing wakes the filler
+WARM_POOL_RETRY = 60  # seconds to back off after a failed warm spawn
+RESTORE_CONCURRENCY = int(get_config("ACP_RESTORE_CONCURRENCY", str(min(4, os.cpu_count() or 1))))
+RESTORE_RECENT_WINDOW = 24 * 3600  # sessions idle longer than this restore one at a time, after the rest
+LAZY_RESTORE = get_config("ACP_LAZY_RESTORE", "true").lower() == "true"  # restart into dormant sessions
+IDLE_SUSPEND = int(get_config("ACP_IDLE_SUSPEND", "3600"))  # seconds idle before a session's process is stopped, 0 = never
+IDLE_CHECK_INTERVAL = 60
 
 
 def load_history_file(session_id):
-    """Load history for a session from its JSONL file."""
-    history = []
+    """Load the full history for a session from its segmented history store."""
     try:
-        with open(os.path.join(HISTORY_DIR, f"{session_id}.jsonl")) as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    try:
-                        history.append(json.loads(line))
-                    except (json.JSONDecodeError, ValueError):
-                        pass
+        return history_store.get_store(session_id).load_all()
     except OSError:
-        pass
-    return history
+        return []
 
 
-def _save_sessions_map(sessions_map):
-    os.makedirs(DATA_DIR, exist_ok=True)
-    with open(SESSIONS_FILE, "w") as f:
-        json.dump(sessions_map, f, indent=2)
+def load_collapsed_turns(session_id, start=0, end=None):
+    """Load turns [start, end) of a session's history with text chunks coalesced."""
+    try:
+        return history_store.get_store(session_id).collapsed_turns(start, end)
+    except OSError:
+        return []
 
 
-def _load_sessions_map():
+def history_turn_count(session_id):
+    """Number of turns in a session's persisted history."""
     try:
-        with open(SESSIONS_FILE) as f:
-            return json.load(f)
-    except Exception:
-        return {}
+        return history_store.get_store(session_id).turn_count()
+    except OSError:
+        return 0
+
 
+def load_collapsed_history(session_id):
+    """Load a session's history with text chunks coalesced, via its cached snapshot."""
+    try:
+        return history_store.get_store(session_id).collapsed()
+    except OSError:
+        return []
 
-_archived_lock = threading.Lock()
 
+class StoredHistory:
+    """Replay view of a session's on-disk history, read once; see ACPSession.replay_view."""
 
-def _save_archived_map(archived_map):
-    os.makedirs(DATA_DIR, exist_ok=True)
-    tmp = ARCHIVED_FILE + ".tmp"
-    with open(tmp, "w") as f:
-        json.dump(archived_map, f, indent=2)
-    os.replace(tmp, ARCHIVED_FILE)
+    def __init__(self, session_id):
+        self.history = load_history_file(session_id)
+        self._collapsed = history_store.CollapsedHistory()
 
+    def collapsed_history(self, offset=0):
+        return self._collapsed.since(self.history, offset)
 
-def _load_archived_map():
-    try:
-        with open(ARCHIVED_FILE) as f:
-            return json.load(f)
-    except Exception:
-        return {}
+    def collapsed_turns(self, start=0, end=None):
+        return self._collapsed.turns(self.history, start, end)
+
+    def turn_count(self):
+        return self._collapsed.turn_count(self.history)
+
+    def history_length(self):
+        return self._collapsed.length(self.history)
+
+    def latest_step_progress(self):
+        return self._collapsed.latest_step_progress(self.history)
+
+
+_archived_lock = threading.Lock()  # orphan recovery vs. archive/restore transitions
 
 
 def _save_pid_map(sessions):
-    """Write mapping of kiro-cli PID -> fernando session ID."""
+    """Record which running kiro-cli PID belongs to which fernando session."""
     pid_map = {}
     for sid, session in sessions.items():
         if session.proc and session.proc.poll() is None:
-            pid_map[str(session.proc.pid)] = sid
+            pid_map[session.proc.pid] = sid
     try:
-        with open(PID_MAP_FILE, "w") as f:
-            json.dump(pid_map, f)
-    except Exception:
-        pass
+        session_catalog.replace_pids(pid_map)
+    except Exception as e:
+        logger.warning(f"PID registry write failed: {e}")
 
 
 CONTINUATION_FILE = os.path.join(DATA_DIR, "pending_continuation.json")
@@ -116,42 +132,52 @@ class ACPSession:
         from src.services.settings import get as get_setting
         self.model = get_setting("default_model") or self.DEFAULT_MODEL
         self.effort = get_setting("default_effort") or "max"
-        self._reader_thread = None
-        self._stderr_thread = None
+        self._io_proc = None  # process whose pipes are registered with the shared I/O loop
+        self._framer = acp_io.LineFramer()
+        self._stall_warned = 0  # last stall warning threshold (seconds)
         self._next_id = 0
         self._pending = {}
         self._lock = threading.Lock()
         self._alive = False
         self.history = []
+        self._store = history_store.get_store(session_id)
+        self._collapsed = history_store.CollapsedHistory()
         self.ready = False
+        self.dormant = False  # no process and no in-memory history until hydrated
+        self._queued_prompts = []  # prompts that arrived while hydrating
         self._recording = True  # gate for _record_event
         self._broadcasting = True  # gate for on_event dispatch
         self._last_activity = time.time()  # track last stdout data for stall detection
         self._is_prompting = False  # True while waiting for agent response
         self._flushed = 0  # number of history entries already written to disk
+        self._last_flush = 0.0  # time of the last history write, opens a coalescing window
         self._retry_count = 0  # current consecutive retry attempts for model unavailability
         self._max_retries = 5  # give up after this many consecutive failures
         self._retry_backoff_base = 5  # seconds, doubles each retry
         self._retry_pending = False  # True while a retry is waiting to fire
+        self.load_timing = {}  # seconds spent in each phase of the last start/load
+        self.metrics = acp_metrics.SessionMetrics()
+        self._export_id = True  # tag kiro-cli with SESSION_ENV; off for warm-pool processes, whose owner is unknown
 
     def _spawn_and_init(self):
         """Spawn kiro-cli acp and run initialize handshake."""
         logger.info(f"[{self.id}] Spawning kiro-cli acp subprocess")
+        env = dict(os.environ)
+        env.pop(session_catalog.SESSION_ENV, None)  # e.g. a server restarted from inside a chat
+        if self._export_id:
+            env[session_catalog.SESSION_ENV] = self.id
         self.proc = subprocess.Popen(
             [KIRO_CLI, "acp", "-a", "--model", self.model, "--effort", self.effort],
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             cwd=os.path.expanduser("~/fernando"),
+            env=env,
         )
         logger.info(f"[{self.id}] kiro-cli pid={self.proc.pid}")
         self._alive = True
         self._last_activity = time.time()
-        self._reader_thread = threading.Thread(target=self._read_loop, daemon=True)
-        self._reader_thread.start()
-        # Drain stderr to prevent pipe buffer deadlock
-        self._stderr_thread = threading.Thread(target=self._stderr_loop, daemon=True)
-        self._stderr_thread.start()
+        self._attach_io(self.proc)
 
         resp = self._request("initialize", {
             "protocolVersion": 1,
@@ -164,7 +190,9 @@ class ACPSession:
 
     def start(self):
         """Create a new ACP session."""
+        t0 = time.monotonic()
         self._spawn_and_init()
+        t1 = time.monotonic()
         resp = self._request("session/new", {
             "cwd": os.path.expanduser("~/fernando"),
             "mcpServers": [],
@@ -173,6 +201,7 @@ class ACPSession:
             self.acp_session_id = resp["sessionId"]
         else:
             raise RuntimeError("ACP session/new failed")
+        self.load_timing = {"spawn_s": round(t1 - t0, 2), "new_s": round(time.monotonic() - t1, 2)}
 
     @staticmethod
     def _patch_incomplete_mutate(acp_session_id):
@@ -191,8 +220,8 @@ class ACPSession:
             if not line:
                 continue
             try:
-                obj = json.loads(line)
-            except (json.JSONDecodeError, ValueError):
+                obj = json_codec.loads(line)
+            except ValueError:
                 continue
             kind = obj.get("kind", "")
             if kind == "ToolResults":
@@ -238,12 +267,16 @@ class ACPSession:
 
     def load(self, acp_session_id):
         """Load an existing ACP session (resume after restart)."""
+        t0 = time.monotonic()
+        self.dormant = False
         self._patch_incomplete_mutate(acp_session_id)
         self._load_history()
         self._recording = False  # Don't overwrite rich history with kiro's stripped replay
         self._broadcasting = False  # Don't fire on_event for replay events
+        t1 = time.monotonic()
         self._spawn_and_init()
         self.acp_session_id = acp_session_id
+        t2 = time.monotonic()
 
         # Remove stale lock file
         lock_file = os.path.join(KIRO_SESSIONS_DIR, f"{acp_session_id}.lock")
@@ -264,6 +297,11 @@ class ACPSession:
             raise RuntimeError(f"session/load failed for {acp_session_id}")
         self._recording = True
         self._broadcasting = True
+        self.load_timing = {
+            "history_s": round(t1 - t0, 2),
+            "spawn_s": round(t2 - t1, 2),
+            "load_s": round(time.monotonic() - t2, 2),
+        }
 
     def send_prompt(self, text):
         if not self.acp_session_id:
@@ -279,6 +317,7 @@ class ACPSession:
             time.sleep(0.5)
         self._is_prompting = True
         self._last_activity = time.time()
+        self.metrics.prompt_sent()
         self.history.append({"type": "user_prompt", "text": text, "ts": time.time()})
         self._save_history()
         self._send({
@@ -298,6 +337,7 @@ class ACPSession:
         logger.info(f"[{self.id}] send_continuation: {len(text)} chars")
         self._is_prompting = True
         self._last_activity = time.time()
+        self.metrics.prompt_sent()
         prefixed = "[CONTINUATION] " + text
         evt = {"type": "continuation", "text": prefixed, "ts": time.time()}
         self.history.append(evt)
@@ -325,20 +365,85 @@ class ACPSession:
             "params": {"sessionId": self.acp_session_id},
         })
 
+    def adopt(self, warm):
+        """Take over a warm-pool session's initialized process and ACP session."""
+        proc = warm.proc
+        warm._detach_io(proc)
+        with warm._lock:
+            warm._io_proc = None
+            next_id = warm._next_id
+        framer = warm._framer
+        self.acp_session_id, warm.acp_session_id = warm.acp_session_id, None
+        self.model, self.effort = warm.model, warm.effort
+        warm.proc = None
+        warm._alive = False
+        with self._lock:
+            self._next_id = max(self._next_id, next_id)
+        self.proc = proc
+        self._alive = True
+        self._last_activity = time.time()
+        self._attach_io(proc, framer)
+        self.load_timing = {"warm": True}
+        self.metrics = warm.metrics  # keeps the initialize and session/new latencies
+        logger.info(f"[{self.id}] adopted warm kiro-cli pid={proc.pid} acp={self.acp_session_id}")
+
+    def suspend(self):
+        """Stop the process and drop the in-memory history; load() resumes the ACP session later."""
+        self.ready = False
+        self.dormant = True  # before stop(), so subscribers don't see session_ended
+        self.stop()
+        self.history = []
+        self._flushed = 0
+        self._collapsed = history_store.CollapsedHistory()
+
+    def queue_prompt(self, text):
+        """Send `text` now if the session is ready, otherwise once it has loaded."""
+        with self._lock:
+            if not self.ready:
+                self._queued_prompts.append(text)
+                return
+        self.send_prompt(text)
+
+    def _flush_queued_prompts(self):
+        with self._lock:
+            texts, self._queued_prompts = self._queued_prompts, []
+        for text in texts:
+            self.send_prompt(text)
+
+    def _start_failed(self, error):
+        """Tell subscribers the session could not start, and how many queued prompts were lost with it."""
+        with self._lock:
+            dropped, self._queued_prompts = len(self._queued_prompts), []
+        if dropped:
+            error = f"{error} ({dropped} queued prompt{'s' if dropped != 1 else ''} not sent)"
+        if self.on_event:
+            self.on_event(self.id, {"type": "session_error", "error": error})
+
+    def history_count(self):
+        """Number of history events; read from the on-disk index while dormant."""
+        return self._store.count() if self.dormant else len(self.history)
+
     def stop(self):
         self._alive = False
         self._is_prompting = False
         self._save_history(index_rag=True)
-        if self.proc:
+        self._store.close()
+        self._terminate()
+
+    def _terminate(self):
+        proc = self.proc
+        if proc:
+            self._detach_io(proc)
             try:
-                self.proc.terminate()
-                self.proc.wait(timeout=5)
+                proc.terminate()
+                proc.wait(timeout=5)
             except Exception:
                 try:
-                    self.proc.kill()
+                    proc.kill()
                 except Exception:
                     pass
             self.proc = None
+            self._io_ended(proc)
 
     def get_stall_info(self):
         """Return diagnostic info about current session state."""
@@ -358,7 +463,7 @@ class ACPSession:
     def _send(self, msg):
         if self.proc and self.proc.stdin:
             try:
-                self.proc.stdin.write((json.dumps(msg) + "\n").encode())
+                self.proc.stdin.write(json_codec.dumps_bytes(msg) + b"\n")
                 self.proc.stdin.flush()
             except Exception as e:
                 logger.error(f"ACP send error: {e}")
@@ -368,11 +473,14 @@ class ACPSession:
         event = threading.Event()
         with self._lock:
             self._pending[req_id] = {"event": event, "result": None}
+        t0 = time.monotonic()
         self._send({"jsonrpc": "2.0", "id": req_id, "method": method, "params": params})
         event.wait(timeout=timeout)
         with self._lock:
             entry = self._pending.pop(req_id, {})
-        return entry.get("result")
+        result = entry.get("result")
+        self.metrics.rpc(self.model, method, time.monotonic() - t0, result is not None)
+        return result
 
     def _record_event(self, msg):
         if not self._recording:
@@ -386,100 +494,158 @@ class ACPSession:
             self._save_history(index_rag=is_turn_end)
 
     def _history_path(self):
-        return os.path.join(HISTORY_DIR, f"{self.id}.jsonl")
+        return self._store.path
 
     def _save_history(self, index_rag=False):
+        """Persist unflushed history entries, merging streamed text chunks.
+
+        While the newest entry is a text chunk the write is deferred for up to
+        HISTORY_FLUSH_WINDOW so the run lands on disk as one event. Writes go
+        through the shared history writer thread; turn ends (index_rag) always
+        flush and wait until the entries are fsynced.
+        """
         try:
-            os.makedirs(HISTORY_DIR, exist_ok=True)
-            path = self._history_path()
             new_entries = self.history[self._flushed:]
-            if new_entries:
-                with open(path, "a") as f:
-                    for entry in new_entries:
-                        f.write(json.dumps(entry) + "\n")
-                if self._flushed == 0:
-                    os.chmod(path, 0o600)
-                self._flushed = len(self.history)
-        except Exception:
-            pass
-        if index_rag:
-            threading.Thread(
-                target=self._index_rag_background, daemon=True
-            ).start()
+            now = time.time()
+            holding = (
+                not index_rag
+                and history_store.text_chunk(new_entries[-1] if new_entries else None) is not None
+                and now - self._last_flush < HISTORY_FLUSH_WINDOW
+            )
+            if index_rag or (new_entries and not holding):
+                history_store.writer.submit(
+                    self._store, history_store.coalesce_text_chunks(new_entries), sync=index_rag
+                )
+                self._flushed += len(new_entries)
+                self._last_flush = now
+        except Exception as e:
+            logger.warning(f"[{self.id}] history write error: {e}")
+        if index_rag and not rag.indexer.schedule(self.id, self._index_rag_background):
+            logger.warning(f"[{self.id}] RAG indexer queue full, deferring to next turn")
 
     def _index_rag_background(self):
+        """Runs on the rag.indexer worker; reads the latest history when it starts.
+
+        Reads from the history store, not self.history: the turn end that
+        scheduled the job was fsynced first, and suspend() may have dropped the
+        in-memory history by the time the job runs.
+        """
         try:
-            rag.index_session(self.id, self.display_name, list(self.history))
+            # Only hand over turns from the last indexed one on; rag skips unchanged ones
+            first_turn = rag.index_resume_turn(self.id)
+            rag.index_session(self.id, self.display_name, self._store.collapsed_turns(first_turn), first_turn=first_turn)
         except Exception as e:
             logger.warning(f"[{self.id}] RAG index error: {e}")
+        try:
+            session_catalog.record(self.id, name=self.display_name, history_bytes=self._store.size_bytes())
+        except Exception as e:
+            logger.warning(f"[{self.id}] session catalog write failed: {e}")
+
+    def collapsed_history(self, offset=0):
+        """Chunk-coalesced events covering history[offset:], for subscriber replay."""
+        return self._collapsed.since(self.history, offset)
+
+    def collapsed_turns(self, start=0, end=None):
+        """Chunk-coalesced events of turns [start, end), for windowed replay."""
+        return self._collapsed.turns(self.history, start, end)
+
+    def turn_count(self):
+        return self._collapsed.turn_count(self.history)
+
+    def history_length(self):
+        """Raw history offset for clients; unlike len(history) it survives a reload."""
+        return self._collapsed.length(self.history)
+
+    def latest_step_progress(self):
+        """Latest step_progress event per pipeline, newest first."""
+        return self._collapsed.latest_step_progress(self.history)
+
+    def replay_view(self):
+        """The session, or a StoredHistory while its history is not in memory.
+
+        A dormant or suspended session, or one still loading after hydrate(),
+        has history == []; replaying from that would give a reconnecting
+        client an empty batch and history_length 0.
+        """
+        return self if self.history else StoredHistory(self.id)
 
     def _load_history(self):
         self.history = load_history_file(self.id)
         self._flushed = len(self.history)
 
-    def _read_loop(self):
-        buf = b""
-        stall_warned = 0  # last stall warning threshold (seconds)
-        while self._alive and self.proc and self.proc.poll() is None:
+    def _attach_io(self, proc, framer=None):
+        """Register the process's pipes with the shared I/O loop."""
+        with self._lock:
+            self._io_proc = proc
+        self._framer = framer or acp_io.LineFramer()
+        self._stall_warned = 0
+        acp_io.loop.register(proc.stdout, self._on_stdout, lambda: self._on_stdout_eof(proc), self._check_stall)
+        # Drain stderr to prevent pipe buffer deadlock
+        acp_io.loop.register(proc.stderr, self._on_stderr, lambda: None)
+
+    def _detach_io(self, proc):
+        # Before the pipes are closed, so the selector never holds a stale fd
+        acp_io.loop.unregister(proc.stdout)
+        acp_io.loop.unregister(proc.stderr)
+
+    def _on_stdout(self, chunk):
+        """I/O loop callback: frame lines and queue messages for in-order dispatch."""
+        self._last_activity = time.time()
+        self._stall_warned = 0
+        self.metrics.stdout(len(chunk))
+        dropped = self._framer.dropped
+        for line in self._framer.feed(chunk):
+            if not line or line.isspace():
+                continue
             try:
-                ready, _, _ = select.select([self.proc.stdout], [], [], 0.5)
-                if not ready:
-                    # Stall detection: log warnings at increasing intervals while prompting
-                    if self._is_prompting:
-                        elapsed = time.time() - self._last_activity
-                        if elapsed > 60 and elapsed > stall_warned + 60:
-                            stall_warned = int(elapsed)
-                            logger.warning(f"[{self.id}] STALL: no stdout data for {elapsed:.0f}s while prompting, proc_poll={self.proc.poll()}")
-                    continue
-                chunk = self.proc.stdout.read1(65536)
-                if not chunk:
-                    logger.warning(f"[{self.id}] stdout EOF, proc_poll={self.proc.poll()}")
-                    break
-                self._last_activity = time.time()
-                stall_warned = 0
-                buf += chunk
-                while b"\n" in buf:
-                    line, buf = buf.split(b"\n", 1)
-                    line = line.strip()
-                    if not line:
-                        continue
-                    try:
-                        msg = json.loads(line.decode())
-                    except (json.JSONDecodeError, ValueError):
-                        logger.warning(f"[{self.id}] non-JSON stdout line: {line[:200]}")
-                        continue
-                    self._dispatch(msg)
-            except Exception as e:
-                logger.error(f"[{self.id}] _read_loop exception: {e}", exc_info=True)
-                break
+                msg = json_codec.loads(line)
+            except ValueError:
+                logger.warning(f"[{self.id}] non-JSON stdout line: {line[:200]}")
+                continue
+            acp_io.dispatcher.submit(self.id, lambda msg=msg: self._dispatch(msg))
+        if self._framer.dropped != dropped:
+            logger.error(f"[{self.id}] dropped stdout line over {self._framer.max_line} bytes")
 
-        self._alive = False
-        self._is_prompting = False
-        logger.info(f"[{self.id}] _read_loop exited, proc_poll={self.proc.poll() if self.proc else 'dead'}")
-        if self.on_event:
+    def _on_stdout_eof(self, proc):
+        logger.warning(f"[{self.id}] stdout EOF, proc_poll={proc.poll()}")
+        acp_io.loop.unregister(proc.stderr)
+        self._io_ended(proc)
+
+    def _io_ended(self, proc):
+        """The process's output is finished (EOF or stop); report it once per process."""
+        with self._lock:
+            if self._io_proc is not proc:
+                return
+            self._io_proc = None
+        if self.proc is proc:
+            self._alive = False
+            self._is_prompting = False
+        logger.info(f"[{self.id}] stdout reader finished, proc_poll={proc.poll()}")
+        acp_io.dispatcher.submit(self.id, self._notify_ended)
+
+    def _notify_ended(self):
+        if self.on_event and not self.dormant:
             try:
                 self.on_event(self.id, {"type": "session_ended"})
             except Exception:
                 pass
 
-    def _stderr_loop(self):
-        """Drain stderr to prevent pipe buffer deadlock and log any output."""
-        try:
-            while self._alive and self.proc and self.proc.poll() is None:
-                ready, _, _ = select.select([self.proc.stderr], [], [], 1.0)
-                if not ready:
-                    continue
-                chunk = self.proc.stderr.read1(65536)
-                if not chunk:
-                    break
-                for line in chunk.decode(errors="replace").splitlines():
-                    if line.strip():
-                        logger.warning(f"[{self.id}] kiro-cli stderr: {line.rstrip()}")
-                        if "Transport" in line and "closed" in line:
-                            logger.error(f"[{self.id}] MCP transport crash detected, scheduling auto-reload")
-                            threading.Thread(target=self._auto_reload, daemon=True).start()
-        except Exception:
-            pass
+    def _check_stall(self):
+        """I/O loop tick: log warnings at increasing intervals while prompting with no output."""
+        if self._is_prompting:
+            elapsed = time.time() - self._last_activity
+            if elapsed > 60 and elapsed > self._stall_warned + 60:
+                self._stall_warned = int(elapsed)
+                logger.warning(f"[{self.id}] STALL: no stdout data for {elapsed:.0f}s while prompting, proc_poll={self.proc.poll() if self.proc else 'N/A'}")
+
+    def _on_stderr(self, chunk):
+        """I/O loop callback: log kiro-cli stderr and watch for MCP transport crashes."""
+        for line in chunk.decode(errors="replace").splitlines():
+            if line.strip():
+                logger.warning(f"[{self.id}] kiro-cli stderr: {line.rstrip()}")
+                if "Transport" in line and "closed" in line:
+                    logger.error(f"[{self.id}] MCP transport crash detected, scheduling auto-reload")
+                    threading.Thread(target=self._auto_reload, daemon=True).start()
 
     def _auto_reload(self):
         """Reload the session after MCP transport crash."""
@@ -492,6 +658,7 @@ class ACPSession:
         if not acp_id or not self._alive:
             return
         logger.info(f"[{self.id}] Auto-reloading session after MCP crash")
+        self.metrics.count(self.model, "reloads")
         # Notify user
         if self.on_event:
             self.on_event(self.id, {"type": "system_message", "text": "MCP server connection lost. Reloading session..."})
@@ -516,6 +683,7 @@ class ACPSession:
         """Auto-retry the last prompt after model unavailability with exponential backoff."""
         self._retry_count += 1
         self._retry_pending = True
+        self.metrics.count(self.model, "retries")
         delay = self._retry_backoff_base * (2 ** (self._retry_count - 1))
         logger.info(f"[{self.id}] Model unavailable, retry {self._retry_count}/{self._max_retries} in {delay}s")
         if self.on_event and self._broadcasting:
@@ -530,6 +698,7 @@ class ACPSession:
         self._retry_pending = False
         self._is_prompting = True
         self._last_activity = time.time()
+        self.metrics.prompt_sent()
         self._send({
             "jsonrpc": "2.0",
             "id": self._get_id(),
@@ -555,6 +724,7 @@ class ACPSession:
                 logger.info(f"[{self.id}] turn ended: stopReason={stop_reason}")
                 self._is_prompting = False
                 self._retry_count = 0
+                self.metrics.turn_ended(self.model, stop_reason)
             self._record_event(msg)
             if self.on_event and self._broadcasting:
                 try:
@@ -572,6 +742,7 @@ class ACPSession:
             err = msg.get("error", {})
             logger.warning(f"[{self.id}] ACP error: {err}")
             self._is_prompting = False
+            self.metrics.turn_ended(self.model, "error")
             err_text = str(err.get("data") or err.get("message", ""))
             if "is not available" in err_text:
                 if self._retry_count < self._max_retries:
@@ -596,8 +767,12 @@ class ACPSession:
 
         # Notification (no id) — log session/update type
         params = msg.get("params", {})
-        su = (params.get("update") or {}).get("sessionUpdate", "")
-        if su and su != "agent_message_chunk":
+        update = params.get("update") or {}
+        su = update.get("sessionUpdate", "")
+        if su in ("agent_message_chunk", "agent_thought_chunk"):
+            content = update.get("content")
+            self.metrics.chunk(len(content.get("text") or "") if isinstance(content, dict) else 0)
+        elif su:
             logger.debug(f"[{self.id}] session/update: {su}")
 
         self._record_event(msg)
@@ -608,11 +783,255 @@ class ACPSession:
                 logger.error(f"[{self.id}] ACP event callback error: {e}")
 
 
+class WarmPool:
+    """Idle kiro-cli processes that have already run initialize and session/new.
+
+    New sessions claim one matching their model/effort instead of paying the
+    cold start, and a background thread tops the pool back up. Pool keys are
+    the current default model/effort plus ACP_WARM_POOL_MODELS, each kept at
+    ACP_WARM_POOL_SIZE idle processes.
+    """
+
+    def __init__(self, size=WARM_POOL_SIZE, extra_keys=WARM_POOL_MODELS):
+        self.size = size
+        self.extra_keys = extra_keys
+        self._idle = {}  # (model, effort) -> [(ACPSession, spawned_at)], oldest first
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self.hits = 0
+        self.misses = 0
+
+    def targets(self):
+        """(model, effort) keys the pool keeps warm."""
+        if self.size <= 0:
+            return []
+        from src.services.settings import get as get_setting
+        effort = get_setting("default_effort") or "max"
+        keys = [(get_setting("default_model") or ACPSession.DEFAULT_MODEL, effort)]
+        for entry in self.extra_keys.split(","):
+            model, _, entry_effort = entry.strip().partition(":")
+            if model:
+                keys.append((model, entry_effort or effort))
+        return list(dict.fromkeys(keys))
+
+    def start(self):
+        if self.size <= 0:
+            return
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="acp-warm-pool", daemon=True)
+                self._thread.start()
+
+    def claim(self, model, effort):
+        """Pop a live warm session for (model, effort), or None if there is none."""
+        dead = []
+        found = None
+        with self._cond:
+            idle = self._idle.get((model, effort), [])
+            while idle and found is None:
+                session, _ = idle.pop()
+                if session._alive and session.proc and session.proc.poll() is None:
+                    found = session
+                else:
+                    dead.append(session)
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._cond.notify()  # refill
+        for session in dead:
+            self.discard(session)
+        return found
+
+    def discard(self, session):
+        """Stop a warm session that will never be claimed, or clean up after one that was adopted."""
+        session._alive = False
+        session._terminate()
+        history_store.delete_history(session.id)
+        if session.acp_session_id:
+            for ext in (".json", ".jsonl", ".lock"):
+                try:
+                    os.remove(os.path.join(KIRO_SESSIONS_DIR, session.acp_session_id + ext))
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self._cond:
+            idle = {f"{model}/{effort}": len(entries) for (model, effort), entries in self._idle.items()}
+        return {"size": self.size, "idle": idle, "hits": self.hits, "misses": self.misses}
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            entries = [session for idle in self._idle.values() for session, _ in idle]
+            self._idle.clear()
+            self._cond.notify()
+        for session in entries:
+            self.discard(session)
+
+    def _prune(self):
+        """Drop dead, expired and no-longer-wanted entries; return a key below target, if any."""
+        targets = self.targets()
+        now = time.time()
+        dropped = []
+        with self._cond:
+            for key in list(self._idle):
+                keep = []
+                for session, spawned_at in self._idle[key]:
+                    alive = session._alive and session.proc and session.proc.poll() is None
+                    if key in targets and alive and now - spawned_at < WARM_POOL_MAX_AGE:
+                        keep.append((session, spawned_at))
+                    else:
+                        dropped.append(session)
+                self._idle[key] = keep
+            needed = next((key for key in targets if len(self._idle.get(key, ())) < self.size), None)
+        for session in dropped:
+            self.discard(session)
+        return needed
+
+    def _spawn(self, model, effort):
+        session = ACPSession(f"warm-{uuid.uuid4().hex[:8]}")
+        session.model, session.effort = model, effort
+        session._recording = False
+        session._broadcasting = False
+        session._export_id = False
+        t0 = time.monotonic()
+        try:
+            session.start()
+        except Exception:
+            self.discard(session)
+            raise
+        logger.info(f"Warm pool: {model}/{effort} pid={session.proc.pid} ready in {time.monotonic() - t0:.1f}s")
+        return session
+
+    def _run(self):
+        while not self._closed:
+            key = self._prune()
+            if key is None:
+                with self._cond:
+                    if not self._closed:
+                        self._cond.wait(WARM_POOL_CHECK)
+                continue
+            try:
+                session = self._spawn(*key)
+            except Exception as e:
+                logger.warning(f"Warm pool spawn for {key[0]}/{key[1]} failed: {e}")
+                with self._cond:
+                    self._cond.wait(WARM_POOL_RETRY)
+                continue
+            with self._cond:
+                if not self._closed:
+                    self._idle.setdefault(key, []).append((session, time.time()))
+                    continue
+            self.discard(session)
+
+
+class RestoreScheduler:
+    """Runs session restores a few at a time, most wanted first.
+
+    Sessions a client is waiting on jump the queue via promote(); the rest go
+    most recently active first. Sessions idle for longer than
+    RESTORE_RECENT_WINDOW only start when nothing else is restoring, so they
+    trickle in one at a time instead of competing with the chats in use.
+    """
+
+    def __init__(self, concurrency=RESTORE_CONCURRENCY):
+        self.concurrency = max(1, concurrency)
+        self._cond = threading.Condition()
+        self._queue = {}  # session_id -> job
+        self._running = set()
+        self._workers = 0
+        self._seq = 0
+
+    def submit(self, session, fn, last_active=0.0, urgent=False):
+        """Queue `fn` (which starts or loads `session`); `last_active` orders the queue."""
+        with self._cond:
+            self._seq += 1
+            self._queue[session.id] = {
+                "session": session,
+                "fn": fn,
+                "last_active": last_active,
+                "idle": time.time() - last_active > RESTORE_RECENT_WINDOW,
+                "urgent": urgent,
+                "seq": self._seq,
+                "queued_at": time.monotonic(),
+            }
+            if self._workers < self.concurrency:
+                self._workers += 1
+                threading.Thread(target=self._run, name=f"acp-restore-{self._seq}", daemon=True).start()
+            self._cond.notify_all()
+
+    def promote(self, session_id):
+        """Move a queued session to the front. Returns False if it isn't queued."""
+        with self._cond:
+            job = self._queue.get(session_id)
+            if not job:
+                return False
+            if not job["urgent"]:
+                job["urgent"] = True
+                logger.info(f"[{session_id}] restore promoted")
+                self._cond.notify_all()
+            return True
+
+    def is_pending(self, session_id):
+        """True while the session is queued or its restore is running."""
+        with self._cond:
+            return session_id in self._queue or session_id in self._running
+
+    def stats(self):
+        with self._cond:
+            return {"concurrency": self.concurrency, "queued": len(self._queue), "running": len(self._running)}
+
+    def _next(self):
+        """Best job that may start now, or None. Caller holds _cond."""
+        if not self._queue:
+            return None
+        job = min(self._queue.values(), key=lambda j: (not j["urgent"], j["idle"], -j["last_active"], j["seq"]))
+        if job["idle"] and not job["urgent"] and self._running:
+            return None
+        return job
+
+    def _run(self):
+        while True:
+            with self._cond:
+                job = self._next()
+                while job is None and self._queue:
+                    self._cond.wait()
+                    job = self._next()
+                if job is None:
+                    self._workers -= 1
+                    return
+                session = job["session"]
+                del self._queue[session.id]
+                self._running.add(session.id)
+            queued_s = round(time.monotonic() - job["queued_at"], 2)
+            t0 = time.monotonic()
+            try:
+                job["fn"]()
+            except Exception as e:
+                logger.error(f"[{session.id}] restore failed: {e}", exc_info=True)
+            finally:
+                session.load_timing.update(
+                    queued_s=queued_s,
+                    total_s=round(time.monotonic() - t0, 2),
+                    promoted=job["urgent"],
+                )
+                with self._cond:
+                    self._running.discard(session.id)
+                    self._cond.notify_all()
+
+
 class ACPManager:
     def __init__(self):
         self.sessions = {}
         self._lock = threading.Lock()
         self.default_on_event = None  # Set by websocket.py after register_handlers
+        self.warm_pool = WarmPool()
+        self.restorer = RestoreScheduler()
+        self._hydrate_lock = threading.Lock()  # dormant <-> live transitions
+        self._orphan_scan_ids = None  # history file ids seen by the last orphan scan
+        self._idle_thread = None
 
     def create_session(self, on_event=None, model=None):
         session_id = str(uuid.uuid4())[:8]
@@ -627,122 +1046,223 @@ class ACPManager:
     def _start_new(self, session_id, session):
         try:
             session._load_history()
-            session.start()
+            warm = self.warm_pool.claim(session.model, session.effort)
+            if warm:
+                session.adopt(warm)
+                self.warm_pool.discard(warm)
+            else:
+                session.start()
             session.ready = True
-            self._save()
+            self._save(session)
             self._save_pid_map()
             if session.on_event:
                 session.on_event(session_id, {"type": "session_ready"})
+            session._flush_queued_prompts()  # queued while it waited in the restore scheduler
         except Exception as e:
             logger.error(f"ACP session start failed: {e}")
-            if session.on_event:
-                session.on_event(session_id, {"type": "session_error", "error": str(e)})
+            session._start_failed(str(e))
             self.destroy_session(session_id)
 
     def restore_sessions(self, on_event_factory):
-        """Restore sessions from disk after restart."""
+        """Restore sessions from disk after restart.
+
+        With LAZY_RESTORE, loadable sessions come back dormant and are only
+        loaded on first use (see hydrate); the rest go through the restore
+        scheduler.
+        """
         continuation = _pop_continuation()
-        saved = _load_sessions_map()
+        saved = session_catalog.by_state(session_catalog.ACTIVE)
         for fernando_id, info in saved.items():
-            # Support old format (string) and new format (dict)
-            if isinstance(info, str):
-                acp_id, name = info, "Chat-" + fernando_id
-            else:
-                acp_id, name = info["acp_id"], info.get("name", "Chat-" + fernando_id)
+            acp_id, name = info.get("acp_id") or "", info.get("name") or "Chat-" + fernando_id
             session_file = os.path.join(KIRO_SESSIONS_DIR, f"{acp_id}.json")
             can_load = os.path.exists(session_file)
             session = ACPSession(fernando_id, on_event=on_event_factory(fernando_id))
             session.display_name = name
-            session.model = info.get("model", ACPSession.DEFAULT_MODEL) if isinstance(info, dict) else ACPSession.DEFAULT_MODEL
+            session.model = info.get("model") or ACPSession.DEFAULT_MODEL
             with self._lock:
                 self.sessions[fernando_id] = session
+            try:
+                last_active = os.path.getmtime(session._history_path())
+            except OSError:
+                last_active = 0.0
             if can_load:
                 session.acp_session_id = acp_id
-                threading.Thread(
-                    target=self._load_existing,
-                    args=(fernando_id, session, acp_id, continuation),
-                    daemon=True,
-                ).start()
+                restore = lambda sid=fernando_id, s=session, a=acp_id: self._load_existing(sid, s, a, continuation)
             else:
-                threading.Thread(
-                    target=self._start_new,
-                    args=(fernando_id, session),
-                    daemon=True,
-                ).start()
+                restore = lambda sid=fernando_id, s=session: self._start_new(sid, s)
+            # The session a pending continuation targets is about to be prompted
+            if continuation and continuation.get("session_id") == fernando_id:
+                last_active = time.time()
+            elif can_load and LAZY_RESTORE:
+                session.dormant = True
+                continue
+            self.restorer.submit(session, restore, last_active)
         self._recover_orphans()
 
+    def hydrate(self, session_id):
+        """Someone is waiting on this session: load it next if it is dormant or still queued.
+
+        Returns True if the session is loading through the restore scheduler,
+        so prompts for it should be queued with queue_prompt().
+        """
+        session = self.get_session(session_id)
+        if not session:
+            return False
+        with self._hydrate_lock:
+            if session.dormant:
+                session.dormant = False
+                logger.info(f"[{session_id}] hydrating dormant session")
+                self.restorer.submit(
+                    session,
+                    lambda: self._load_existing(session_id, session, session.acp_session_id),
+                    time.time(),
+                    urgent=True,
+                )
+                return True
+        self.restorer.promote(session_id)
+        return self.restorer.is_pending(session_id)
+
+    def start_idle_monitor(self):
+        """Suspend sessions idle for IDLE_SUSPEND seconds (checked every IDLE_CHECK_INTERVAL)."""
+        if IDLE_SUSPEND > 0 and self._idle_thread is None:
+            self._idle_thread = threading.Thread(target=self._idle_monitor, name="acp-idle", daemon=True)
+            self._idle_thread.start()
+
+    def _idle_monitor(self):
+        while True:
+            time.sleep(IDLE_CHECK_INTERVAL)
+            try:
+                self.suspend_idle()
+            except Exception as e:
+                logger.error(f"Idle session check failed: {e}", exc_info=True)
+
+    def suspend_idle(self, idle_after=None):
+        """Stop the processes of ready sessions with no activity for `idle_after` seconds."""
+        idle_after = IDLE_SUSPEND if idle_after is None else idle_after
+        cutoff = time.time() - idle_after
+        with self._lock:
+            sessions = list(self.sessions.values())
+        suspended = 0
+        for session in sessions:
+            with self._hydrate_lock:
+                if not (session.ready and not session._is_prompting and not session._retry_pending
+                        and session.acp_session_id and session._last_activity < cutoff):
+                    continue
+                logger.info(f"[{session.id}] suspending after {time.time() - session._last_activity:.0f}s idle")
+                session.suspend()
+            suspended += 1
+        if suspended:
+            self._save_pid_map()
+        return suspended
+
+    def restore_status(self):
+        """Restore queue state plus per-session start/load timings, slowest first."""
+        with self._lock:
+            sessions = dict(self.sessions)
+        timings = [
+            {"session": sid, "name": s.display_name, "ready": s.ready, **s.load_timing}
+            for sid, s in sessions.items()
+            if s.load_timing
+        ]
+        timings.sort(key=lambda t: t.get("total_s", 0), reverse=True)
+        pending = [sid for sid in sessions if self.restorer.is_pending(sid)]
+        dormant = sum(1 for s in sessions.values() if s.dormant)
+        return {**self.restorer.stats(), "pending": pending, "dormant": dormant, "sessions": timings}
+
+    def metrics(self):
+        """Per-model timing and throughput, plus each live session's, busiest first."""
+        with self._lock:
+            sessions = dict(self.sessions)
+        per_session = [
+            {"session": sid, "name": s.display_name, "model": s.model, **s.metrics.snapshot()}
+            for sid, s in sessions.items()
+        ]
+        per_session.sort(key=lambda m: m["turns"], reverse=True)
+        return {"models": acp_metrics.by_model(), "sessions": per_session}
+
     def _recover_orphans(self):
-        """Auto-archive history files not in active or archived maps."""
-        active = set(self.sessions.keys())
+        """Auto-archive history files not in active or archived maps.
+
+        Skipped while the set of .jsonl history files is the one the last
+        scan saw (the directory mtime is no use: it moves whenever an .idx
+        or .snap.json sidecar is replaced), and destroy_session resets the
+        gate when it leaves a history file behind. Names and ACP ids of
+        orphans come from the session catalog; only a history file the
+        catalog has never seen is scanned for its ACP session ID.
+        """
+        try:
+            with os.scandir(HISTORY_DIR) as entries:
+                history_ids = frozenset(e.name[:-6] for e in entries if e.name.endswith(".jsonl"))
+        except OSError:
+            return
+        if history_ids == self._orphan_scan_ids:
+            return
+        with self._lock:
+            active = set(self.sessions.keys())
         with _archived_lock:
-            archived = _load_archived_map()
-            tracked = active | set(archived.keys())
-            history_ids = {
-                os.path.basename(f)[:-6]  # strip .jsonl
-                for f in glob.glob(os.path.join(HISTORY_DIR, "*.jsonl"))
-            }
+            tracked = active | session_catalog.ids(session_catalog.ARCHIVED)
             orphaned = history_ids - tracked
-            if not orphaned:
-                return
-            # Get names from RAG
-            rag_names = {}
-            try:
-                coll = rag._get_collection()
-                results = coll.get(include=["metadatas"])
-                for meta in results["metadatas"]:
-                    sid = meta.get("session_id", "")
-                    name = meta.get("session_name", "")
-                    if sid and name:
-                        rag_names.setdefault(sid, name)
-            except Exception:
-                pass
-            for sid in orphaned:
-                fpath = os.path.join(HISTORY_DIR, f"{sid}.jsonl")
-                # Extract ACP session ID from history events so restore can reload context
-                acp_id = ""
-                try:
-                    with open(fpath) as hf:
-                        for line in hf:
-                            line = line.strip()
-                            if not line:
-                                continue
-                            try:
-                                obj = json.loads(line)
-                            except (json.JSONDecodeError, ValueError):
-                                continue
-                            # session/update notifications contain sessionId in params
-                            sid_val = (obj.get("params") or {}).get("sessionId", "")
-                            if not sid_val:
-                                # session/prompt results contain sessionId in result
-                                sid_val = (obj.get("result") or {}).get("sessionId", "")
-                            if sid_val:
-                                acp_id = sid_val
-                                break
-                except OSError:
-                    pass
-                archived[sid] = {
-                    "acp_id": acp_id,
-                    "name": rag_names.get(sid, "Chat-" + sid),
-                    "archived_at": os.path.getmtime(fpath),
-                }
-            _save_archived_map(archived)
-            logger.info(f"Recovered {len(orphaned)} orphaned sessions into archive")
+            if orphaned:
+                known = session_catalog.get_many(orphaned)
+                index_names = {}
+                if len(known) < len(orphaned):
+                    index_names = {sid: e.get("name") for sid, e in rag._load_index_state().items()}
+                for sid in orphaned:
+                    entry = known.get(sid) or {}
+                    acp_id = entry.get("acp_id") or self._scan_acp_id(sid)
+                    name = entry.get("name") or index_names.get(sid) or "Chat-" + sid
+                    session_catalog.set_state(
+                        sid,
+                        session_catalog.ARCHIVED,
+                        acp_id=acp_id or None,
+                        name=name,
+                        archived_at=os.path.getmtime(os.path.join(HISTORY_DIR, f"{sid}.jsonl")),
+                    )
+                logger.info(f"Recovered {len(orphaned)} orphaned sessions into archive")
+        self._orphan_scan_ids = history_ids
+
+    @staticmethod
+    def _scan_acp_id(session_id):
+        """ACP session ID from the first history events that carry one, or ""."""
+        for obj in history_store.get_store(session_id).read_events(0, ORPHAN_SCAN_EVENTS):
+            # session/update notifications contain sessionId in params
+            sid_val = (obj.get("params") or {}).get("sessionId", "")
+            if not sid_val:
+                # session/prompt results contain sessionId in result
+                sid_val = (obj.get("result") or {}).get("sessionId", "")
+            if sid_val:
+                return sid_val
+        return ""
+
+    def _save(self, session):
+        """Write one session's registry row; it is restored at startup once it has an ACP session."""
+        try:
+            session_catalog.set_state(
+                session.id,
+                session_catalog.ACTIVE if session.acp_session_id else None,
+                acp_id=session.acp_session_id,
+                name=session.display_name,
+                model=session.model,
+            )
+        except Exception as e:
+            logger.warning(f"[{session.id}] session registry write failed: {e}")
 
     def _load_existing(self, session_id, session, acp_session_id, continuation=None):
         try:
             logger.info(f"_load_existing: starting for {session_id} acp={acp_session_id}")
             session.load(acp_session_id)
             session.ready = True
-            logger.info(f"_load_existing: session {session_id} ready, history_len={len(session.history)}")
+            logger.info(f"_load_existing: session {session_id} ready, history_len={len(session.history)} timing={session.load_timing}")
             self._save_pid_map()
+            self._save(session)
             if session.on_event:
                 session.on_event(session_id, {"type": "session_ready"})
             if continuation and continuation.get("session_id") == session_id:
                 session.send_continuation(continuation["message"])
+            session._flush_queued_prompts()
         except Exception as e:
             logger.error(f"ACP session load failed for {session_id}: {e}", exc_info=True)
-            if session.on_event:
-                session.on_event(session_id, {"type": "session_error", "error": str(e)})
+            session._start_failed(str(e))
             self.destroy_session(session_id, delete_history=False)
 
     def get_session(self, session_id):
@@ -759,7 +1279,7 @@ class ACPManager:
         session.model = new_model
         session.ready = False
         session.stop()
-        self._save()
+        self._save(session)
         threading.Thread(
             target=self._change_model_reload,
             args=(session_id, session, acp_id),
@@ -785,7 +1305,7 @@ class ACPManager:
                 self.destroy_session(session_id, delete_history=False)
                 return
         session.ready = True
-        self._save()
+        self._save(session)
         self._save_pid_map()
         if session.on_event:
             session.on_event(session_id, {"type": "session_ready"})
@@ -796,11 +1316,10 @@ class ACPManager:
         if session:
             session.stop()
             if delete_history:
-                try:
-                    os.remove(session._history_path())
-                except OSError:
-                    pass
-        self._save()
+                history_store.delete_history(session_id)
+            else:
+                self._orphan_scan_ids = None  # its history file is an orphan now
+            session_catalog.set_state(session_id, None)
 
     def archive_session(self, session_id):
         """Stop the process and move session from active to archived. History is preserved."""
@@ -809,44 +1328,43 @@ class ACPManager:
         if not session:
             return
         acp_id = session.acp_session_id
-        name = session.display_name
         session.stop()
-        self._save()
-        if acp_id:
-            with _archived_lock:
-                archived = _load_archived_map()
-                archived[session_id] = {"acp_id": acp_id, "name": name, "archived_at": time.time()}
-                _save_archived_map(archived)
+        with _archived_lock:
+            session_catalog.set_state(
+                session_id,
+                session_catalog.ARCHIVED if acp_id else None,
+                name=session.display_name,
+                model=session.model,
+                archived_at=time.time(),
+            )
+        if not acp_id:
+            self._orphan_scan_ids = None  # picked up by orphan recovery instead
 
     def list_archived(self):
         self._recover_orphans()
-        items = sorted(
-            _load_archived_map().items(),
-            key=lambda x: x[1].get("archived_at", 0),
-            reverse=True,
-        )
-        return [{"id": sid, "name": info.get("name", "Chat-" + sid)} for sid, info in items]
+        archived = session_catalog.by_state(session_catalog.ARCHIVED)
+        return [{"id": sid, "name": info.get("name") or "Chat-" + sid} for sid, info in archived.items()]
 
     def restore_session(self, session_id, on_event=None):
         """Restore an archived session back to active."""
         # Run orphan recovery first in case this session has a history file but isn't tracked
         self._recover_orphans()
         with _archived_lock:
-            archived = _load_archived_map()
-            info = archived.get(session_id)
-            if not info:
+            info = session_catalog.get(session_id)
+            if not info or info.get("state") != session_catalog.ARCHIVED:
                 return False
-            acp_id = info["acp_id"]
+            acp_id = info.get("acp_id")
             can_load = acp_id and os.path.exists(os.path.join(KIRO_SESSIONS_DIR, f"{acp_id}.json"))
-            archived.pop(session_id)
-            _save_archived_map(archived)
+            session_catalog.set_state(session_id, None)
         session = ACPSession(session_id, on_event=on_event)
-        session.display_name = info.get("name", "Chat-" + session_id)
+        session.display_name = info.get("name") or "Chat-" + session_id
+        if info.get("model"):
+            session.model = info["model"]
         with self._lock:
             self.sessions[session_id] = session
         if can_load:
             session.acp_session_id = acp_id
-            self._save()
+            self._save(session)
             threading.Thread(
                 target=self._load_existing,
                 args=(session_id, session, acp_id),
@@ -862,14 +1380,8 @@ class ACPManager:
 
     def delete_archived(self, session_id):
         """Permanently delete an archived session and its history."""
-        with _archived_lock:
-            archived = _load_archived_map()
-            archived.pop(session_id, None)
-            _save_archived_map(archived)
-        try:
-            os.remove(os.path.join(HISTORY_DIR, f"{session_id}.jsonl"))
-        except OSError:
-            pass
+        session_catalog.forget(session_id)
+        history_store.delete_history(session_id)
         # Delete cached images and files for this session
         import shutil
         cache_dir = os.path.join(DATA_DIR, "image_cache", session_id)
@@ -883,23 +1395,15 @@ class ACPManager:
 
     def list_sessions(self):
         with self._lock:
-            return [{"id": sid, "name": s.display_name, "history_count": len(s.history)} for sid, s in self.sessions.items()]
+            sessions = list(self.sessions.items())
+        return [{"id": sid, "name": s.display_name, "history_count": s.history_count()} for sid, s in sessions]
 
     def rename_session(self, session_id, new_name):
         with self._lock:
             session = self.sessions.get(session_id)
         if session:
             session.display_name = new_name
-            self._save()
-
-    def _save(self):
-        with self._lock:
-            mapping = {
-                sid: {"acp_id": s.acp_session_id, "name": s.display_name, "model": s.model}
-                for sid, s in self.sessions.items()
-                if s.acp_session_id
-            }
-        _save_sessions_map(mapping)
+            self._save(session)
 
     def _save_pid_map(self):
         with self._lock:
@@ -908,3 +1412,4 @@ class ACPManager:
 
 
 acp_manager = ACPManager()
+atexit.register(acp_manager.warm_pool.shutdown)
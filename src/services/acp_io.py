@@ -0,0 +1,204 @@
+"""Shared I/O loop for kiro-cli subprocess pipes.
+
+One thread multiplexes every session's stdout and stderr with a selector
+(epoll on Linux) and hands complete messages to a small fixed pool of
+dispatch workers. Thread count and idle wakeups no longer grow with the
+number of sessions.
+
+Work submitted for one session key runs in FIFO order, one item at a time,
+so a session's events are never reordered; different sessions dispatch in
+parallel on the pool.
+"""
+
+import collections
+import logging
+import os
+import selectors
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK = 65536
+MAX_LINE_BYTES = 64 * 1024 * 1024  # a single JSON-RPC message larger than this is dropped
+TICK_SECONDS = 1.0  # select timeout; on_tick callbacks run at most this often
+DISPATCH_WORKERS = 4
+
+
+class LineFramer:
+    """Splits a byte stream into lines without re-copying the unconsumed tail.
+
+    Chunks append to one bytearray; a scan offset remembers how far it is
+    known to hold no newline, so a long line arriving in many reads is
+    scanned once. Complete lines are sliced out, and the consumed prefix is
+    deleted once per chunk rather than once per line. A line growing past
+    max_line is dropped (counted in `dropped`) up to its terminating newline.
+    """
+
+    def __init__(self, max_line=MAX_LINE_BYTES):
+        self.max_line = max_line
+        self.dropped = 0
+        self._buf = bytearray()
+        self._scan = 0
+        self._discarding = False
+
+    def feed(self, chunk):
+        """Add a chunk; return the complete lines it finished, without their newlines."""
+        buf = self._buf
+        buf += chunk
+        lines = []
+        start = 0
+        pos = self._scan
+        while True:
+            nl = buf.find(b"\n", pos)
+            if nl == -1:
+                break
+            if self._discarding:
+                self._discarding = False
+            else:
+                lines.append(bytes(buf[start:nl]))
+            start = pos = nl + 1
+        if start:
+            del buf[:start]
+        self._scan = len(buf)
+        if self._scan > self.max_line or (self._discarding and buf):
+            if not self._discarding:
+                self.dropped += 1
+            self._discarding = True
+            buf.clear()
+            self._scan = 0
+        return lines
+
+
+class KeyedDispatcher:
+    """Fixed worker pool running callables in per-key FIFO order."""
+
+    def __init__(self, workers=DISPATCH_WORKERS):
+        self.workers = workers
+        self._cond = threading.Condition()
+        self._queues = {}  # key -> deque of callables
+        self._ready = collections.deque()  # keys with queued work and no worker on them
+        self._scheduled = set()  # keys in _ready or being run
+        self._threads = []
+
+    def submit(self, key, fn):
+        with self._cond:
+            self._ensure_workers()
+            self._queues.setdefault(key, collections.deque()).append(fn)
+            if key not in self._scheduled:
+                self._scheduled.add(key)
+                self._ready.append(key)
+                self._cond.notify()
+
+    def _ensure_workers(self):
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._run, name=f"acp-dispatch-{len(self._threads)}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._ready:
+                    self._cond.wait()
+                key = self._ready.popleft()
+                fn = self._queues[key].popleft()
+            try:
+                fn()
+            except Exception as e:
+                logger.error(f"[{key}] dispatch error: {e}", exc_info=True)
+            with self._cond:
+                if self._queues[key]:
+                    self._ready.append(key)  # back of the line, so one busy session can't starve others
+                    self._cond.notify()
+                else:
+                    del self._queues[key]
+                    self._scheduled.discard(key)
+
+    def queue_depth(self):
+        with self._cond:
+            return sum(len(q) for q in self._queues.values())
+
+
+class PipeLoop:
+    """Single selector thread reading registered pipes.
+
+    `on_data(chunk)` and `on_eof()` run on the loop thread and must not
+    block; anything slow belongs on the dispatcher. `on_tick()` runs about
+    every TICK_SECONDS for housekeeping such as stall detection.
+    """
+
+    def __init__(self):
+        self._sel = selectors.DefaultSelector()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        self._sel.register(self._wake_r, selectors.EVENT_READ, None)
+        self._tickers = {}  # fileobj -> on_tick
+
+    def register(self, fileobj, on_data, on_eof, on_tick=None):
+        with self._lock:
+            self._sel.register(fileobj, selectors.EVENT_READ, (on_data, on_eof))
+            if on_tick:
+                self._tickers[fileobj] = on_tick
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="acp-io", daemon=True)
+                self._thread.start()
+        os.write(self._wake_w, b"\0")
+
+    def unregister(self, fileobj):
+        with self._lock:
+            self._tickers.pop(fileobj, None)
+            try:
+                self._sel.unregister(fileobj)
+            except (KeyError, ValueError):
+                pass
+
+    def pipe_count(self):
+        with self._lock:
+            return len(self._sel.get_map()) - 1
+
+    def _run(self):
+        next_tick = time.monotonic() + TICK_SECONDS
+        while True:
+            try:
+                events = self._sel.select(timeout=max(0.0, next_tick - time.monotonic()))
+            except OSError as e:
+                logger.error(f"acp-io select failed: {e}")
+                continue
+            for key, _ in events:
+                if key.data is None:
+                    try:
+                        os.read(self._wake_r, 4096)
+                    except BlockingIOError:
+                        pass
+                    continue
+                on_data, on_eof = key.data
+                try:
+                    chunk = os.read(key.fd, READ_CHUNK)
+                except (OSError, ValueError):
+                    chunk = b""
+                try:
+                    if chunk:
+                        on_data(chunk)
+                    else:
+                        self.unregister(key.fileobj)
+                        on_eof()
+                except Exception as e:
+                    logger.error(f"acp-io callback error: {e}", exc_info=True)
+            if time.monotonic() < next_tick:
+                continue
+            next_tick = time.monotonic() + TICK_SECONDS
+            with self._lock:
+                tickers = list(self._tickers.values())
+            for on_tick in tickers:
+                try:
+                    on_tick()
+                except Exception as e:
+                    logger.error(f"acp-io tick error: {e}")
+
+
+loop = PipeLoop()
+dispatcher = KeyedDispatcher()
@@ -0,0 +1,171 @@
+"""Timing and throughput metrics for ACP sessions, per session and per model.
+
+Each ACPSession owns a SessionMetrics. It follows the current prompt turn
+(time to first chunk, chunk and text rates, stdout bytes, turn duration) and
+records every JSON-RPC request's latency by method. Finished samples go into
+the session's own Stats and into the Stats of the session's model, so the
+per-model view survives the session being destroyed.
+
+Only counters are touched on the streaming path; quantiles are computed
+when a snapshot is taken.
+"""
+
+import collections
+import threading
+import time
+
+WINDOW = 256  # recent samples kept per series for p50/p95
+
+_lock = threading.Lock()  # guards every Stats; turn state has its own per-session lock
+_models = {}  # model -> Stats
+
+
+class Series:
+    """Count, sum, mean and max of every sample, plus p50/p95 over the last WINDOW."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent = collections.deque(maxlen=WINDOW)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self._recent.append(value)
+
+    def snapshot(self):
+        if not self.count:
+            return {"count": 0}
+        recent = sorted(self._recent)
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "mean": round(self.total / self.count, 3),
+            "p50": round(recent[len(recent) // 2], 3),
+            "p95": round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 3),
+            "max": round(self.max, 3),
+        }
+
+
+class Stats:
+    """Series and counters for one session or one model."""
+
+    SERIES = ("ttfc_s", "turn_s", "chunks_per_s", "chars_per_s", "stdout_bytes_per_s")
+
+    def __init__(self):
+        self.series = {name: Series() for name in self.SERIES}
+        self.rpc = {}  # method -> Series of latencies in seconds
+        self.rpc_failures = collections.Counter()  # method -> errors and timeouts
+        self.counters = collections.Counter()  # turns, retries, reloads, stdout_bytes
+
+    def snapshot(self):
+        return {
+            **{name: self.counters[name] for name in ("turns", "retries", "reloads", "stdout_bytes")},
+            **{name: s.snapshot() for name, s in self.series.items()},
+            "rpc": {
+                method: {**s.snapshot(), "failures": self.rpc_failures[method]}
+                for method, s in sorted(self.rpc.items())
+            },
+        }
+
+
+def _model_stats(model):
+    stats = _models.get(model)
+    if stats is None:
+        stats = _models[model] = Stats()
+    return stats
+
+
+def by_model():
+    """{model: snapshot} across every session that has run on it."""
+    with _lock:
+        return {model: stats.snapshot() for model, stats in sorted(_models.items())}
+
+
+class SessionMetrics:
+    """Metrics for one ACPSession; methods are called from its send and dispatch paths."""
+
+    def __init__(self):
+        self.stats = Stats()
+        self.stdout_bytes = 0  # written only by the I/O loop thread
+        self.last_turn = {}
+        self._turn_lock = threading.Lock()
+        self._turn = None  # state of the prompt turn in flight
+
+    def stdout(self, nbytes):
+        self.stdout_bytes += nbytes
+
+    def prompt_sent(self):
+        with self._turn_lock:
+            self._turn = {"start": time.monotonic(), "first": None, "last": None,
+                          "chunks": 0, "chars": 0, "bytes": self.stdout_bytes}
+
+    def chunk(self, nchars):
+        now = time.monotonic()
+        with self._turn_lock:
+            turn = self._turn
+            if turn is None:
+                return
+            if turn["first"] is None:
+                turn["first"] = now
+            turn["last"] = now
+            turn["chunks"] += 1
+            turn["chars"] += nchars
+
+    def turn_ended(self, model, stop_reason):
+        end = time.monotonic()
+        with self._turn_lock:
+            turn, self._turn = self._turn, None
+        if turn is None:
+            return
+        duration = end - turn["start"]
+        nbytes = self.stdout_bytes - turn["bytes"]
+        samples = {"turn_s": duration}
+        if turn["first"] is not None:
+            samples["ttfc_s"] = turn["first"] - turn["start"]
+            span = turn["last"] - turn["first"]
+            if turn["chunks"] > 1 and span > 0:
+                samples["chunks_per_s"] = (turn["chunks"] - 1) / span
+                samples["chars_per_s"] = turn["chars"] / span
+        if duration > 0:
+            samples["stdout_bytes_per_s"] = nbytes / duration
+        self.last_turn = {"stop_reason": stop_reason, "chunks": turn["chunks"], "chars": turn["chars"],
+                          "stdout_bytes": nbytes, **{k: round(v, 3) for k, v in samples.items()}}
+        ok = stop_reason != "error"
+        with _lock:
+            for stats in (self.stats, _model_stats(model)):
+                stats.counters["turns"] += 1
+                stats.counters["stdout_bytes"] += nbytes
+                for name, value in samples.items():
+                    stats.series[name].add(value)
+                _add_rpc(stats, "session/prompt", duration, ok)
+
+    def rpc(self, model, method, seconds, ok):
+        with _lock:
+            for stats in (self.stats, _model_stats(model)):
+                _add_rpc(stats, method, seconds, ok)
+
+    def count(self, model, counter):
+        """Bump "retries" or "reloads"."""
+        with _lock:
+            for stats in (self.stats, _model_stats(model)):
+                stats.counters[counter] += 1
+
+    def snapshot(self):
+        with _lock:
+            snap = self.stats.snapshot()
+        snap["stdout_bytes"] = self.stdout_bytes
+        snap["in_turn"] = self._turn is not None
+        snap["last_turn"] = self.last_turn
+        return snap
+
+
+def _add_rpc(stats, method, seconds, ok):
+    series = stats.rpc.get(method)
+    if series is None:
+        series = stats.rpc[method] = Series()
+    series.add(seconds)
+    if not ok:
+        stats.rpc_failures[method] += 1
@@ -0,0 +1,122 @@
+"""Content-addressed cache of chunk embeddings, stored in SQLite with LRU eviction.
+
+Keyed by sha256(model namespace + chunk text), so re-indexing a session,
+restoring it, or embedding boilerplate shared by many chats reuses vectors
+instead of running the embedding model again.
+"""
+
+import array
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+CACHE_DB = os.path.join(DATA_DIR, "rag_embeddings.db")
+CACHE_MAX_ENTRIES = 100_000  # ~150 MB of 384-dim float32 vectors
+EVICT_TO = 0.9  # evict down to this fraction of the cap, so eviction runs rarely
+
+
+class EmbeddingCache:
+    def __init__(self, path=None, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path or CACHE_DB
+        self.max_entries = max_entries
+        self._conn = None
+        self._lock = threading.Lock()
+        self._entries = None
+        self._clock = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _db(self):
+        """Connection, created on first use. Callers hold _lock."""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings(last_used)")
+            self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return self._conn
+
+    @staticmethod
+    def _key(namespace, text):
+        return hashlib.sha256(f"{namespace}\0{text}".encode()).hexdigest()
+
+    def embed(self, documents, embed_fn, namespace=""):
+        """Vectors for `documents`, calling `embed_fn` (a batch function) only for cache misses.
+
+        `namespace` identifies the model, so switching models never serves stale vectors.
+        """
+        keys = [self._key(namespace, doc) for doc in documents]
+        with self._lock:
+            # Strictly increasing per call, so LRU order is exact even within one clock tick
+            now = self._clock = max(time.time(), self._clock + 1e-6)
+            conn = self._db()
+            found = {}
+            unique = list(dict.fromkeys(keys))
+            for i in range(0, len(unique), 500):  # stay under SQLite's bound-parameter limit
+                batch = unique[i:i + 500]
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                found.update((k, array.array("f", v).tolist()) for k, v in rows)
+            if found:
+                with conn:
+                    conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+            hits = sum(1 for k in keys if k in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        missing = [k for k in unique if k not in found]
+        if missing:
+            text_of = dict(zip(keys, documents))
+            vectors = embed_fn([text_of[k] for k in missing])
+            computed = {k: [float(x) for x in v] for k, v in zip(missing, vectors)}
+            with self._lock:
+                conn = self._db()
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                        [(k, array.array("f", v).tobytes(), now) for k, v in computed.items()],
+                    )
+                self._entries += len(computed)
+                if self._entries > self.max_entries:
+                    self._evict(conn)
+            found.update(computed)
+        return [found[k] for k in keys]
+
+    def _evict(self, conn):
+        """Drop least-recently-used entries down to EVICT_TO of the cap. Caller holds _lock."""
+        total = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = total - int(self.max_entries * EVICT_TO)
+        if excess > 0:
+            with conn:
+                conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+            self.evictions += excess
+            logger.info(f"Evicted {excess} cached embeddings")
+        self._entries = total - max(excess, 0)
+
+    def stats(self):
+        with self._lock:
+            self._db()
+            entries = self._entries
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+cache = EmbeddingCache()
@@ -0,0 +1,772 @@
+"""Segmented, indexed storage for ACP chat history.
+
+Each session's events live in ``data/chat_history/<id>.jsonl`` (the active
+segment) plus any sealed segments ``<id>.jsonl.<n>`` rotated out once the
+active file grows past SEGMENT_MAX_BYTES. A sidecar ``<id>.idx`` holds an
+append-only list of checkpoints — (event index, segment, byte offset) and,
+for events that open a turn, the turn index — so ranges of events or turns
+can be served by seeking instead of parsing the whole conversation.
+
+Turn boundaries follow rag._extract_turns: every ``user_prompt`` or
+``continuation`` event starts a new turn.
+"""
+
+import bisect
+import concurrent.futures
+import glob
+import logging
+import atexit
+import os
+import queue
+import threading
+import time
+
+from src.services import json_codec
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+HISTORY_DIR = os.path.join(DATA_DIR, "chat_history")
+
+SEGMENT_MAX_BYTES = 16 * 1024 * 1024  # rotate the active segment past this size
+CHECKPOINT_EVERY = 256  # max events between two checkpoints
+GROUP_COMMIT_INTERVAL = 0.005  # seconds the writer gathers appends before committing
+GROUP_COMMIT_EVENTS = 512  # ...or commit as soon as this many events are waiting
+WRITER_QUEUE_MAX = 10000  # bounded: producers block rather than buffer without limit
+
+TURN_START_TYPES = ("user_prompt", "continuation")
+# Cheap pre-filter so index rebuilds only json-parse candidate turn starts
+# (separator-agnostic: lines may be written with or without spaces)
+_TURN_MARKERS = tuple(f'"{t}"'.encode() for t in TURN_START_TYPES)
+
+
+def is_turn_start(entry):
+    return isinstance(entry, dict) and entry.get("type") in TURN_START_TYPES
+
+
+def text_chunk(entry):
+    """Return the text of an agent_message_chunk text event, else None."""
+    if not isinstance(entry, dict) or entry.get("method") != "session/update":
+        return None
+    update = (entry.get("params") or {}).get("update") or {}
+    if update.get("sessionUpdate") != "agent_message_chunk":
+        return None
+    content = update.get("content") or {}
+    if content.get("type") != "text":
+        return None
+    return content.get("text", "")
+
+
+def raw_count(entry):
+    """How many streamed events an entry stands for; merged text runs record it in "chunks"."""
+    n = entry.get("chunks") if isinstance(entry, dict) else None
+    return n if isinstance(n, int) and n > 0 else 1
+
+
+def _with_text(entry, text):
+    params = entry.get("params") or {}
+    update = params.get("update") or {}
+    content = update.get("content") or {}
+    return {**entry, "params": {**params, "update": {**update, "content": {**content, "text": text}}}}
+
+
+def coalesce_text_chunks(events):
+    """Merge runs of adjacent agent_message_chunk text events into one event each.
+
+    The merged event is the first chunk of the run (so it keeps that chunk's
+    ts, model and sessionId) carrying the concatenated text; a missing ts or
+    model is taken from the first later chunk that has one. It records how
+    many streamed events it replaces in "chunks", so raw history offsets
+    held by clients stay valid after the history is reloaded from disk.
+    """
+    out = []
+    parts = []  # texts of the run ending at out[-1]
+    run = []  # events of that run
+    for evt in events + [None]:
+        text = text_chunk(evt) if evt is not None else None
+        if text is not None:
+            parts.append(text)
+            run.append(evt)
+            if len(run) == 1:
+                out.append(evt)
+            continue
+        if len(run) > 1:
+            merged = _with_text(run[0], "".join(parts))
+            merged["chunks"] = sum(raw_count(e) for e in run)
+            for key in ("ts", "model"):
+                if key not in merged:
+                    val = next((e[key] for e in run if key in e), None)
+                    if val is not None:
+                        merged[key] = val
+            out[-1] = merged
+        parts, run = [], []
+        if evt is not None:
+            out.append(evt)
+    return out
+
+
+class CollapsedHistory:
+    """Incrementally maintained, chunk-coalesced view of a live history list.
+
+    Replaying a session to a subscriber needs the history with text chunks
+    merged. Rather than re-collapsing the whole list on every subscribe, the
+    view consumes only entries appended since the last call and remembers
+    the raw offset each collapsed entry starts at, so any raw offset can be
+    served by slicing. Raw offsets count streamed events, not list entries:
+    a run merged on disk counts as its "chunks", so an offset a client took
+    from the live list still lines up after a reload. It also tracks where
+    each turn starts, for windowed replay, and the latest step_progress
+    event per pipeline for reconnect catch-up.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, source):
+        self._source = source
+        self._seen = 0  # list entries consumed
+        self._raw = 0  # raw offset after the consumed entries
+        self._events = []  # collapsed entries; the last may be an open text run
+        self._starts = []  # raw offset where each collapsed entry starts
+        self._idx = []  # list index where each collapsed entry starts
+        self._run = []  # raw chunk events of the open text run, if any
+        self._turn_starts = []  # collapsed index where each turn starts
+        self._step_progress = {}  # pipeline_id -> latest step_progress event
+
+    def _sync(self, history):
+        if history is not self._source or len(history) < self._seen:
+            self._reset(history)
+        end = len(history)
+        for i in range(self._seen, end):
+            evt = history[i]
+            raw = self._raw
+            self._raw += raw_count(evt)
+            if text_chunk(evt) is not None:
+                if not self._run:
+                    self._events.append(evt)
+                    self._starts.append(raw)
+                    self._idx.append(i)
+                self._run.append(evt)
+                continue
+            self._close_run()
+            if is_turn_start(evt):
+                self._turn_starts.append(len(self._events))
+            self._events.append(evt)
+            self._starts.append(raw)
+            self._idx.append(i)
+            if isinstance(evt, dict) and evt.get("type") == "step_progress":
+                pid = (evt.get("data") or {}).get("pipeline_id")
+                if pid:
+                    self._step_progress.pop(pid, None)
+                    self._step_progress[pid] = evt
+        self._seen = end
+
+    def _close_run(self):
+        if len(self._run) > 1:
+            self._events[-1] = coalesce_text_chunks(self._run)[0]
+        self._run = []
+
+    def length(self, history):
+        """Raw length of the history: the offset a client that has seen all of it holds."""
+        with self._lock:
+            self._sync(history)
+            return self._raw
+
+    def since(self, history, offset=0):
+        """Collapsed events covering raw offsets [offset, length)."""
+        with self._lock:
+            self._sync(history)
+            offset = max(offset, 0)
+            if offset >= self._raw:
+                return []
+            k = bisect.bisect_right(self._starts, offset) - 1
+            if self._starts[k] == offset:
+                head, rest = [], self._events[k:]
+            else:
+                # offset lands inside a text run: replay only its unseen tail. An entry
+                # merged on disk can't be split, so one straddling the offset is resent whole.
+                run_end = self._idx[k + 1] if k + 1 < len(self._idx) else self._seen
+                pos, tail = self._starts[k], []
+                for evt in history[self._idx[k]:run_end]:
+                    n = raw_count(evt)
+                    if pos + n > offset:
+                        tail.append(evt)
+                    pos += n
+                head, rest = coalesce_text_chunks(tail), self._events[k + 1:]
+            if rest and len(self._run) > 1:
+                rest[-1] = coalesce_text_chunks(self._run)[0]  # materialize the open run
+            return head + rest
+
+    def turn_count(self, history):
+        with self._lock:
+            self._sync(history)
+            return len(self._turn_starts)
+
+    def turns(self, history, start=0, end=None):
+        """Collapsed events of turns [start, end); the pre-turn preamble rides with turn 0."""
+        with self._lock:
+            self._sync(history)
+            total = len(self._turn_starts)
+            end = total if end is None else min(end, total)
+            if start >= end:
+                return []
+            lo = self._turn_starts[start] if start > 0 else 0
+            hi = self._turn_starts[end] if end < total else len(self._events)
+            events = self._events[lo:hi]
+            if hi == len(self._events) and len(self._run) > 1:
+                events[-1] = coalesce_text_chunks(self._run)[0]
+            return events
+
+    def latest_step_progress(self, history):
+        """Newest step_progress event per pipeline, most recently updated first."""
+        with self._lock:
+            self._sync(history)
+            return list(reversed(self._step_progress.values()))
+
+
+def _line_is_turn_start(line):
+    if not any(m in line for m in _TURN_MARKERS):
+        return False
+    try:
+        return is_turn_start(json_codec.loads(line))
+    except ValueError:
+        return False
+
+
+def _parse_lines(lines):
+    events = []
+    for line in lines:
+        line = line.strip()
+        if line:
+            try:
+                events.append(json_codec.loads(line))
+            except ValueError:
+                pass
+    return events
+
+
+class HistoryStore:
+    """Append-only event log for one chat session, with an offset index.
+
+    Read-only stores (used from other processes, e.g. the MCP servers) never
+    modify files; they rebuild any missing index entries in memory only.
+    """
+
+    def __init__(self, session_id, history_dir=None, readonly=False):
+        self.session_id = session_id
+        self.history_dir = history_dir or HISTORY_DIR
+        self.readonly = readonly
+        self._lock = threading.Lock()
+        self._cp_events = []  # event index of each checkpoint (sorted)
+        self._cps = []  # (segment, byte offset) of each checkpoint
+        self._turn_events = []  # event index where turn N starts
+        self._count = 0  # total events across all segments
+        self._active_seg = 1
+        self._active_size = 0
+        self._loaded = False
+        self._fh = None  # persistent append handle on the active segment
+
+    # --- paths ---
+
+    @property
+    def path(self):
+        return os.path.join(self.history_dir, f"{self.session_id}.jsonl")
+
+    @property
+    def index_path(self):
+        return os.path.join(self.history_dir, f"{self.session_id}.idx")
+
+    @property
+    def snapshot_path(self):
+        return os.path.join(self.history_dir, f"{self.session_id}.snap.json")
+
+    def _segment_path(self, seg):
+        return self.path if seg >= self._active_seg else f"{self.path}.{seg}"
+
+    def _sealed_segments(self):
+        segs = []
+        for p in glob.glob(glob.escape(self.path) + ".*"):
+            suffix = p.rsplit(".", 1)[1]
+            if suffix.isdigit():
+                segs.append(int(suffix))
+        return sorted(segs)
+
+    # --- index maintenance ---
+
+    def _ensure_loaded(self):
+        if self._loaded and not self.readonly:
+            return
+        sealed = self._sealed_segments()
+        active_seg = (sealed[-1] + 1) if sealed else 1
+        if self._loaded:
+            # Another process owns the writes; pick up whatever it appended since
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                size = 0
+            if active_seg == self._active_seg and size == self._active_size:
+                return
+            self._active_seg = active_seg
+            self._reconcile()
+            return
+        self._active_seg = active_seg
+        if not self._read_index():
+            self._reset_index()
+        self._reconcile()
+        self._loaded = True
+
+    def _reset_index(self):
+        self._cp_events, self._cps, self._turn_events = [], [], []
+        if not self.readonly:
+            try:
+                os.remove(self.index_path)
+            except OSError:
+                pass
+
+    def _read_index(self):
+        """Load checkpoints from the sidecar; False if it is missing or stale."""
+        try:
+            with open(self.index_path, "rb") as f:
+                records = _parse_lines(f)
+        except OSError:
+            return False
+        sizes = {}
+        for rec in records:
+            try:
+                e, seg, off = rec["e"], rec["s"], rec["o"]
+            except (KeyError, TypeError):
+                continue
+            if self._cp_events and e <= self._cp_events[-1]:
+                continue
+            if seg not in sizes:
+                try:
+                    sizes[seg] = os.path.getsize(self._segment_path(seg))
+                except OSError:
+                    sizes[seg] = -1
+            if off >= sizes[seg]:
+                logger.warning(f"[{self.session_id}] stale history index, rebuilding")
+                return False
+            self._cp_events.append(e)
+            self._cps.append((seg, off))
+            if "t" in rec:
+                if rec["t"] != len(self._turn_events):
+                    return False
+                self._turn_events.append(e)
+        return bool(self._cp_events)
+
+    def _add_checkpoint(self, event_idx, seg, offset, turn_start):
+        """Record a checkpoint in memory and return its index-file line."""
+        rec = {"e": event_idx, "s": seg, "o": offset}
+        if turn_start:
+            rec["t"] = len(self._turn_events)
+            self._turn_events.append(event_idx)
+        self._cp_events.append(event_idx)
+        self._cps.append((seg, offset))
+        return json_codec.dumps(rec) + "\n"
+
+    def _write_index(self, lines, fsync=False):
+        if lines and not self.readonly:
+            created = not os.path.exists(self.index_path)
+            with open(self.index_path, "a") as f:
+                f.writelines(lines)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            if created:
+                os.chmod(self.index_path, 0o600)
+
+    def _needs_checkpoint(self, event_idx, offset, turn_start):
+        return (
+            turn_start
+            or offset == 0
+            or not self._cp_events
+            or event_idx - self._cp_events[-1] >= CHECKPOINT_EVERY
+        )
+
+    def _reconcile(self):
+        """Index any events written after the last checkpoint (crash or legacy file)."""
+        if self._cp_events:
+            start_seg, start_off = self._cps[-1]
+            event_idx = self._cp_events[-1]
+        else:
+            start_seg, start_off, event_idx = 1, 0, 0
+        new_records = []
+        for seg in range(start_seg, self._active_seg + 1):
+            path = self._segment_path(seg)
+            offset = start_off if seg == start_seg else 0
+            # The checkpoint we resume from already covers its own line
+            skip_first = seg == start_seg and bool(self._cp_events)
+            try:
+                f = open(path, "rb")
+            except OSError:
+                continue
+            with f:
+                f.seek(offset)
+                torn = False
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        torn = True
+                        break
+                    if line.strip():
+                        if skip_first:
+                            skip_first = False
+                        else:
+                            turn = _line_is_turn_start(line)
+                            if self._needs_checkpoint(event_idx, offset, turn):
+                                new_records.append(self._add_checkpoint(event_idx, seg, offset, turn))
+                        event_idx += 1
+                    offset += len(line)
+            if torn and seg == self._active_seg and not self.readonly:
+                # Partial line from a crash mid-write: drop it so appends stay line-aligned
+                os.truncate(path, offset)
+                logger.warning(f"[{self.session_id}] truncated partial history line at byte {offset}")
+            if seg == self._active_seg:
+                self._active_size = offset
+        self._write_index(new_records)
+        self._count = event_idx
+
+    # --- writing ---
+
+    def append(self, entries, fsync=False):
+        """Append events to the active segment, rotating and indexing as needed.
+
+        Written with a single write() on a persistent handle; `fsync` forces
+        data and index to stable storage (used at turn ends). Returns the
+        number of bytes written.
+        """
+        if self.readonly:
+            raise PermissionError("history store opened read-only")
+        if not entries:
+            if fsync:
+                with self._lock:
+                    if self._fh is not None:
+                        os.fsync(self._fh.fileno())
+            return 0
+        with self._lock:
+            self._ensure_loaded()
+            if self._active_size >= SEGMENT_MAX_BYTES:
+                self._rotate()
+            if self._fh is None:
+                os.makedirs(self.history_dir, exist_ok=True)
+                created = not os.path.exists(self.path)
+                self._fh = open(self.path, "ab")
+                if created:
+                    os.chmod(self.path, 0o600)
+            index_lines = []
+            lines = []
+            for entry in entries:
+                line = json_codec.dumps_bytes(entry) + b"\n"
+                turn = is_turn_start(entry)
+                if self._needs_checkpoint(self._count, self._active_size, turn):
+                    index_lines.append(self._add_checkpoint(self._count, self._active_seg, self._active_size, turn))
+                lines.append(line)
+                self._active_size += len(line)
+                self._count += 1
+            data = b"".join(lines)
+            self._fh.write(data)
+            self._fh.flush()
+            if fsync:
+                os.fsync(self._fh.fileno())
+            # Data before index: a crash in between is repaired by _reconcile on next open
+            self._write_index(index_lines, fsync=fsync)
+            return len(data)
+
+    def close(self):
+        """Release the persistent append handle (reopened on the next append)."""
+        with self._lock:
+            self._close_fh()
+
+    def _close_fh(self):
+        if self._fh is not None:
+            try:
+                self._fh.close()
+            except OSError:
+                pass
+            self._fh = None
+
+    def _rotate(self):
+        self._close_fh()
+        sealed = f"{self.path}.{self._active_seg}"
+        os.replace(self.path, sealed)
+        logger.info(f"[{self.session_id}] rotated history segment {self._active_seg} ({self._active_size} bytes)")
+        self._active_seg += 1
+        self._active_size = 0
+
+    def delete(self):
+        """Remove all segments and the index."""
+        with self._lock:
+            self._close_fh()
+            paths = [self.path, self.index_path, self.snapshot_path]
+            paths += glob.glob(glob.escape(self.path) + ".*")
+            for p in paths:
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+            self._cp_events, self._cps, self._turn_events = [], [], []
+            self._count = 0
+            self._active_seg = 1
+            self._active_size = 0
+            self._loaded = False
+
+    # --- reading ---
+
+    def count(self):
+        with self._lock:
+            self._ensure_loaded()
+            return self._count
+
+    def turn_count(self):
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._turn_events)
+
+    def size_bytes(self):
+        """Total on-disk size of all segments."""
+        total = 0
+        for p in [self.path] + glob.glob(glob.escape(self.path) + ".*"):
+            try:
+                total += os.path.getsize(p)
+            except OSError:
+                pass
+        return total
+
+    def turn_event_index(self, turn):
+        """Event index at which `turn` starts (or the event count past the last turn)."""
+        with self._lock:
+            self._ensure_loaded()
+            if turn < len(self._turn_events):
+                return self._turn_events[turn]
+            return self._count
+
+    def read_events(self, start=0, end=None):
+        """Return events [start, end) by seeking to the nearest checkpoint."""
+        with self._lock:
+            self._ensure_loaded()
+            end = self._count if end is None else min(end, self._count)
+            start = max(start, 0)
+            if start >= end or not self._cp_events:
+                return []
+            i = bisect.bisect_right(self._cp_events, start) - 1
+            event_idx = self._cp_events[i]
+            seg, offset = self._cps[i]
+            # Open under the lock so a concurrent rotation can't swap files underneath us
+            files = []
+            for s in range(seg, self._active_seg + 1):
+                try:
+                    files.append(open(self._segment_path(s), "rb"))
+                except OSError:
+                    pass
+        lines = []
+        try:
+            for f in files:
+                f.seek(offset)
+                offset = 0
+                for line in f:
+                    if event_idx >= end or not line.endswith(b"\n"):
+                        break
+                    if not line.strip():
+                        continue
+                    if event_idx >= start:
+                        lines.append(line)
+                    event_idx += 1
+                if event_idx >= end:
+                    break
+        finally:
+            for f in files:
+                f.close()
+        return _parse_lines(lines)
+
+    def read_turns(self, start=0, end=None):
+        """Return the events of turns [start, end), excluding any pre-turn preamble."""
+        with self._lock:
+            self._ensure_loaded()
+            turns = len(self._turn_events)
+            end = turns if end is None else min(end, turns)
+            if start >= end:
+                return []
+            first = self._turn_events[start]
+            last = self._turn_events[end] if end < turns else self._count
+        return self.read_events(first, last)
+
+    def load_all(self):
+        return self.read_events(0)
+
+    def collapsed_turns(self, start=0, end=None):
+        """Chunk-coalesced events of turns [start, end), read by seeking.
+
+        Matches CollapsedHistory.turns: the pre-turn preamble rides with turn 0.
+        """
+        if start > 0:
+            events = self.read_turns(start, end)
+        else:
+            events = self.read_events(0, None if end is None else self.turn_event_index(end))
+        return coalesce_text_chunks(events)
+
+    def collapsed(self):
+        """Whole history with text chunks coalesced, cached in a snapshot file.
+
+        The snapshot is keyed by event count, so it is reused until the
+        session records anything new (archived sessions never do).
+        """
+        count = self.count()
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                snap = json_codec.loads(f.read())
+            if snap.get("count") == count:
+                return snap["events"]
+        except (OSError, ValueError, AttributeError, KeyError):
+            pass
+        events = coalesce_text_chunks(self.load_all())
+        if not self.readonly and events:
+            tmp = self.snapshot_path + ".tmp"
+            try:
+                with open(tmp, "wb") as f:
+                    f.write(json_codec.dumps_bytes({"count": count, "events": events}))
+                os.chmod(tmp, 0o600)
+                os.replace(tmp, self.snapshot_path)
+            except OSError as e:
+                logger.warning(f"[{self.session_id}] history snapshot write failed: {e}")
+        return events
+
+
+class HistoryWriter:
+    """Per-process writer thread that group-commits history appends.
+
+    Producers (the ACP stdout reader threads) enqueue entries and return
+    immediately; the writer gathers whatever arrives within
+    GROUP_COMMIT_INTERVAL (or GROUP_COMMIT_EVENTS events) and commits it
+    with one write per store. Synchronous submits — turn ends — are fsynced
+    and block the caller until they are on disk, preserving the guarantee
+    that a finished turn survives a crash; a failed write is raised to them.
+    """
+
+    def __init__(self, interval=GROUP_COMMIT_INTERVAL, max_events=GROUP_COMMIT_EVENTS, max_queue=WRITER_QUEUE_MAX):
+        self.interval = interval
+        self.max_events = max_events
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._unsynced = {}  # id(store) -> store appended without fsync since the last flush
+        self.events_written = 0
+        self.bytes_written = 0
+        self.commits = 0
+
+    def _ensure_started(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if not (self._thread and self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, store, entries, sync=False, timeout=30):
+        """Queue entries for `store`; with sync, wait until they are fsynced.
+
+        A sync submit raises the OSError if its store's write failed, so the
+        caller knows the entries are not on disk.
+        """
+        done = concurrent.futures.Future() if sync else None
+        self._ensure_started()
+        self._queue.put((store, list(entries), sync, done))
+        if done:
+            try:
+                done.result(timeout)
+            except concurrent.futures.TimeoutError:
+                logger.warning(f"history writer: sync submit timed out after {timeout}s")
+
+    def flush(self, timeout=30):
+        """Block until everything queued so far is committed and fsynced.
+
+        Stores written without fsync since the last flush are fsynced too.
+        """
+        if self._thread and self._thread.is_alive():
+            self.submit(None, [], sync=True, timeout=timeout)
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            pending = len(batch[0][1])
+            deadline = time.monotonic() + self.interval
+            while not batch[-1][2] and pending < self.max_events:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                pending += len(item[1])
+            self._commit(batch)
+
+    def _commit(self, batch):
+        grouped = {}  # id(store) -> [store, entries, sync]; insertion order keeps per-store FIFO
+        flush = False
+        for store, entries, sync, _ in batch:
+            if store is None:
+                flush = True
+                continue
+            group = grouped.setdefault(id(store), [store, [], False])
+            group[1].extend(entries)
+            group[2] = group[2] or sync
+        failed = {}  # id(store) -> error
+        for key, (store, entries, sync) in grouped.items():
+            sync = sync or flush
+            try:
+                self.bytes_written += store.append(entries, fsync=sync)
+                self.events_written += len(entries)
+            except Exception as e:
+                failed[key] = e
+                logger.warning(f"[{store.session_id}] history write error: {e}")
+                continue
+            if sync:
+                self._unsynced.pop(key, None)
+            else:
+                self._unsynced[key] = store
+        if flush:
+            unsynced, self._unsynced = self._unsynced, {}
+            for key, store in unsynced.items():
+                try:
+                    store.append([], fsync=True)
+                except Exception as e:
+                    failed[key] = e
+                    logger.warning(f"[{store.session_id}] history fsync error: {e}")
+        self.commits += 1
+        for store, _, _, done in batch:
+            if done:
+                error = next(iter(failed.values()), None) if store is None else failed.get(id(store))
+                if error:
+                    done.set_exception(error)
+                else:
+                    done.set_result(None)
+
+
+writer = HistoryWriter()
+atexit.register(writer.flush, 5)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(session_id, readonly=False):
+    """Return the shared HistoryStore for a session (one per process)."""
+    key = (session_id, readonly)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = HistoryStore(session_id, readonly=readonly)
+        return store
+
+
+def delete_history(session_id):
+    """Delete a session's history segments and index."""
+    with _stores_lock:
+        stores = [_stores.pop((session_id, ro), None) for ro in (False, True)]
+    store = next((s for s in stores if s), None) or HistoryStore(session_id)
+    store.delete()
@@ -0,0 +1,96 @@
+"""JSON codec for the hot paths: orjson or ujson when installed, stdlib json otherwise.
+
+Set JSON_CODEC=orjson|ujson|json to force a backend. All backends:
+  - loads() accepts str or bytes and raises ValueError subclasses on bad input
+  - dumps() returns str; fast backends honor indent=2 and emit compact
+    separators, any other keyword arguments (separators included) fall back
+    to stdlib json
+  - dumps_bytes() returns UTF-8 bytes, for writing straight to pipes and files
+Objects a fast backend can't encode (e.g. ints over 64 bits) fall back to stdlib.
+
+Also usable as the json module for Socket.IO (SocketIO(json=json_codec)).
+"""
+
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+_FAST_KWARGS = {"indent"}
+
+
+def _backend():
+    wanted = os.environ.get("JSON_CODEC", "").lower()
+    for name in (wanted,) if wanted else ("orjson", "ujson"):
+        if name in ("json", "stdlib"):
+            return "json", None
+        try:
+            return name, __import__(name)
+        except ImportError:
+            if wanted:
+                logger.warning(f"JSON_CODEC={wanted} is not installed, using stdlib json")
+    return "json", None
+
+
+BACKEND, _impl = _backend()
+
+
+def _fast(kwargs):
+    return kwargs.keys() <= _FAST_KWARGS and kwargs.get("indent") in (None, 2)
+
+
+if BACKEND == "orjson":
+    _OPTS = _impl.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj):
+        try:
+            return _impl.dumps(obj, option=_OPTS)
+        except TypeError:
+            return json.dumps(obj).encode()
+
+    def dumps(obj, **kwargs):
+        if _fast(kwargs):
+            try:
+                return _impl.dumps(obj, option=_OPTS | (_impl.OPT_INDENT_2 if kwargs.get("indent") else 0)).decode()
+            except TypeError:
+                pass
+        return json.dumps(obj, **kwargs)
+
+    def loads(s, **kwargs):
+        return json.loads(s, **kwargs) if kwargs else _impl.loads(s)
+
+elif BACKEND == "ujson":
+
+    def dumps(obj, **kwargs):
+        if _fast(kwargs):
+            try:
+                return _impl.dumps(obj, ensure_ascii=False, escape_forward_slashes=False, indent=kwargs.get("indent") or 0)
+            except (TypeError, OverflowError):
+                pass
+        return json.dumps(obj, **kwargs)
+
+    def dumps_bytes(obj):
+        return dumps(obj).encode()
+
+    def loads(s, **kwargs):
+        return json.loads(s, **kwargs) if kwargs else _impl.loads(s)
+
+else:
+
+    def dumps(obj, **kwargs):
+        return json.dumps(obj, **kwargs)
+
+    def dumps_bytes(obj):
+        return json.dumps(obj).encode()
+
+    def loads(s, **kwargs):
+        return json.loads(s, **kwargs)
+
+
+def load(f):
+    return loads(f.read())
+
+
+def dump(obj, f, **kwargs):
+    f.write(dumps(obj, **kwargs))
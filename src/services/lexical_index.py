@@ -0,0 +1,203 @@
+"""BM25 lexical index over the RAG chunks, backed by SQLite FTS5.
+
+Mirrors the chunks rag.py stores in ChromaDB (same ids, documents and
+metadata) so exact identifiers — error codes, file names, ticket numbers —
+that embeddings blur together can still be found. The database is opened in
+WAL mode so the MCP servers can search while the Flask process indexes.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+DB_PATH = os.path.join(DATA_DIR, "rag_lexical.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    chunk_id TEXT UNIQUE NOT NULL,
+    session_id TEXT NOT NULL,
+    session_name TEXT,
+    turn_index INTEGER,
+    text TEXT NOT NULL,
+    ts REAL,
+    model TEXT
+);
+CREATE INDEX IF NOT EXISTS docs_session ON docs(session_id, turn_index);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+    text, content='docs', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS docs_ai AFTER INSERT ON docs BEGIN
+    INSERT INTO docs_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS docs_ad AFTER DELETE ON docs BEGIN
+    INSERT INTO docs_fts(docs_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS docs_au AFTER UPDATE OF text ON docs BEGIN
+    INSERT INTO docs_fts(docs_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    INSERT INTO docs_fts(rowid, text) VALUES (new.id, new.text);
+END;
+"""
+
+_conn = None
+_lock = threading.Lock()
+
+
+def _db():
+    """Process-wide connection, created on first use. Callers hold _lock."""
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+        _conn = sqlite3.connect(DB_PATH, check_same_thread=False, timeout=10)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.executescript(_SCHEMA)
+        columns = {row[1] for row in _conn.execute("PRAGMA table_info(docs)")}
+        for column, kind in (("ts", "REAL"), ("model", "TEXT")):
+            if column not in columns:
+                _conn.execute(f"ALTER TABLE docs ADD COLUMN {column} {kind}")
+        _conn.execute("CREATE INDEX IF NOT EXISTS docs_ts ON docs(ts)")
+    return _conn
+
+
+def _match_query(query):
+    """Quote each whitespace-separated term as an FTS5 phrase and OR them.
+
+    Quoting keeps identifiers like E_ACCESS_DENIED or rag.py together (the
+    tokenizer splits them, the phrase requires the parts in order) and
+    neutralizes FTS5 query syntax in user input.
+    """
+    terms = [t for t in re.findall(r"\S+", query) if re.search(r"\w", t)]
+    return " OR ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+
+_UPSERT = (
+    "INSERT INTO docs (chunk_id, session_id, session_name, turn_index, text, ts, model) VALUES (?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(chunk_id) DO UPDATE SET session_id=excluded.session_id, "
+    "session_name=excluded.session_name, turn_index=excluded.turn_index, text=excluded.text, "
+    "ts=excluded.ts, model=excluded.model"
+)
+
+
+def _rows(ids, documents, metadatas):
+    return [
+        (cid, m["session_id"], m.get("session_name", ""), m.get("turn_index", 0), doc, m.get("ts"), m.get("model"))
+        for cid, doc, m in zip(ids, documents, metadatas)
+    ]
+
+
+def upsert(ids, documents, metadatas):
+    rows = _rows(ids, documents, metadatas)
+    with _lock:
+        conn = _db()
+        with conn:
+            conn.executemany(_UPSERT, rows)
+
+
+_STAGE_COLUMNS = "chunk_id, session_id, session_name, turn_index, text, ts, model"
+
+
+def stage_begin():
+    """Start an empty staging table for a bulk reindex; the live index is untouched until stage_swap()."""
+    with _lock:
+        conn = _db()
+        with conn:
+            conn.execute("DROP TABLE IF EXISTS docs_stage")
+            conn.execute("CREATE TABLE docs_stage (chunk_id TEXT PRIMARY KEY, session_id TEXT NOT NULL, "
+                         "session_name TEXT, turn_index INTEGER, text TEXT NOT NULL, ts REAL, model TEXT)")
+
+
+def stage(ids, documents, metadatas):
+    """Append one batch to the staging table, so a reindex holds at most a batch in memory."""
+    rows = _rows(ids, documents, metadatas)
+    with _lock:
+        conn = _db()
+        with conn:
+            conn.executemany(f"INSERT OR REPLACE INTO docs_stage ({_STAGE_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             rows)
+
+
+def stage_delete(session_id):
+    with _lock:
+        conn = _db()
+        with conn:
+            conn.execute("DELETE FROM docs_stage WHERE session_id = ?", (session_id,))
+
+
+def stage_swap():
+    """Replace the index contents with the staging table in one transaction and drop it."""
+    with _lock:
+        conn = _db()
+        with conn:
+            conn.execute("DELETE FROM docs")
+            conn.execute(f"INSERT INTO docs ({_STAGE_COLUMNS}) SELECT {_STAGE_COLUMNS} FROM docs_stage")
+            conn.execute("DROP TABLE docs_stage")
+
+
+def stage_discard():
+    with _lock:
+        conn = _db()
+        with conn:
+            conn.execute("DROP TABLE IF EXISTS docs_stage")
+
+
+def delete(session_id, min_turn=None):
+    """Remove a session's chunks, or only those with turn_index >= min_turn."""
+    with _lock:
+        conn = _db()
+        with conn:
+            if min_turn is None:
+                conn.execute("DELETE FROM docs WHERE session_id = ?", (session_id,))
+            else:
+                conn.execute("DELETE FROM docs WHERE session_id = ? AND turn_index >= ?", (session_id, min_turn))
+
+
+def rename(session_id, session_name):
+    with _lock:
+        conn = _db()
+        with conn:
+            conn.execute("UPDATE docs SET session_name = ? WHERE session_id = ?", (session_name, session_id))
+
+
+def count():
+    with _lock:
+        return _db().execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+
+def search(query, limit=5, session_ids=None, since=None, until=None, model=None):
+    """BM25-ranked chunks: [{id, session_id, session_name, turn_index, ts, model, document, bm25}], best first.
+
+    Filters match rag.search: session_ids, ts in [since, until), model.
+    """
+    match = _match_query(query)
+    if not match:
+        return []
+    sql = ("SELECT d.chunk_id, d.session_id, d.session_name, d.turn_index, d.ts, d.model, d.text, "
+           "bm25(docs_fts) AS score FROM docs_fts JOIN docs d ON d.id = docs_fts.rowid WHERE docs_fts MATCH ?")
+    params = [match]
+    if session_ids is not None:
+        session_ids = list(session_ids)
+        sql += f" AND d.session_id IN ({','.join('?' * len(session_ids))})"
+        params += session_ids
+    if since is not None:
+        sql += " AND d.ts >= ?"
+        params.append(since)
+    if until is not None:
+        sql += " AND d.ts < ?"
+        params.append(until)
+    if model:
+        sql += " AND d.model = ?"
+        params.append(model)
+    sql += " ORDER BY score LIMIT ?"
+    params.append(limit)
+    with _lock:
+        rows = _db().execute(sql, params).fetchall()
+    return [
+        {"id": r[0], "session_id": r[1], "session_name": r[2], "turn_index": r[3], "ts": r[4], "model": r[5],
+         "document": r[6], "bm25": r[7]}
+        for r in rows
+    ]
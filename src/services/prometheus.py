@@ -0,0 +1,228 @@
+"""Prometheus text exposition for /metrics.
+
+Everything here is read from counters the services already keep in memory:
+no subprocesses, no log parsing, no disk reads, so a scrape costs a few
+locks and some string formatting and is safe every 10s.
+
+Two instruments live here because nothing else owns them: Socket.IO emits
+by event (counted by the SocketIO subclass in src/__init__.py) and proxy
+request latency by upstream (observed by the /kasm, /notes and /jupyter
+proxies).
+"""
+
+import collections
+import logging
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class LabeledCounter:
+    """Monotonic counts keyed by one label value."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = collections.Counter()
+
+    def inc(self, label, amount=1):
+        with self._lock:
+            self._counts[label] += amount
+
+    def items(self):
+        with self._lock:
+            return sorted(self._counts.items())
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram keyed by one label value."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._data = {}  # label -> [per-bucket counts..., sum, count]
+
+    def observe(self, label, seconds):
+        with self._lock:
+            data = self._data.get(label)
+            if data is None:
+                data = self._data[label] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    data[i] += 1
+                    break
+            data[-2] += seconds
+            data[-1] += 1
+
+    def samples(self, label_name):
+        with self._lock:
+            data = {label: list(values) for label, values in self._data.items()}
+        out = []
+        for label, values in sorted(data.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, values):
+                cumulative += n
+                out.append(("_bucket", {label_name: label, "le": repr(bound)}, cumulative))
+            out.append(("_bucket", {label_name: label, "le": "+Inf"}, values[-1]))
+            out.append(("_sum", {label_name: label}, values[-2]))
+            out.append(("_count", {label_name: label}, values[-1]))
+        return out
+
+
+socketio_emits = LabeledCounter()
+proxy_latency = Histogram()
+proxy_errors = LabeledCounter()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(value):
+    if value is None:
+        return "NaN"
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(int(value))
+
+
+class _Writer:
+    def __init__(self):
+        self.lines = []
+
+    def family(self, name, kind, help_text, samples):
+        """samples: [(suffix, labels, value)], or a bare value for a single unlabeled sample."""
+        if not isinstance(samples, list):
+            samples = [("", {}, samples)]
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+        for suffix, labels, value in samples:
+            label_str = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            self.lines.append(f"{name}{suffix}{{{label_str}}} {_format(value)}" if label_str
+                              else f"{name}{suffix} {_format(value)}")
+
+    def text(self):
+        return "\n".join(self.lines) + "\n"
+
+
+def _acp(w):
+    from src.services import acp_io, acp_metrics
+    from src.services.acp import acp_manager
+
+    with acp_manager._lock:
+        sessions = list(acp_manager.sessions.values())
+    states = collections.Counter(
+        "dormant" if s.dormant else "prompting" if s._is_prompting else "ready" if s.ready else "loading"
+        for s in sessions
+    )
+    w.family("fernando_acp_sessions", "gauge", "ACP chat sessions by state.",
+             [("", {"state": state}, states[state]) for state in ("ready", "prompting", "loading", "dormant")])
+    w.family("fernando_acp_processes", "gauge", "Running kiro-cli processes owned by chat sessions.",
+             sum(1 for s in sessions if s.proc and s.proc.poll() is None))
+    pool = acp_manager.warm_pool.stats()
+    w.family("fernando_acp_warm_pool_idle", "gauge", "Idle pre-initialized kiro-cli processes.",
+             sum(pool.get("idle", {}).values()))
+    restore = acp_manager.restorer.stats()
+    w.family("fernando_acp_restore_queued", "gauge", "Sessions waiting in the restore queue.", restore["queued"])
+    w.family("fernando_acp_dispatch_queue_depth", "gauge", "ACP messages queued for dispatch.",
+             acp_io.dispatcher.queue_depth())
+    w.family("fernando_acp_pipes", "gauge", "kiro-cli pipes registered with the I/O loop.", acp_io.loop.pipe_count())
+
+    models = acp_metrics.by_model()
+    for counter, help_text in (("turns", "Prompt turns completed."), ("retries", "Model-unavailable retries."),
+                               ("reloads", "Session reloads after an MCP transport crash."),
+                               ("stdout_bytes", "kiro-cli stdout bytes read during turns.")):
+        w.family(f"fernando_acp_{counter}_total", "counter", help_text,
+                 [("", {"model": model}, m[counter]) for model, m in models.items()])
+    for series, name, help_text in (("ttfc_s", "time_to_first_chunk_seconds", "Prompt sent to first streamed chunk."),
+                                    ("turn_s", "turn_duration_seconds", "Prompt sent to stopReason.")):
+        samples = []
+        for model, m in models.items():
+            s = m[series]
+            samples.append(("_sum", {"model": model}, s.get("sum", 0.0)))
+            samples.append(("_count", {"model": model}, s["count"]))
+        w.family(f"fernando_acp_{name}", "summary", help_text, samples)
+    rpc, failures = [], []
+    for model, m in models.items():
+        for method, s in m["rpc"].items():
+            labels = {"model": model, "method": method}
+            rpc.append(("_sum", labels, s.get("sum", 0.0)))
+            rpc.append(("_count", labels, s["count"]))
+            failures.append(("", labels, s["failures"]))
+    w.family("fernando_acp_rpc_duration_seconds", "summary", "JSON-RPC request latency by method.", rpc)
+    w.family("fernando_acp_rpc_failures_total", "counter", "JSON-RPC errors and timeouts by method.", failures)
+
+
+def _pty(w):
+    from src.services.pty_service import pty_service
+
+    with pty_service._lock:
+        sessions, viewers = len(pty_service.sessions), len(pty_service.viewers)
+    w.family("fernando_pty_sessions", "gauge", "Open PTY sessions.", sessions)
+    w.family("fernando_pty_viewers", "gauge", "Browser viewers attached to PTY sessions.", viewers)
+
+
+def _socketio(w):
+    from src import socketio
+
+    eio = getattr(getattr(socketio, "server", None), "eio", None)
+    clients = list(eio.sockets.values()) if eio else []
+    w.family("fernando_socketio_clients", "gauge", "Connected Socket.IO clients.", len(clients))
+    w.family("fernando_socketio_queue_depth", "gauge", "Packets queued for delivery across all clients.",
+             sum(c.queue.qsize() for c in clients if hasattr(c.queue, "qsize")))
+    w.family("fernando_socketio_emits_total", "counter", "Socket.IO events emitted, by event name.",
+             [("", {"event": event}, n) for event, n in socketio_emits.items()])
+
+
+def _history(w):
+    from src.services import history_store
+
+    writer = history_store.writer
+    w.family("fernando_history_bytes_written_total", "counter", "Chat history bytes appended to disk.",
+             writer.bytes_written)
+    w.family("fernando_history_events_written_total", "counter", "Chat history events appended.",
+             writer.events_written)
+    w.family("fernando_history_commits_total", "counter", "History writer group commits.", writer.commits)
+    w.family("fernando_history_queue_depth", "gauge", "History appends waiting for the writer.",
+             writer.queue_depth())
+
+
+def _rag(w):
+    from src.services import rag
+
+    stats = rag.indexer.stats()
+    w.family("fernando_rag_index_duration_seconds", "summary", "Background RAG index job duration.",
+             [("_sum", {}, stats["index_seconds_total"]), ("_count", {}, stats["completed"] + stats["failed"])])
+    w.family("fernando_rag_index_jobs_total", "counter", "RAG index jobs by outcome.",
+             [("", {"outcome": k}, stats[k]) for k in ("completed", "failed", "dropped", "coalesced")])
+    w.family("fernando_rag_index_pending", "gauge", "Sessions waiting to be indexed.", stats["pending"])
+
+
+def _proxy(w):
+    w.family("fernando_proxy_request_duration_seconds", "histogram", "Proxied request latency by upstream.",
+             proxy_latency.samples("upstream"))
+    w.family("fernando_proxy_errors_total", "counter", "Proxied requests that failed before a response.",
+             [("", {"upstream": upstream}, n) for upstream, n in proxy_errors.items()])
+
+
+def _threads(w):
+    names = collections.Counter(re.sub(r"[-_ ]?\d+$", "", t.name) for t in threading.enumerate())
+    w.family("fernando_threads", "gauge", "Live threads in the Flask process, by name with numeric suffix stripped.",
+             [("", {"name": name}, n) for name, n in sorted(names.items())])
+
+
+def render():
+    """The full exposition; a section whose service fails is skipped rather than failing the scrape."""
+    w = _Writer()
+    errors = 0
+    for section in (_acp, _pty, _socketio, _history, _rag, _proxy, _threads):
+        try:
+            section(w)
+        except Exception as e:
+            errors += 1
+            logger.warning(f"/metrics: {section.__name__} failed: {e}")
+    w.family("fernando_metrics_section_errors", "gauge", "Sections that failed during this scrape.", errors)
+    return w.text()
@@ -1,8 +1,16 @@
 """RAG service for indexing and searching chat conversation history using ChromaDB."""
 
-import json
+import atexit
+import collections
+import hashlib
 import logging
 import os
+import re
+import threading
+import time
+
+from src.services import embedding_cache, json_codec, lexical_index
+from src.services.history_store import TURN_START_TYPES, get_store
 
 logger = logging.getLogger(__name__)
 
@@ -10,18 +18,150 @@ DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data")
 CHROMA_DIR = os.path.join(DATA_DIR, "chroma_db")
 HISTORY_DIR = os.path.join(DATA_DIR, "chat_history")
 COLLECTION_NAME = "chat_history"
+INDEX_STATE_FILE = os.path.join(DATA_DIR, "rag_index_state.json")
+ACTIVE_COLLECTION_FILE = os.path.join(DATA_DIR, "rag_collection.json")  # written by rag_reindex on swap
+REINDEX_LOCK_FILE = os.path.join(DATA_DIR, "rag_reindex.lock")  # pid of a running rag_reindex
+
+INDEX_WORKERS = 1  # embedding is CPU-bound; more workers just fight each other
+INDEX_MAX_PENDING = 256  # sessions waiting to be indexed before new triggers are shed
+REINDEX_POLL_SECONDS = 2.0  # how often held index jobs re-check the reindex lock
+
+SEARCH_MODES = ("hybrid", "vector", "lexical")
+RRF_K = 60  # reciprocal rank fusion damping; 60 is the usual default
+HYBRID_CANDIDATES = 4  # each ranker contributes limit * this candidates to the fusion
+SNIPPET_CHARS = 500
+SNIPPET_LEAD = 150  # context kept before the first match in a snippet
+MAX_CONTEXT_TURNS = 5
+_STOPWORDS = frozenset("a an and are as at be by for from how i in is it of on or that the this to was what when where which who why with".split())
+
+_state_lock = threading.Lock()
+
+
+_client = None
+_collection = None
+_collection_version = None
+_embed_fn = None
+_client_lock = threading.Lock()
+
+
+def active_collection_name():
+    """Name of the live collection; a bulk reindex swaps in a freshly built one."""
+    try:
+        with open(ACTIVE_COLLECTION_FILE) as f:
+            return json_codec.load(f)["name"]
+    except Exception:
+        return COLLECTION_NAME
+
+
+def set_active_collection(name):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    tmp = ACTIVE_COLLECTION_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        json_codec.dump({"name": name, "swapped_at": time.time()}, f)
+    os.replace(tmp, ACTIVE_COLLECTION_FILE)
+
+
+def reindex_in_progress():
+    """True while a live rag_reindex process holds REINDEX_LOCK_FILE; a stale lock is ignored."""
+    try:
+        with open(REINDEX_LOCK_FILE) as f:
+            pid = int(f.read().strip())
+        os.kill(pid, 0)
+    except PermissionError:
+        return True  # alive, owned by another user
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def _active_version():
+    try:
+        return os.stat(ACTIVE_COLLECTION_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _get_client():
+    """Return the process-wide client and embedding function, creating them on first use.
+
+    PersistentClient construction reloads SQLite, the HNSW segments and the
+    embedding function, so it is done once per process rather than per call.
+    """
+    global _client, _embed_fn
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import chromadb
+                from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+                t0 = time.monotonic()
+                _embed_fn = DefaultEmbeddingFunction()
+                _client = chromadb.PersistentClient(path=CHROMA_DIR)
+                logger.info(f"ChromaDB client ready in {time.monotonic() - t0:.2f}s")
+    return _client
 
 
 def _get_collection():
-    import chromadb
-    client = chromadb.PersistentClient(path=CHROMA_DIR)
-    return client.get_or_create_collection(COLLECTION_NAME)
+    """Return the process-wide handle to the active collection.
+
+    The handle is reopened when a reindex has swapped the active collection
+    (one stat() of the pointer file per call).
+    """
+    global _collection, _collection_version
+    version = _active_version()
+    if _collection is not None and version == _collection_version:
+        return _collection
+    client = _get_client()
+    with _client_lock:
+        if _collection is None or version != _collection_version:
+            name = active_collection_name()
+            _collection = client.get_or_create_collection(name, embedding_function=_embed_fn)
+            _collection_version = version
+            logger.info(f"Using RAG collection {name}")
+        return _collection
+
+
+def warm_up():
+    """Open the collection and load the embedding model ahead of the first search."""
+    try:
+        t0 = time.monotonic()
+        collection = _get_collection()
+        if collection.count():
+            collection.query(query_texts=["warm up"], n_results=1)
+            if not lexical_index.count():
+                _backfill_lexical(collection)
+        logger.info(f"RAG warm-up done in {time.monotonic() - t0:.2f}s")
+    except Exception as e:
+        logger.warning(f"RAG warm-up failed: {e}")
+
+
+def embed_namespace():
+    """Embedding cache namespace for the current model."""
+    _get_client()
+    return type(_embed_fn).__name__
+
 
+def _embed(documents):
+    """Embed chunk documents through the content-hash cache; the model only sees new text."""
+    return embedding_cache.cache.embed(documents, _embed_fn, namespace=embed_namespace())
 
-def _extract_turns(history):
-    """Extract (turn_index, user_text, assistant_text) tuples from a history list."""
+
+def _backfill_lexical(collection):
+    """Populate the lexical index from Chroma for chunks indexed before it existed."""
+    existing = collection.get(include=["documents", "metadatas"])
+    if existing["ids"]:
+        lexical_index.upsert(existing["ids"], existing["documents"], existing["metadatas"])
+        logger.info(f"Backfilled {len(existing['ids'])} chunks into the lexical index")
+
+
+def _extract_turns(history, first_turn=0):
+    """Extract (turn_index, user_text, assistant_text, meta) tuples from a history list.
+
+    `meta` holds the turn's start time ("ts") and answering model ("model")
+    when the history recorded them. `first_turn` is the index of the first
+    turn in `history`, for slices read from the middle of a conversation.
+    """
     turns = []
-    turn_idx = 0
+    turn_idx = first_turn
     i = 0
     while i < len(history):
         entry = history[i]
@@ -29,8 +169,9 @@ def _extract_turns(history):
             i += 1
             continue
         entry_type = entry.get("type", "")
-        if entry_type in ("user_prompt", "continuation"):
+        if entry_type in TURN_START_TYPES:
             user_text = entry.get("text", "")
+            meta = {"ts": entry["ts"]} if isinstance(entry.get("ts"), (int, float)) else {}
             # Collect assistant chunks until next user_prompt/continuation or result with stopReason
             assistant_parts = []
             i += 1
@@ -39,8 +180,10 @@ def _extract_turns(history):
                 if not isinstance(e, dict):
                     i += 1
                     continue
-                if e.get("type") in ("user_prompt", "continuation"):
+                if e.get("type") in TURN_START_TYPES:
                     break
+                if "model" not in meta and e.get("model"):
+                    meta["model"] = e["model"]
                 if e.get("method") == "session/update":
                     update = (e.get("params", {}).get("update") or {})
                     if update.get("sessionUpdate") == "agent_message_chunk":
@@ -53,54 +196,407 @@ def _extract_turns(history):
                 i += 1
             assistant_text = "".join(assistant_parts).strip()
             if user_text or assistant_text:
-                turns.append((turn_idx, user_text, assistant_text))
+                turns.append((turn_idx, user_text, assistant_text, meta))
             turn_idx += 1
         else:
             i += 1
     return turns
 
 
-CHUNK_SIZE = 800  # chars (~200 tokens), well within MiniLM's 256-token limit
-CHUNK_OVERLAP = 100  # overlap so phrases spanning boundaries are still found
+CHUNK_TOKENS = 224  # MiniLM truncates at 256 tokens; leave room for [CLS]/[SEP] and estimate error
+CHUNK_OVERLAP_TOKENS = 32  # most trailing context repeated when a chunk breaks mid-paragraph
+
+_FENCE = re.compile(r"^[ \t]*(```|~~~)[^\n]*\n.*?^[ \t]*\1[ \t]*$", re.M | re.S)
+_SENTENCE = re.compile(r"\S.*?(?:[.!?](?=\s)|$)", re.M)
+_LINE = re.compile(r"[^\n]*\S[^\n]*")
+_WORDS = re.compile(r"\S+")
+_TOKEN_PIECE = re.compile(r"\w+|[^\w\s]")
+
+_tokenizer = None
+_tokenizer_loaded = False
+_tokenizer_lock = threading.Lock()
+
+
+def _load_tokenizer():
+    global _tokenizer, _tokenizer_loaded
+    with _tokenizer_lock:
+        if _tokenizer_loaded:
+            return
+        try:
+            from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2 as model
+            from tokenizers import Tokenizer
+            path = os.path.join(model.DOWNLOAD_PATH, model.EXTRACTED_FOLDER_NAME, "tokenizer.json")
+            if os.path.exists(path):
+                tokenizer = Tokenizer.from_file(path)
+                tokenizer.no_truncation()
+                tokenizer.no_padding()
+                _tokenizer = tokenizer
+        except Exception as e:
+            logger.debug(f"MiniLM tokenizer unavailable, estimating token counts: {e}")
+        _tokenizer_loaded = True
+
+
+def _count_tokens(texts):
+    """Token counts for `texts`, with MiniLM's own tokenizer once its model is downloaded.
+
+    Before that, a WordPiece-like estimate: one token per punctuation mark,
+    and one per word plus one per further 5 characters for long words.
+    """
+    if not _tokenizer_loaded:
+        _load_tokenizer()
+    if _tokenizer is not None:
+        return [len(enc.ids) for enc in _tokenizer.encode_batch(texts, add_special_tokens=False)]
+    return [sum(1 + (len(p) - 1) // 5 for p in _TOKEN_PIECE.findall(t)) for t in texts]
+
+
+def _chunk_units(text):
+    """Split text into [start, end, is_code, hard_break] spans: sentences and whole code fences.
+
+    hard_break marks a unit followed by a paragraph break or code fence, where
+    a chunk can end without losing context.
+    """
+    units = []
+    pos = 0
+    fences = list(_FENCE.finditer(text)) + [None]
+    for fence in fences:
+        prose_end = fence.start() if fence else len(text)
+        for m in _SENTENCE.finditer(text, pos, prose_end):
+            units.append([m.start(), m.end(), False, False])
+        if fence:
+            units.append([fence.start(), fence.end(), True, True])
+            pos = fence.end()
+    for unit, nxt in zip(units, units[1:]):
+        if nxt[2] or "\n\n" in text[unit[1]:nxt[0]].replace(" ", "").replace("\t", ""):
+            unit[3] = True
+    return units
+
+
+def _slice_run(text, start, end, budget):
+    """Character slices of a run with no line or word break, each at most `budget` tokens."""
+    out = []
+    while start < end:
+        n = _count_tokens([text[start:end]])[0]
+        if n <= budget:
+            out.append((start, end))
+            break
+        step = max(1, (end - start) * budget // n)
+        while step > 1 and _count_tokens([text[start:start + step]])[0] > budget:
+            step = step * 3 // 4
+        out.append((start, start + step))
+        start += step
+    return out
+
+
+def _pieces(text, start, end, budget):
+    """Spans of text[start:end] of at most `budget` tokens each: lines, then words, then characters."""
+    pattern = _LINE if "\n" in text[start:end].strip() else _WORDS
+    spans = [(m.start(), m.end()) for m in pattern.finditer(text, start, end)]
+    out = []
+    for (a, b), n in zip(spans, _count_tokens([text[a:b] for a, b in spans])):
+        if n <= budget:
+            out.append((a, b))
+        elif pattern is _LINE:
+            out += _pieces(text, a, b, budget)
+        else:
+            out += _slice_run(text, a, b, budget)
+    return out
+
+
+def _split_oversized(text, unit, budget):
+    """Break a unit longer than the budget at line boundaries, or word boundaries within a long line.
+
+    A word that alone exceeds the budget (a hash, a minified blob) is cut by characters.
+    """
+    start, end, is_code, hard = unit
+    out = []
+    cur_start, cur_end, cur_tokens = None, None, 0
+    pieces = _pieces(text, start, end, budget)
+    for (a, b), n in zip(pieces, _count_tokens([text[a:b] for a, b in pieces])):
+        if cur_start is not None and cur_tokens + n > budget:
+            out.append([cur_start, cur_end, is_code, False])
+            cur_start, cur_tokens = None, 0
+        if cur_start is None:
+            cur_start = a
+        cur_end, cur_tokens = b, cur_tokens + n
+    if cur_start is not None:
+        out.append([cur_start, cur_end, is_code, hard])
+    return out
 
 
 def _chunk_text(text):
-    """Split text into overlapping chunks that fit within the embedding model's token limit."""
-    if len(text) <= CHUNK_SIZE:
+    """Split text into chunks of at most CHUNK_TOKENS tokens on sentence boundaries.
+
+    Sentences and paragraphs are packed greedily; fenced code blocks stay whole
+    unless a single block exceeds the budget, in which case it splits between
+    lines. A chunk that breaks mid-paragraph carries its last sentences (up to
+    CHUNK_OVERLAP_TOKENS) into the next one; breaks at paragraph or code
+    boundaries get no overlap.
+    """
+    if _count_tokens([text])[0] <= CHUNK_TOKENS:
         return [text]
+    units = _chunk_units(text)
+    counts = _count_tokens([text[u[0]:u[1]] for u in units])
+    sized = []
+    for unit, n in zip(units, counts):
+        if n > CHUNK_TOKENS:
+            pieces = _split_oversized(text, unit, CHUNK_TOKENS)
+            sized += zip(pieces, _count_tokens([text[a:b] for a, b, _, _ in pieces]))
+        else:
+            sized.append((unit, n))
     chunks = []
-    start = 0
-    while start < len(text):
-        end = start + CHUNK_SIZE
-        chunks.append(text[start:end])
-        start = end - CHUNK_OVERLAP
+    cur, cur_tokens = [], 0
+    for unit, n in sized:
+        if cur and cur_tokens + n > CHUNK_TOKENS:
+            chunks.append(text[cur[0][0][0]:cur[-1][0][1]])
+            carry, carry_tokens = [], 0
+            if not cur[-1][0][3]:
+                for prev, m in reversed(cur):
+                    if prev[2] or carry_tokens + m > CHUNK_OVERLAP_TOKENS:
+                        break
+                    carry.insert(0, (prev, m))
+                    carry_tokens += m
+            if carry_tokens + n > CHUNK_TOKENS:
+                carry, carry_tokens = [], 0
+            cur, cur_tokens = carry, carry_tokens
+        cur.append((unit, n))
+        cur_tokens += n
+    if cur:
+        chunks.append(text[cur[0][0][0]:cur[-1][0][1]])
     return chunks
 
 
-def index_session(session_id, session_name, history):
-    """Index all turns from a session's history into ChromaDB, chunked for full coverage."""
-    turns = _extract_turns(history)
-    if not turns:
-        return
+def _turn_chunks(session_id, session_name, turn_idx, doc, turn_meta=None):
+    """(ids, documents, metadatas) for one turn's document; turn_meta adds ts/model."""
+    chunks = _chunk_text(doc)
+    ids = [f"{session_id}_{turn_idx}_{i}" for i in range(len(chunks))]
+    meta = {"session_id": session_id, "session_name": session_name, "turn_index": turn_idx, **(turn_meta or {})}
+    return ids, chunks, [dict(meta) for _ in chunks]
+
+
+def _load_index_state():
+    try:
+        with open(INDEX_STATE_FILE) as f:
+            return json_codec.load(f)
+    except Exception:
+        return {}
+
+
+def _save_index_state(state):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    tmp = INDEX_STATE_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        json_codec.dump(state, f)
+    os.replace(tmp, INDEX_STATE_FILE)
+
+
+def _turn_doc(user_text, assistant_text):
+    doc = ""
+    if user_text:
+        doc += f"User: {user_text}\n"
+    if assistant_text:
+        doc += f"Assistant: {assistant_text}"
+    return doc.strip()
+
+
+def _doc_hash(doc):
+    return hashlib.sha256(doc.encode()).hexdigest()[:16]
+
+
+def index_resume_turn(session_id):
+    """First turn index_session needs to see for this session.
+
+    That is the last indexed turn (it may have grown since, e.g. when it was
+    indexed mid-turn on stop), or 0 if the session was never indexed.
+    """
+    with _state_lock:
+        entry = _load_index_state().get(session_id)
+    return max(entry["next_turn"] - 1, 0) if entry else 0
+
+
+def index_session(session_id, session_name, history, first_turn=0):
+    """Index new or changed turns from a session's history into ChromaDB.
+
+    `history` may start mid-conversation at turn `first_turn` (see
+    index_resume_turn). Turns before the last indexed one are skipped; the
+    last indexed turn is re-embedded only if its text changed. A rename
+    rewrites chunk metadata without re-embedding.
+    """
+    turns = _extract_turns(history, first_turn=first_turn)
+    with _state_lock:
+        entry = _load_index_state().get(session_id) or {}
+    next_turn = entry.get("next_turn", 0)
     collection = _get_collection()
+    if entry and entry.get("name") != session_name:
+        existing = collection.get(where={"session_id": session_id}, include=["metadatas"])
+        if existing["ids"]:
+            collection.update(
+                ids=existing["ids"],
+                metadatas=[{**m, "session_name": session_name} for m in existing["metadatas"]],
+            )
+        lexical_index.rename(session_id, session_name)
     ids = []
     documents = []
     metadatas = []
-    for turn_idx, user_text, assistant_text in turns:
-        doc = ""
-        if user_text:
-            doc += f"User: {user_text}\n"
-        if assistant_text:
-            doc += f"Assistant: {assistant_text}"
-        doc = doc.strip()
-        chunks = _chunk_text(doc)
-        for chunk_idx, chunk in enumerate(chunks):
-            chunk_id = f"{session_id}_{turn_idx}_{chunk_idx}"
-            ids.append(chunk_id)
-            documents.append(chunk)
-            metadatas.append({"session_id": session_id, "session_name": session_name, "turn_index": turn_idx})
-    collection.upsert(ids=ids, documents=documents, metadatas=metadatas)
-    logger.info(f"Indexed {len(ids)} chunks for session {session_id}")
+    tail_hash = entry.get("tail_hash")
+    reindex_from = None
+    for turn_idx, user_text, assistant_text, turn_meta in turns:
+        doc = _turn_doc(user_text, assistant_text)
+        doc_hash = _doc_hash(doc)
+        if turn_idx < next_turn - 1 or (turn_idx == next_turn - 1 and doc_hash == entry.get("tail_hash")):
+            continue
+        if reindex_from is None:
+            reindex_from = turn_idx
+        tail_hash = doc_hash
+        chunk_ids, chunks, chunk_metas = _turn_chunks(session_id, session_name, turn_idx, doc, turn_meta)
+        ids += chunk_ids
+        documents += chunks
+        metadatas += chunk_metas
+    if not entry:
+        # Never indexed with turn-keyed chunk ids: drop anything left from the old
+        # fixed-size chunker (or a lost state file) so searches don't return both
+        collection.delete(where={"session_id": session_id})
+        lexical_index.delete(session_id)
+    elif reindex_from is not None and reindex_from < next_turn:
+        # The previously last turn changed: drop its old chunks, it may now chunk differently
+        collection.delete(where={"$and": [{"session_id": session_id}, {"turn_index": {"$gte": reindex_from}}]})
+        lexical_index.delete(session_id, min_turn=reindex_from)
+    if ids:
+        collection.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=_embed(documents))
+        lexical_index.upsert(ids, documents, metadatas)
+        logger.info(f"Indexed {len(ids)} chunks for session {session_id} (turns {reindex_from}+)")
+    if turns:
+        next_turn = max(next_turn, turns[-1][0] + 1)
+    with _state_lock:
+        state = _load_index_state()
+        state[session_id] = {"next_turn": next_turn, "tail_hash": tail_hash, "name": session_name}
+        _save_index_state(state)
+
+
+class IndexQueue:
+    """Single-flight, coalescing queue for background session indexing.
+
+    At most one job per session is pending and at most one runs at a time.
+    A trigger for a session that is already pending replaces the pending job;
+    a trigger while it is running marks it dirty so it runs once more after.
+    Indexing is incremental, so a shed trigger (queue full) is caught up by
+    that session's next one. shutdown() stops taking jobs and lets the
+    workers finish what is already queued.
+
+    While rag_reindex runs (REINDEX_LOCK_FILE), jobs are held and keep
+    coalescing; they run after the swap, incrementally against the rebuilt
+    index, instead of writing to the collection that is about to be replaced.
+    """
+
+    def __init__(self, workers=INDEX_WORKERS, max_pending=INDEX_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._cond = threading.Condition()
+        self._pending = collections.OrderedDict()  # session_id -> job
+        self._running = set()
+        self._dirty = {}  # session_id -> job re-triggered while running
+        self._threads = []
+        self._closed = False
+        self._counters = {"scheduled": 0, "coalesced": 0, "dropped": 0, "completed": 0, "failed": 0}
+        self._last_seconds = None
+        self._seconds_total = 0.0
+
+    def schedule(self, session_id, job):
+        """Queue `job` (a no-arg callable) for a session; False if shed for backpressure."""
+        with self._cond:
+            if self._closed:
+                self._counters["dropped"] += 1
+                return False
+            self._ensure_workers()
+            if session_id in self._running:
+                self._counters["coalesced" if session_id in self._dirty else "scheduled"] += 1
+                self._dirty[session_id] = job
+                return True
+            if session_id in self._pending:
+                self._pending[session_id] = job
+                self._counters["coalesced"] += 1
+                return True
+            if len(self._pending) >= self.max_pending:
+                self._counters["dropped"] += 1
+                return False
+            self._pending[session_id] = job
+            self._counters["scheduled"] += 1
+            self._cond.notify()
+            return True
+
+    def _ensure_workers(self):
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._run, name=f"rag-indexer-{len(self._threads)}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    paused = bool(self._pending) and reindex_in_progress()
+                    if self._pending and not paused:
+                        break
+                    if self._closed:
+                        return  # drained, or held by a reindex whose swap supersedes them
+                    self._cond.wait(REINDEX_POLL_SECONDS if paused else None)
+                session_id, job = self._pending.popitem(last=False)
+                self._running.add(session_id)
+            t0 = time.monotonic()
+            ok = True
+            try:
+                job()
+            except Exception as e:
+                ok = False
+                logger.warning(f"[{session_id}] RAG index job failed: {e}")
+            with self._cond:
+                self._running.discard(session_id)
+                self._counters["completed" if ok else "failed"] += 1
+                elapsed = time.monotonic() - t0
+                self._last_seconds = round(elapsed, 3)
+                self._seconds_total += elapsed
+                job = self._dirty.pop(session_id, None)
+                if job is not None and session_id not in self._pending:
+                    self._pending[session_id] = job
+                self._cond.notify_all()  # wakes a worker for the re-queued job, and drain()
+
+    def queue_depth(self):
+        with self._cond:
+            return len(self._pending)
+
+    def drain(self, timeout=None):
+        """Wait until nothing is pending or running; False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not (self._pending or self._running or self._dirty), timeout)
+
+    def shutdown(self, timeout=None):
+        """Stop accepting jobs, let the workers finish the queued ones, and join them."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            threads = list(self._threads)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for t in threads:
+            t.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+        return not any(t.is_alive() for t in threads)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pending": len(self._pending),
+                "running": len(self._running),
+                "dirty": len(self._dirty),
+                "paused": bool(self._pending) and reindex_in_progress(),
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "last_index_seconds": self._last_seconds,
+                "index_seconds_total": round(self._seconds_total, 3),
+                **self._counters,
+            }
+
+
+indexer = IndexQueue()
+atexit.register(indexer.shutdown, 5)
 
 
 def delete_session(session_id):
@@ -110,34 +606,140 @@ def delete_session(session_id):
     if results["ids"]:
         collection.delete(ids=results["ids"])
         logger.info(f"Deleted {len(results['ids'])} chunks for session {session_id}")
+    lexical_index.delete(session_id)
+    with _state_lock:
+        state = _load_index_state()
+        if state.pop(session_id, None) is not None:
+            _save_index_state(state)
+
+
+def _where(session_ids=None, since=None, until=None, model=None):
+    """Chroma `where` clause for the search filters, or None when unfiltered."""
+    conds = []
+    if session_ids is not None:
+        conds.append({"session_id": {"$in": list(session_ids)}})
+    if since is not None:
+        conds.append({"ts": {"$gte": since}})
+    if until is not None:
+        conds.append({"ts": {"$lt": until}})
+    if model:
+        conds.append({"model": model})
+    if not conds:
+        return None
+    return conds[0] if len(conds) == 1 else {"$and": conds}
 
 
-def search(query, limit=5):
-    """Search conversations. Returns list of {session_id, session_name, turn_index, snippet, score}."""
+def _vector_search(query, limit, **filters):
     collection = _get_collection()
-    if collection.count() == 0:
+    total = collection.count()
+    if total == 0:
         return []
-    results = collection.query(query_texts=[query], n_results=min(limit, collection.count()))
-    hits = []
-    for i, doc_id in enumerate(results["ids"][0]):
-        meta = results["metadatas"][0][i]
-        hits.append({
-            "session_id": meta["session_id"],
-            "session_name": meta.get("session_name", ""),
-            "turn_index": meta.get("turn_index", 0),
-            "snippet": results["documents"][0][i][:500],
-            "score": results["distances"][0][i] if results.get("distances") else None,
-        })
+    results = collection.query(query_texts=[query], n_results=min(limit, total), where=_where(**filters))
+    distances = results.get("distances")
+    return [
+        {
+            "id": doc_id,
+            **results["metadatas"][0][i],
+            "document": results["documents"][0][i],
+            "distance": distances[0][i] if distances else None,
+        }
+        for i, doc_id in enumerate(results["ids"][0])
+    ]
+
+
+def _query_terms(query):
+    terms = {t.lower() for t in re.findall(r"\w+", query)}
+    return (terms - _STOPWORDS) or terms
+
+
+def _snippet(document, terms):
+    """(snippet, snippet_start, matches): a SNIPPET_CHARS window around the first query-term match.
+
+    `matches` are [start, end] offsets of every term occurrence within the snippet.
+    """
+    spans = []
+    if terms:
+        pattern = re.compile(r"(?<!\w)(?:" + "|".join(map(re.escape, sorted(terms, key=len, reverse=True))) + r")(?!\w)", re.I)
+        spans = [m.span() for m in pattern.finditer(document)]
+    start = 0
+    if spans and spans[0][1] > SNIPPET_CHARS:
+        start = max(0, spans[0][0] - SNIPPET_LEAD)
+        space = document.find(" ", start, spans[0][0])
+        start = space + 1 if space != -1 else start
+    snippet = document[start:start + SNIPPET_CHARS]
+    matches = [[a - start, b - start] for a, b in spans if a >= start and b <= start + len(snippet)]
+    return snippet, start, matches
+
+
+def search(query, limit=5, mode="hybrid", session_ids=None, since=None, until=None, model=None, context_turns=0):
+    """Search conversations. Returns list of {session_id, session_name, turn_index, snippet, score, ...}.
+
+    `mode` is "vector" (embedding similarity), "lexical" (BM25 over exact
+    terms) or "hybrid" (both, fused by reciprocal rank). `score` is the
+    fused RRF score (higher is better); `vector_distance` and `lexical_rank`
+    say which ranker found the hit.
+
+    Filters are applied inside both indexes rather than to their results:
+    `session_ids` restricts to those sessions, `since`/`until` (epoch
+    seconds) bound the turn start time, `model` matches the answering model.
+    Chunks indexed before ts/model were recorded never match a time or
+    model filter until reindexed.
+
+    `snippet` is a window of the chunk around the first query-term match,
+    starting `snippet_start` characters into it, with term offsets in
+    `matches`. `context_turns=K` adds `context`: turns turn_index-K through
+    turn_index+K, read by seeking through the history index.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode: {mode}")
+    if session_ids is not None and not session_ids:
+        return []
+    filters = {"session_ids": session_ids, "since": since, "until": until, "model": model}
+    candidates = limit * HYBRID_CANDIDATES if mode == "hybrid" else limit
+    rankings = []
+    if mode in ("hybrid", "vector"):
+        rankings.append(("vector", _vector_search(query, candidates, **filters)))
+    if mode in ("hybrid", "lexical"):
+        rankings.append(("lexical", lexical_index.search(query, candidates, **filters)))
+    fused = {}
+    for source, ranked in rankings:
+        for rank, hit in enumerate(ranked, 1):
+            entry = fused.setdefault(hit["id"], {
+                "session_id": hit["session_id"],
+                "session_name": hit.get("session_name", ""),
+                "turn_index": hit.get("turn_index", 0),
+                "ts": hit.get("ts"),
+                "model": hit.get("model"),
+                "document": hit["document"],
+                "score": 0.0,
+                "vector_distance": None,
+                "lexical_rank": None,
+            })
+            entry["score"] += 1.0 / (RRF_K + rank)
+            if source == "vector":
+                entry["vector_distance"] = hit["distance"]
+            else:
+                entry["lexical_rank"] = rank
+    hits = sorted(fused.values(), key=lambda h: h["score"], reverse=True)[:limit]
+    terms = _query_terms(query)
+    context_turns = max(0, min(context_turns, MAX_CONTEXT_TURNS))
+    for hit in hits:
+        hit["score"] = round(hit["score"], 6)
+        hit["snippet"], hit["snippet_start"], hit["matches"] = _snippet(hit.pop("document"), terms)
+        if context_turns:
+            first = max(0, hit["turn_index"] - context_turns)
+            hit["context"] = get_conversation(hit["session_id"], offset=first, limit=hit["turn_index"] + context_turns + 1 - first)
     return hits
 
 
 def get_conversation(session_id, offset=0, limit=None):
-    """Load conversation history for a session, returning readable turns with optional slicing."""
-    from src.services.acp import load_history_file
-    history = load_history_file(session_id)
-    if not history:
+    """Load conversation turns [offset, offset + limit) for a session as readable dicts.
+
+    Only the requested turns are read, by seeking through the history index.
+    """
+    store = get_store(session_id, readonly=True)
+    if not store.count():
         return None
-    turns = _extract_turns(history)
     end = offset + limit if limit else None
-    sliced = turns[offset:end]
-    return [{"turn_index": t[0], "user": t[1], "assistant": t[2]} for t in sliced]
+    turns = _extract_turns(store.read_turns(offset, end), first_turn=offset)
+    return [{"turn_index": t[0], "user": t[1], "assistant": t[2]} for t in turns]
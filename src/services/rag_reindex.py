@@ -0,0 +1,194 @@
+"""Offline bulk rebuild of the RAG index from data/chat_history.
+
+Streams every session's history one file at a time, extracts and chunks its
+turns, embeds the chunks in large batches across a process pool (through the
+embedding cache, so unchanged chunks are not re-embedded), and writes them to
+a fresh Chroma collection and, batch by batch, to a staging table in the
+lexical index, so memory stays bounded by the batch size. When everything is
+written, the new collection is swapped in atomically via
+rag.set_active_collection, together with a rebuilt index state and the staged
+lexical rows; running processes pick it up on their next call.
+
+The run holds rag.REINDEX_LOCK_FILE, which pauses the Flask process's
+IndexQueue: triggers queue up (coalesced) and run after the swap against the
+new index rather than writing to the collection being replaced. Sessions
+deleted during the run are dropped from the new index before the swap.
+
+Usage: python -m src.services.rag_reindex [--workers N] [--batch 1024] [--keep-old]
+"""
+
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.services import embedding_cache, lexical_index, rag, session_catalog
+from src.services.history_store import get_store
+
+logger = logging.getLogger(__name__)
+
+REINDEX_BATCH = 1024  # chunks embedded and written per round trip
+REINDEX_WORKERS = min(4, os.cpu_count() or 1)
+
+_HISTORY_FILE = re.compile(r"^(.+)\.jsonl(\.\d+)?$")
+
+_worker_embed_fn = None
+
+
+def _worker_init():
+    global _worker_embed_fn
+    from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+    _worker_embed_fn = DefaultEmbeddingFunction()
+
+
+def _worker_embed(documents):
+    return [[float(x) for x in v] for v in _worker_embed_fn(documents)]
+
+
+def _session_ids():
+    try:
+        names = os.listdir(rag.HISTORY_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted({m.group(1) for m in map(_HISTORY_FILE.match, names) if m})
+
+
+def _session_names():
+    names = {sid: entry.get("name") for sid, entry in rag._load_index_state().items()}
+    names.update(session_catalog.names())
+    return names
+
+
+def _acquire_lock():
+    if rag.reindex_in_progress():
+        raise RuntimeError(f"Another reindex is running (see {rag.REINDEX_LOCK_FILE})")
+    os.makedirs(os.path.dirname(rag.REINDEX_LOCK_FILE), exist_ok=True)
+    with open(rag.REINDEX_LOCK_FILE, "w") as f:
+        f.write(str(os.getpid()))
+
+
+def _release_lock():
+    try:
+        os.remove(rag.REINDEX_LOCK_FILE)
+    except FileNotFoundError:
+        pass
+
+
+def reindex_all(workers=REINDEX_WORKERS, batch_size=REINDEX_BATCH, keep_old=False, progress=None):
+    """Rebuild the index into a new collection and swap it in. Returns a stats dict.
+
+    `progress`, if given, is called with the running stats dict after each batch.
+    """
+    t0 = time.monotonic()
+    _acquire_lock()
+    try:
+        return _reindex(t0, workers, batch_size, keep_old, progress)
+    finally:
+        _release_lock()
+
+
+def _reindex(t0, workers, batch_size, keep_old, progress):
+    client = rag._get_client()
+    old_name = rag.active_collection_name()
+    new_name = f"{rag.COLLECTION_NAME}_{time.time_ns() // 1_000_000}"
+    collection = client.create_collection(new_name, embedding_function=rag._embed_fn)
+    namespace = rag.embed_namespace()
+    session_ids = _session_ids()
+    names = _session_names()
+    stats = {"collection": new_name, "sessions": 0, "sessions_total": len(session_ids), "turns": 0, "chunks": 0}
+    state = {}
+    pending = ([], [], [])
+    pool = ProcessPoolExecutor(workers, initializer=_worker_init) if workers > 1 else None
+
+    def embed(documents):
+        if pool is None:
+            return rag._embed_fn(documents)
+        step = -(-len(documents) // workers)
+        parts = pool.map(_worker_embed, [documents[i:i + step] for i in range(0, len(documents), step)])
+        return [v for part in parts for v in part]
+
+    def flush():
+        ids, documents, metadatas = pending
+        if ids:
+            vectors = embedding_cache.cache.embed(documents, embed, namespace=namespace)
+            collection.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=vectors)
+            lexical_index.stage(ids, documents, metadatas)
+            stats["chunks"] += len(ids)
+            for part in pending:
+                part.clear()
+        stats["elapsed"] = round(time.monotonic() - t0, 1)
+        stats["chunks_per_sec"] = round(stats["chunks"] / max(stats["elapsed"], 1e-3), 1)
+        if progress:
+            progress(stats)
+
+    lexical_index.stage_begin()
+    try:
+        for session_id in session_ids:
+            name = names.get(session_id) or "Chat-" + session_id
+            turns = rag._extract_turns(get_store(session_id, readonly=True).read_events())
+            tail_hash = None
+            for turn_idx, user_text, assistant_text, turn_meta in turns:
+                doc = rag._turn_doc(user_text, assistant_text)
+                tail_hash = rag._doc_hash(doc)
+                for part, values in zip(pending, rag._turn_chunks(session_id, name, turn_idx, doc, turn_meta)):
+                    part.extend(values)
+                if len(pending[0]) >= batch_size:
+                    flush()
+            if turns:
+                state[session_id] = {"next_turn": turns[-1][0] + 1, "tail_hash": tail_hash, "name": name}
+            stats["sessions"] += 1
+            stats["turns"] += len(turns)
+        flush()
+        for session_id in set(session_ids) - set(_session_ids()):
+            collection.delete(where={"session_id": session_id})
+            lexical_index.stage_delete(session_id)
+            state.pop(session_id, None)
+            logger.info(f"[{session_id}] Deleted during the reindex; dropped from the new index")
+    except BaseException:
+        lexical_index.stage_discard()
+        client.delete_collection(new_name)
+        raise
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    lexical_index.stage_swap()
+    with rag._state_lock:
+        rag._save_index_state(state)
+    rag.set_active_collection(new_name)
+    if not keep_old and old_name != new_name:
+        try:
+            client.delete_collection(old_name)
+        except Exception as e:
+            logger.warning(f"Could not delete old collection {old_name}: {e}")
+    stats["elapsed"] = round(time.monotonic() - t0, 1)
+    logger.info(f"Reindexed {stats['chunks']} chunks from {stats['sessions']} sessions into {new_name} "
+                f"in {stats['elapsed']}s")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the RAG index from chat history")
+    parser.add_argument("--workers", type=int, default=REINDEX_WORKERS, help="embedding processes (1 = in-process)")
+    parser.add_argument("--batch", type=int, default=REINDEX_BATCH, help="chunks per embedding batch")
+    parser.add_argument("--keep-old", action="store_true", help="keep the previous collection after the swap")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    def progress(s):
+        print(f"\r{s['sessions']}/{s['sessions_total']} sessions, {s['chunks']} chunks, "
+              f"{s['chunks_per_sec']} chunks/s", end="", file=sys.stderr, flush=True)
+
+    stats = reindex_all(workers=args.workers, batch_size=args.batch, keep_old=args.keep_old, progress=progress)
+    print(file=sys.stderr)
+    cache = embedding_cache.cache.stats()
+    print(f"Swapped in {stats['collection']}: {stats['sessions']} sessions, {stats['turns']} turns, "
+          f"{stats['chunks']} chunks in {stats['elapsed']}s ({stats['chunks_per_sec']} chunks/s, "
+          f"embedding cache {cache['hits']} hits / {cache['misses']} misses)")
+
+
+if __name__ == "__main__":
+    main()
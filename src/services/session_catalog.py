@@ -0,0 +1,215 @@
+"""Registry of chat sessions and their kiro-cli PIDs, in SQLite.
+
+One row per Fernando session id this server has seen: its ACP session id,
+name, model, timestamps, history size, and state ("active", "archived", or
+NULL for a session that is neither, e.g. one whose history was left behind
+for orphan recovery). Writes are single-row statements in a transaction, and
+the database runs in WAL mode, so the MCP servers read it concurrently with
+the Flask process writing and never see a half-written file.
+
+The `pids` table maps each running kiro-cli PID to its session, for
+find_my_session_id in the MCP servers when SESSION_ENV is not set (warm-pool
+processes, which are spawned before they belong to a session).
+
+Replaces data/chat_sessions.json, chat_sessions_archived.json and
+acp_pid_map.json; the two session maps are imported once on first open.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+DB_PATH = os.path.join(DATA_DIR, "session_catalog.db")
+LEGACY_SESSIONS_FILE = os.path.join(DATA_DIR, "chat_sessions.json")
+LEGACY_ARCHIVED_FILE = os.path.join(DATA_DIR, "chat_sessions_archived.json")
+
+FIELDS = ("acp_id", "name", "model", "history_bytes", "archived_at")
+ACTIVE = "active"
+ARCHIVED = "archived"
+SESSION_ENV = "FERNANDO_SESSION_ID"  # set on kiro-cli, inherited by its MCP servers
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    acp_id TEXT,
+    name TEXT,
+    model TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    history_bytes INTEGER
+);
+CREATE INDEX IF NOT EXISTS sessions_acp ON sessions(acp_id);
+CREATE TABLE IF NOT EXISTS pids (
+    pid INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_conn = None
+_lock = threading.Lock()
+
+
+def _db():
+    """Process-wide connection, created on first use. Callers hold _lock."""
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+        for column, kind in (("state", "TEXT"), ("archived_at", "REAL")):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE sessions ADD COLUMN {column} {kind}")
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_state ON sessions(state)")
+        _import_legacy(conn)
+        _conn = conn
+    return _conn
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _import_legacy(conn):
+    """One-time import of the JSON session maps this registry replaces."""
+    conn.execute("BEGIN IMMEDIATE")  # another process may be opening the registry too
+    try:
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+            conn.rollback()
+            return
+        imported = 0
+        for path, state in ((LEGACY_ARCHIVED_FILE, ARCHIVED), (LEGACY_SESSIONS_FILE, ACTIVE)):
+            for session_id, info in _read_json(path).items():
+                if isinstance(info, str):  # oldest format: session id -> ACP id
+                    info = {"acp_id": info}
+                _upsert(conn, session_id, state=state, **info)
+                imported += 1
+        conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_imported', ?)", (str(time.time()),))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    if imported:
+        logger.info(f"Imported {imported} sessions from the legacy JSON session maps")
+
+
+_UNSET = object()
+
+
+def _upsert(conn, session_id, state=_UNSET, **fields):
+    values = {k: v for k, v in fields.items() if k in FIELDS and v is not None}
+    if state is not _UNSET:
+        values["state"] = state
+    now = time.time()
+    columns = ["id", "created_at", "updated_at", *values]
+    updates = ", ".join(f"{k}=excluded.{k}" for k in ["updated_at", *values])
+    conn.execute(
+        f"INSERT INTO sessions ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+        f"ON CONFLICT(id) DO UPDATE SET {updates}",
+        (session_id, now, now, *values.values()),
+    )
+
+
+def record(session_id, **fields):
+    """Update a registered session's row. Only the given FIELDS change; None values are ignored.
+
+    Never inserts: a late write from a background job (RAG indexing) after
+    forget() must not bring the deleted row back. Rows are created by set_state.
+    """
+    values = {k: v for k, v in fields.items() if k in FIELDS and v is not None}
+    assignments = ", ".join(f"{k} = ?" for k in ["updated_at", *values])
+    with _lock:
+        conn = _db()
+        with conn:
+            conn.execute(f"UPDATE sessions SET {assignments} WHERE id = ?", (time.time(), *values.values(), session_id))
+
+
+def set_state(session_id, state, **fields):
+    """Move a session to `state` (ACTIVE, ARCHIVED or None), updating any given FIELDS too."""
+    with _lock:
+        conn = _db()
+        with conn:
+            _upsert(conn, session_id, state=state, **fields)
+
+
+def by_state(state):
+    """{id: row} of the sessions in `state`; archived ones newest first."""
+    with _lock:
+        rows = _db().execute(
+            "SELECT * FROM sessions WHERE state = ? ORDER BY archived_at DESC, created_at", (state,)
+        ).fetchall()
+    return {row["id"]: dict(row) for row in rows}
+
+
+def ids(state):
+    with _lock:
+        return {row[0] for row in _db().execute("SELECT id FROM sessions WHERE state = ?", (state,))}
+
+
+def names():
+    """{id: name} for every session with a name."""
+    with _lock:
+        return dict(_db().execute("SELECT id, name FROM sessions WHERE name IS NOT NULL").fetchall())
+
+
+def get_many(session_ids):
+    """Rows for the given ids that are in the registry, as {id: dict}."""
+    session_ids = list(session_ids)
+    found = {}
+    with _lock:
+        conn = _db()
+        for i in range(0, len(session_ids), 500):  # stay under SQLite's bound-parameter limit
+            batch = session_ids[i:i + 500]
+            rows = conn.execute(
+                f"SELECT * FROM sessions WHERE id IN ({','.join('?' * len(batch))})", batch
+            ).fetchall()
+            found.update((row["id"], dict(row)) for row in rows)
+    return found
+
+
+def get(session_id):
+    return get_many([session_id]).get(session_id)
+
+
+def forget(session_id):
+    with _lock:
+        conn = _db()
+        with conn:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            conn.execute("DELETE FROM pids WHERE session_id = ?", (session_id,))
+
+
+def count():
+    with _lock:
+        return _db().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def replace_pids(pid_map):
+    """Replace the PID -> session id table in one transaction."""
+    with _lock:
+        conn = _db()
+        with conn:
+            conn.execute("DELETE FROM pids")
+            conn.executemany("INSERT INTO pids (pid, session_id) VALUES (?, ?)", pid_map.items())
+
+
+def session_for_pid(pid):
+    with _lock:
+        row = _db().execute("SELECT session_id FROM pids WHERE pid = ?", (int(pid),)).fetchone()
+    return row[0] if row else None
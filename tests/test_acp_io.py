@@ -0,0 +1,72 @@
+"""Tests for the shared ACP pipe loop and per-session dispatcher."""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import src.services.acp_io as acp_io
+
+
+def _wait(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_line_framer_splits_across_chunks():
+    framer = acp_io.LineFramer()
+    assert framer.feed(b'{"a": 1}\n{"b"') == [b'{"a": 1}']
+    assert framer.feed(b": 2}") == []
+    assert framer.feed(b"\n\nx\ny") == [b'{"b": 2}', b"", b"x"]
+    assert framer.feed(b"\n") == [b"y"]
+
+
+def test_line_framer_drops_oversized_line():
+    framer = acp_io.LineFramer(max_line=10)
+    assert framer.feed(b"ok\n" + b"x" * 8) == [b"ok"]
+    assert framer.feed(b"x" * 8) == []
+    assert framer.feed(b"x" * 50) == []
+    assert framer.feed(b"xx\nnext\n") == [b"next"]
+    assert framer.dropped == 1
+
+
+def test_dispatcher_keeps_per_key_order():
+    dispatcher = acp_io.KeyedDispatcher(workers=3)
+    seen = {"a": [], "b": []}
+    for i in range(200):
+        for key in seen:
+            dispatcher.submit(key, lambda key=key, i=i: seen[key].append(i))
+    assert _wait(lambda: all(len(v) == 200 for v in seen.values()))
+    assert seen["a"] == seen["b"] == list(range(200))
+
+
+def test_dispatcher_slow_key_does_not_block_others():
+    dispatcher = acp_io.KeyedDispatcher(workers=2)
+    release = threading.Event()
+    done = []
+    dispatcher.submit("slow", release.wait)
+    dispatcher.submit("fast", lambda: done.append(1))
+    assert _wait(lambda: done)
+    release.set()
+
+
+def test_pipe_loop_reads_and_reports_eof():
+    loop = acp_io.PipeLoop()
+    r, w = os.pipe()
+    reader = os.fdopen(r, "rb")
+    chunks, eof = [], threading.Event()
+    loop.register(reader, chunks.append, eof.set)
+    os.write(w, b"hello\n")
+    assert _wait(lambda: b"".join(chunks) == b"hello\n")
+    os.close(w)
+    assert eof.wait(5)
+    assert loop.pipe_count() == 0
+    reader.close()
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,47 @@
+"""Tests for ACP session timing and throughput metrics."""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import src.services.acp_metrics as acp_metrics
+
+
+def test_series_snapshot_quantiles():
+    series = acp_metrics.Series()
+    assert series.snapshot() == {"count": 0}
+    for value in range(1, 101):
+        series.add(float(value))
+    assert series.snapshot() == {"count": 100, "sum": 5050.0, "mean": 50.5, "p50": 51.0, "p95": 96.0, "max": 100.0}
+
+
+def test_turn_metrics_feed_session_and_model(monkeypatch):
+    clock = iter([-1.0, 0.0, 0.5, 1.0, 1.5, 3.0, 4.0])
+    monkeypatch.setattr(acp_metrics.time, "monotonic", lambda: next(clock))
+    monkeypatch.setattr(acp_metrics, "_models", {})
+    metrics = acp_metrics.SessionMetrics()
+    metrics.chunk(10)  # outside a turn: ignored
+    metrics.prompt_sent()  # t=0
+    metrics.stdout(600)
+    metrics.chunk(4)  # t=0.5, first chunk
+    metrics.chunk(4)  # t=1.0
+    metrics.chunk(4)  # t=1.5
+    metrics.turn_ended("m", "end_turn")  # t=3.0
+    metrics.turn_ended("m", "end_turn")  # no turn in flight: ignored
+    metrics.rpc("m", "session/load", 2.0, ok=False)
+    metrics.count("m", "retries")
+
+    snap = metrics.snapshot()
+    assert snap["last_turn"] == {"stop_reason": "end_turn", "chunks": 3, "chars": 12, "stdout_bytes": 600,
+                                 "turn_s": 3.0, "ttfc_s": 0.5, "chunks_per_s": 2.0, "chars_per_s": 12.0,
+                                 "stdout_bytes_per_s": 200.0}
+    assert (snap["turns"], snap["retries"], snap["in_turn"]) == (1, 1, False)
+    model = acp_metrics.by_model()["m"]
+    assert model["ttfc_s"]["mean"] == 0.5 and model["turns"] == 1
+    assert model["rpc"]["session/prompt"] == {"count": 1, "sum": 3.0, "mean": 3.0, "p50": 3.0, "p95": 3.0, "max": 3.0, "failures": 0}
+    assert model["rpc"]["session/load"]["failures"] == 1
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
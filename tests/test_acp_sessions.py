@@ -0,0 +1,269 @@
+"""Tests for ACP session management: warm pool, restore scheduler, idle suspend, session registry."""
+import os
+import json
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pytest
+
+import src.services.acp as acp
+import src.services.history_store as history_store
+import src.services.session_catalog as session_catalog
+import src.services.settings as settings
+
+
+def _wait(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+class _FakeWarmSession:
+    def __init__(self, model, effort):
+        self.id = f"warm-{model}"
+        self.model, self.effort = model, effort
+        self.acp_session_id = None
+        self.proc = subprocess.Popen(["sleep", "30"])
+        self._alive = True
+
+    def _terminate(self):
+        self.proc.terminate()
+        self.proc.wait()
+
+
+def test_warm_pool_targets_default_and_extra_keys(monkeypatch):
+    monkeypatch.setattr(settings, "get", {"default_model": "big", "default_effort": "max"}.get)
+    pool = acp.WarmPool(size=1, extra_keys="small:low, big ,fast")
+    assert pool.targets() == [("big", "max"), ("small", "low"), ("fast", "max")]
+    assert acp.WarmPool(size=0).targets() == []
+
+
+def test_warm_pool_claims_and_refills(monkeypatch):
+    monkeypatch.setattr(acp.history_store, "delete_history", lambda session_id: None)
+    pool = acp.WarmPool(size=1)
+    spawned = []
+    monkeypatch.setattr(pool, "targets", lambda: [("big", "max"), ("small", "low")])
+    monkeypatch.setattr(pool, "_spawn", lambda model, effort: spawned.append(_FakeWarmSession(model, effort)) or spawned[-1])
+    pool.start()
+    assert _wait(lambda: pool.stats()["idle"] == {"big/max": 1, "small/low": 1})
+
+    warm = pool.claim("big", "max")
+    assert warm is spawned[0] and warm.proc.poll() is None
+    assert pool.claim("big", "low") is None
+    assert (pool.hits, pool.misses) == (1, 1)
+    assert _wait(lambda: pool.stats()["idle"]["big/max"] == 1)
+
+    spawned[1].proc.kill()  # a warm process that died is never handed out
+    spawned[1].proc.wait()
+    assert pool.claim("small", "low") is None
+
+    pool.shutdown()
+    assert _wait(lambda: all(s.proc.poll() is not None for s in spawned[1:]))
+    warm._terminate()
+
+
+def test_restore_scheduler_order_and_promotion():
+    scheduler = acp.RestoreScheduler(concurrency=1)
+    started, gate = [], threading.Event()
+    now = time.time()
+
+    def job(name, last_active, wait=False):
+        session = SimpleNamespace(id=name, load_timing={})
+        scheduler.submit(session, lambda: started.append(name) or (wait and gate.wait(5)), last_active)
+        return session
+
+    first = job("first", now, wait=True)  # holds the only slot while the rest queue up
+    assert _wait(lambda: started == ["first"])
+    job("idle", now - 7 * 86400)
+    job("older", now - 3600)
+    job("newer", now - 60)
+    job("stale", now - 30 * 86400)
+    assert scheduler.promote("stale") and not scheduler.promote("missing")
+    gate.set()
+    assert _wait(lambda: len(started) == 5)
+    assert started == ["first", "stale", "newer", "older", "idle"]
+    assert first.load_timing["total_s"] >= 0 and first.load_timing["promoted"] is False
+    assert _wait(lambda: scheduler.stats() == {"concurrency": 1, "queued": 0, "running": 0})
+
+
+def test_suspend_idle_only_touches_idle_ready_sessions(monkeypatch):
+    manager = acp.ACPManager()
+    monkeypatch.setattr(manager, "_save_pid_map", lambda: None)
+    now = time.time()
+
+    def fake(ready=True, prompting=False, last_activity=now - 7200):
+        session = SimpleNamespace(ready=ready, _is_prompting=prompting, _retry_pending=False,
+                                  acp_session_id="acp", _last_activity=last_activity, id="x", suspended=False)
+        session.suspend = lambda: setattr(session, "suspended", True)
+        return session
+
+    manager.sessions = {
+        "idle": fake(),
+        "recent": fake(last_activity=now - 60),
+        "busy": fake(prompting=True),
+        "loading": fake(ready=False),
+    }
+    assert manager.suspend_idle(idle_after=3600) == 1
+    assert [sid for sid, s in manager.sessions.items() if s.suspended] == ["idle"]
+
+
+def test_start_new_sends_prompts_queued_while_starting(monkeypatch):
+    manager = acp.ACPManager()
+    monkeypatch.setattr(manager, "_save", lambda session: None)
+    monkeypatch.setattr(manager, "_save_pid_map", lambda: None)
+    monkeypatch.setattr(manager.warm_pool, "claim", lambda model, effort: None)
+    destroyed = []
+    monkeypatch.setattr(manager, "destroy_session", lambda session_id: destroyed.append(session_id))
+    monkeypatch.setattr(acp, "load_history_file", lambda session_id: [])
+
+    def session(start):
+        events = []
+        s = acp.ACPSession("fresh", on_event=lambda sid, evt: events.append(evt["type"] + evt.get("error", "")))
+        s.start = start
+        s.send_prompt = lambda text: events.append(f"sent {text}")
+        s.queue_prompt("hello")
+        s.queue_prompt("again")
+        return s, events
+
+    ok, events = session(lambda: None)
+    manager._start_new("fresh", ok)
+    assert events == ["session_ready", "sent hello", "sent again"]
+
+    def fail():
+        raise RuntimeError("no kiro-cli")
+
+    failed, events = session(fail)
+    manager._start_new("fresh", failed)
+    assert events == ["session_errorno kiro-cli (2 queued prompts not sent)"]
+    assert destroyed == ["fresh"] and failed._queued_prompts == []
+
+
+def test_history_offsets_survive_reload(monkeypatch):
+    """A client offset taken from the live raw list still lines up after the merged history is reloaded."""
+    with tempfile.TemporaryDirectory() as tmp:
+        monkeypatch.setattr(history_store, "HISTORY_DIR", tmp)
+        monkeypatch.setattr(history_store, "_stores", {})
+        monkeypatch.setattr(acp.rag.indexer, "schedule", lambda *a: True)
+        session = acp.ACPSession("reload")
+        session.history.append({"type": "user_prompt", "text": "q", "ts": 1})
+        for i in range(50):
+            session.history.append({"method": "session/update", "params": {"update": {
+                "sessionUpdate": "agent_message_chunk", "content": {"type": "text", "text": f"w{i} "}}}})
+        session.history.append({"id": 1, "result": {"stopReason": "end_turn"}})
+        session._save_history(index_rag=True)
+        offset = session.history_length()
+        assert offset == 52
+
+        reloaded = acp.ACPSession("reload")
+        reloaded._load_history()
+        assert len(reloaded.history) == 3 and reloaded.history_length() == 52
+        assert reloaded.collapsed_history(offset) == []
+        continuation = {"type": "continuation", "text": "[CONTINUATION] go on", "ts": 2}
+        reloaded.history.append(continuation)
+        assert reloaded.collapsed_history(offset) == [continuation]
+        tail = reloaded.collapsed_history(30)  # inside the merged run: resent whole, never dropped
+        assert history_store.text_chunk(tail[0]).startswith("w0 ") and tail[-1] == continuation
+
+
+def test_index_job_after_suspend_reads_the_store(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        monkeypatch.setattr(history_store, "HISTORY_DIR", tmp)
+        monkeypatch.setattr(history_store, "_stores", {})
+        jobs, indexed = [], []
+        monkeypatch.setattr(acp.rag.indexer, "schedule", lambda session_id, job: jobs.append(job) or True)
+        monkeypatch.setattr(acp.rag, "index_resume_turn", lambda session_id: 0)
+        monkeypatch.setattr(acp.rag, "index_session", lambda sid, name, history, first_turn=0: indexed.append(history))
+        monkeypatch.setattr(acp.session_catalog, "record", lambda *a, **kw: None)
+        session = acp.ACPSession("sleeper")
+        session.history += [{"type": "user_prompt", "text": "q", "ts": 1},
+                            {"id": 1, "result": {"stopReason": "end_turn"}}]
+        session._save_history(index_rag=True)
+        session.suspend()  # schedules another job, then drops the in-memory history
+        for job in jobs:
+            job()
+        assert session.history == [] and len(indexed) == 2
+        assert all([e.get("text") for e in h] == ["q", None] for h in indexed)
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        monkeypatch.setattr(session_catalog, "DB_PATH", os.path.join(tmp, "catalog.db"))
+        monkeypatch.setattr(session_catalog, "LEGACY_SESSIONS_FILE", os.path.join(tmp, "chat_sessions.json"))
+        monkeypatch.setattr(session_catalog, "LEGACY_ARCHIVED_FILE", os.path.join(tmp, "chat_sessions_archived.json"))
+        monkeypatch.setattr(session_catalog, "_conn", None)
+        yield tmp
+        if session_catalog._conn is not None:
+            session_catalog._conn.close()
+
+
+def test_registry_imports_legacy_maps_and_tracks_state(registry):
+    with open(session_catalog.LEGACY_SESSIONS_FILE, "w") as f:
+        json.dump({"a": {"acp_id": "acp-a", "name": "A", "model": "m"}, "old": "acp-old"}, f)
+    with open(session_catalog.LEGACY_ARCHIVED_FILE, "w") as f:
+        json.dump({"z": {"acp_id": "acp-z", "name": "Z", "archived_at": 5.0}}, f)
+    assert session_catalog.by_state(session_catalog.ACTIVE).keys() == {"a", "old"}
+    assert session_catalog.get("old")["acp_id"] == "acp-old"
+    assert session_catalog.ids(session_catalog.ARCHIVED) == {"z"}
+
+    session_catalog.set_state("a", session_catalog.ARCHIVED, archived_at=9.0)
+    assert list(session_catalog.by_state(session_catalog.ARCHIVED)) == ["a", "z"]
+    assert session_catalog.get("a")["name"] == "A"  # untouched fields survive a state change
+    session_catalog.set_state("z", None)
+    assert session_catalog.ids(session_catalog.ARCHIVED) == {"a"}
+
+    session_catalog.replace_pids({101: "a"})
+    session_catalog.replace_pids({202: "old"})
+    assert session_catalog.session_for_pid("202") == "old" and session_catalog.session_for_pid(101) is None
+
+    session_catalog.record("a", history_bytes=42, name=None)
+    assert session_catalog.get("a")["history_bytes"] == 42 and session_catalog.get("a")["name"] == "A"
+    session_catalog.forget("a")
+    session_catalog.record("a", name="A", history_bytes=43)  # a late index job after delete
+    assert session_catalog.get("a") is None
+
+
+def test_recover_orphans_uses_registry_and_history_file_gate(registry, monkeypatch):
+    history_dir = os.path.join(registry, "history")
+    os.makedirs(history_dir)
+    monkeypatch.setattr(acp, "HISTORY_DIR", history_dir)
+    monkeypatch.setattr(history_store, "HISTORY_DIR", history_dir)
+    monkeypatch.setattr(acp.rag, "_load_index_state", lambda: {})
+    scanned = []
+    monkeypatch.setattr(acp.ACPManager, "_scan_acp_id", staticmethod(lambda sid: scanned.append(sid) or "acp-scanned"))
+
+    for sid in ("known", "unknown", "archived"):
+        open(os.path.join(history_dir, f"{sid}.jsonl"), "w").close()
+    session_catalog.set_state("known", None, acp_id="acp-known", name="Known chat")
+    session_catalog.set_state("archived", session_catalog.ARCHIVED, acp_id="acp-a", archived_at=1.0)
+    manager = acp.ACPManager()
+    manager._recover_orphans()
+    archived = session_catalog.by_state(session_catalog.ARCHIVED)
+    assert {sid: (a["acp_id"], a["name"]) for sid, a in archived.items()} == {
+        "known": ("acp-known", "Known chat"),
+        "unknown": ("acp-scanned", "Chat-unknown"),
+        "archived": ("acp-a", None),
+    }
+    assert scanned == ["unknown"]
+
+    session_catalog.set_state("unknown", None)
+    for sidecar in ("known.idx", "known.snap.json"):
+        open(os.path.join(history_dir, sidecar), "w").close()
+    manager._recover_orphans()  # same .jsonl files, only sidecars written: nothing is re-scanned
+    assert "unknown" not in session_catalog.ids(session_catalog.ARCHIVED)
+    open(os.path.join(history_dir, "new.jsonl"), "w").close()
+    manager._recover_orphans()
+    assert {"unknown", "new"} <= session_catalog.ids(session_catalog.ARCHIVED)
+    assert scanned == ["unknown", "new"]  # "unknown" took its ACP id from the registry this time
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
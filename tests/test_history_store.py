@@ -0,0 +1,243 @@
+"""Tests for the segmented, indexed chat history store."""
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import src.services.history_store as history_store
+
+# --- Helpers ---
+
+def _make_history(turns, chunks_per_turn=10):
+    events = [{"method": "session/update", "params": {"update": {"sessionUpdate": "available_commands_update"}}}]
+    for t in range(turns):
+        events.append({"type": "user_prompt", "text": f"question {t}", "ts": t})
+        for c in range(chunks_per_turn):
+            events.append({"method": "session/update", "params": {"update": {
+                "sessionUpdate": "agent_message_chunk", "content": {"type": "text", "text": f"t{t}c{c} "}}}})
+        events.append({"id": t, "result": {"stopReason": "end_turn"}})
+    return events
+
+
+def _write(store, events, batch=7):
+    for i in range(0, len(events), batch):
+        store.append(events[i:i + batch])
+
+
+# --- Range reads ---
+
+def test_read_events_range():
+    with tempfile.TemporaryDirectory() as tmp:
+        events = _make_history(40)
+        store = history_store.HistoryStore("s1", history_dir=tmp)
+        _write(store, events)
+        assert store.count() == len(events)
+        assert store.read_events() == events
+        assert store.read_events(123, 301) == events[123:301]
+        assert store.read_events(len(events) - 3) == events[-3:]
+        assert store.read_events(10, 5) == []
+
+def test_read_turns_skips_preamble():
+    with tempfile.TemporaryDirectory() as tmp:
+        events = _make_history(20)
+        store = history_store.HistoryStore("s1", history_dir=tmp)
+        _write(store, events)
+        assert store.turn_count() == 20
+        assert store.read_turns(0, 1) == events[1:13]
+        assert store.read_turns(18) == events[1 + 18 * 12:]
+
+def test_reopen_uses_persisted_index():
+    with tempfile.TemporaryDirectory() as tmp:
+        events = _make_history(30)
+        _write(history_store.HistoryStore("s1", history_dir=tmp), events)
+        reopened = history_store.HistoryStore("s1", history_dir=tmp)
+        assert reopened.read_turns(5, 7) == events[1 + 5 * 12:1 + 7 * 12]
+
+
+# --- Rotation and recovery ---
+
+def test_rotation_across_segments(monkeypatch):
+    monkeypatch.setattr(history_store, "SEGMENT_MAX_BYTES", 4096)
+    with tempfile.TemporaryDirectory() as tmp:
+        events = _make_history(60)
+        store = history_store.HistoryStore("s1", history_dir=tmp)
+        _write(store, events)
+        assert any(name.startswith("s1.jsonl.") for name in os.listdir(tmp))
+        assert store.read_events(200, 500) == events[200:500]
+        assert history_store.HistoryStore("s1", history_dir=tmp).read_events() == events
+
+def test_legacy_file_without_index():
+    with tempfile.TemporaryDirectory() as tmp:
+        events = _make_history(15)
+        _write(history_store.HistoryStore("s1", history_dir=tmp), events)
+        os.remove(os.path.join(tmp, "s1.idx"))
+        store = history_store.HistoryStore("s1", history_dir=tmp, readonly=True)
+        assert store.turn_count() == 15
+        assert store.read_turns(14) == events[1 + 14 * 12:]
+        assert not os.path.exists(os.path.join(tmp, "s1.idx"))
+
+def test_torn_write_is_truncated():
+    with tempfile.TemporaryDirectory() as tmp:
+        events = _make_history(3)
+        _write(history_store.HistoryStore("s1", history_dir=tmp), events)
+        with open(os.path.join(tmp, "s1.jsonl"), "ab") as f:
+            f.write(b'{"type": "user_pro')
+        store = history_store.HistoryStore("s1", history_dir=tmp)
+        assert store.count() == len(events)
+        store.append([{"type": "user_prompt", "text": "after crash"}])
+        assert store.read_turns(3) == [{"type": "user_prompt", "text": "after crash"}]
+
+def test_readonly_store_sees_new_appends():
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = history_store.HistoryStore("s1", history_dir=tmp)
+        reader = history_store.HistoryStore("s1", history_dir=tmp, readonly=True)
+        _write(writer, _make_history(2))
+        assert reader.turn_count() == 2
+        writer.append([{"type": "continuation", "text": "more"}])
+        assert reader.turn_count() == 3
+
+def test_delete_removes_all_files(monkeypatch):
+    monkeypatch.setattr(history_store, "SEGMENT_MAX_BYTES", 1024)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = history_store.HistoryStore("s1", history_dir=tmp)
+        _write(store, _make_history(10))
+        store.delete()
+        assert os.listdir(tmp) == []
+        assert store.count() == 0
+
+
+# --- Chunk coalescing ---
+
+def _chunk(text, **extra):
+    return {"method": "session/update", "params": {"sessionId": "acp1", "update": {
+        "sessionUpdate": "agent_message_chunk", "content": {"type": "text", "text": text}}}, **extra}
+
+def test_coalesce_merges_adjacent_text_chunks():
+    tool = {"method": "session/update", "params": {"update": {"sessionUpdate": "tool_call"}}}
+    events = [_chunk("a", ts=1, model="m"), _chunk("b", ts=2, model="m"), tool, _chunk("c", ts=3), _chunk("d", ts=4)]
+    merged = history_store.coalesce_text_chunks(events)
+    assert [history_store.text_chunk(e) for e in merged] == ["ab", None, "cd"]
+    assert merged[0]["ts"] == 1 and merged[0]["model"] == "m"
+    assert merged[0]["params"]["sessionId"] == "acp1"
+    assert merged[1] is tool
+    assert events[0]["params"]["update"]["content"]["text"] == "a"
+
+def test_coalesce_fills_missing_ts_from_later_chunk():
+    merged = history_store.coalesce_text_chunks([_chunk("a"), _chunk("b", ts=5, model="m")])
+    assert len(merged) == 1
+    assert merged[0]["ts"] == 5 and merged[0]["model"] == "m"
+
+
+# --- Collapsed view ---
+
+def test_collapsed_view_matches_full_collapse():
+    history = _make_history(5, chunks_per_turn=4)
+    view = history_store.CollapsedHistory()
+    assert view.since(history) == history_store.coalesce_text_chunks(history)
+    history.extend(_make_history(2)[1:])
+    assert view.since(history) == history_store.coalesce_text_chunks(history)
+
+def test_collapsed_view_offset_inside_run():
+    history = [{"type": "user_prompt", "text": "q"}, _chunk("a"), _chunk("b"), _chunk("c"), {"result": {"stopReason": "end_turn"}}]
+    view = history_store.CollapsedHistory()
+    events = view.since(history, 2)
+    assert [history_store.text_chunk(e) for e in events] == ["bc", None]
+    assert view.since(history, 5) == []
+
+def test_collapsed_view_open_run_grows():
+    history = [{"type": "user_prompt", "text": "q"}, _chunk("a"), _chunk("b")]
+    view = history_store.CollapsedHistory()
+    assert history_store.text_chunk(view.since(history)[-1]) == "ab"
+    history.append(_chunk("c"))
+    assert history_store.text_chunk(view.since(history)[-1]) == "abc"
+    assert history_store.text_chunk(view.since(history, 3)[-1]) == "c"
+
+def test_collapsed_view_resets_on_new_list():
+    view = history_store.CollapsedHistory()
+    view.since([_chunk("a"), _chunk("b")])
+    assert [history_store.text_chunk(e) for e in view.since([_chunk("z")])] == ["z"]
+
+def test_latest_step_progress_per_pipeline():
+    history = [
+        {"type": "step_progress", "data": {"pipeline_id": "p1", "step": 1}},
+        {"type": "step_progress", "data": {"pipeline_id": "p2", "step": 1}},
+        {"type": "step_progress", "data": {"pipeline_id": "p1", "step": 2}},
+    ]
+    latest = history_store.CollapsedHistory().latest_step_progress(history)
+    assert [e["data"] for e in latest] == [{"pipeline_id": "p1", "step": 2}, {"pipeline_id": "p2", "step": 1}]
+
+def test_turn_window_live_and_stored_agree():
+    with tempfile.TemporaryDirectory() as tmp:
+        history = _make_history(8, chunks_per_turn=3)
+        store = history_store.HistoryStore("s1", history_dir=tmp)
+        _write(store, history)
+        view = history_store.CollapsedHistory()
+        assert view.turn_count(history) == store.turn_count() == 8
+        for start, end in ((0, 2), (5, 8), (6, None)):
+            assert view.turns(history, start, end) == store.collapsed_turns(start, end)
+        assert view.turns(history, 0, 1)[0] == history[0]
+        assert view.turns(history, 5)[0] == {"type": "user_prompt", "text": "question 5", "ts": 5}
+
+def test_snapshot_reused_until_history_grows():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = history_store.HistoryStore("s1", history_dir=tmp)
+        _write(store, _make_history(3))
+        first = store.collapsed()
+        assert os.path.exists(store.snapshot_path)
+        assert store.collapsed() == first
+        store.append([{"type": "user_prompt", "text": "new"}])
+        assert store.collapsed()[-1] == {"type": "user_prompt", "text": "new"}
+
+
+# --- Writer thread ---
+
+def test_writer_group_commits_in_order():
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = history_store.HistoryWriter(interval=0.05)
+        a = history_store.HistoryStore("a", history_dir=tmp)
+        b = history_store.HistoryStore("b", history_dir=tmp)
+        events = _make_history(5)
+        for evt in events:
+            writer.submit(a, [evt])
+            writer.submit(b, [evt])
+        writer.submit(a, [], sync=True)
+        assert a.read_events() == events
+        assert b.read_events() == events
+        assert writer.events_written == 2 * len(events)
+        assert writer.commits < 2 * len(events)
+        a.close()
+        b.close()
+
+
+
+class _RecordingStore:
+    def __init__(self, session_id, error=None):
+        self.session_id = session_id
+        self.error = error
+        self.appends = []  # (number of entries, fsync)
+
+    def append(self, entries, fsync=False):
+        if self.error:
+            raise self.error
+        self.appends.append((len(entries), fsync))
+        return 0
+
+
+def test_writer_flush_fsyncs_and_sync_submit_raises_write_errors():
+    writer = history_store.HistoryWriter(interval=0.01)
+    store = _RecordingStore("ok")
+    writer.submit(store, [{"type": "user_prompt"}])
+    writer.flush()
+    assert store.appends[0][0] == 1 and store.appends[-1][1] is True  # fsynced by the flush
+
+    broken = _RecordingStore("broken", error=OSError("disk full"))
+    with pytest.raises(OSError, match="disk full"):
+        writer.submit(broken, [{"type": "user_prompt"}], sync=True)
+    writer.submit(store, [], sync=True)  # other stores' waiters are unaffected
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
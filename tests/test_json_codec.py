@@ -0,0 +1,37 @@
+"""Tests for the JSON codec wrapper used on the ACP, history and Socket.IO paths."""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.services import json_codec
+
+
+def test_round_trip_matches_stdlib():
+    obj = {"text": "héllo 完成 \"quoted\" </script>", "n": [1, 2.5, None, True], "nested": {"a": {}}}
+    assert json_codec.loads(json_codec.dumps(obj)) == obj
+    assert json_codec.loads(json_codec.dumps_bytes(obj)) == obj
+    assert json.loads(json_codec.dumps(obj, indent=2)) == obj
+    assert json_codec.dumps(obj, indent=2).startswith("{\n  ")
+
+
+def test_falls_back_for_unsupported_values_and_kwargs():
+    big = {"id": 2 ** 70}
+    assert json_codec.loads(json_codec.dumps_bytes(big)) == big
+    assert json_codec.dumps({"b": 1, "a": 2}, sort_keys=True) == '{"a": 2, "b": 1}'
+    assert json_codec.dumps({"a": [1, 2]}, separators=(", ", " = ")) == '{"a" = [1, 2]}'
+    assert json_codec.dumps({1: "x"}) in ('{"1": "x"}', '{"1":"x"}')
+
+
+def test_loads_rejects_bad_input_with_value_error():
+    try:
+        json_codec.loads(b'{"unterminated": ')
+    except ValueError:
+        return
+    raise AssertionError("expected ValueError")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,79 @@
+"""Tests for the MCP servers' session lookup: env var first, then the registry by ancestor PID."""
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "mcp_servers"))
+
+import _mcp_common
+import src.services.session_catalog as session_catalog
+
+
+@pytest.fixture
+def lookup(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        monkeypatch.setattr(session_catalog, "DB_PATH", os.path.join(tmp, "catalog.db"))
+        monkeypatch.setattr(session_catalog, "LEGACY_SESSIONS_FILE", os.path.join(tmp, "chat_sessions.json"))
+        monkeypatch.setattr(session_catalog, "LEGACY_ARCHIVED_FILE", os.path.join(tmp, "chat_sessions_archived.json"))
+        monkeypatch.setattr(session_catalog, "_conn", None)
+        monkeypatch.setattr(_mcp_common, "_my_session_id", None)
+        monkeypatch.delenv(session_catalog.SESSION_ENV, raising=False)
+        yield
+        if session_catalog._conn is not None:
+            session_catalog._conn.close()
+
+
+def test_parent_pid_reads_proc_stat(monkeypatch):
+    child = subprocess.Popen(["sleep", "5"])
+    try:
+        assert _mcp_common._parent_pid(child.pid) == os.getpid()
+    finally:
+        child.kill()
+        child.wait()
+    assert _mcp_common._parent_pid(2 ** 22 + 1) is None  # above pid_max: no such process
+
+    class _Stat:
+        def __init__(self, *args):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def read(self):
+            return b"1234 (odd) name (x) S 77 1234 1234 0 -1"
+
+    monkeypatch.setattr(_mcp_common, "open", _Stat, raising=False)
+    assert _mcp_common._parent_pid(1234) == 77  # comm with spaces and parens
+
+
+def test_find_my_session_id_prefers_env(lookup, monkeypatch):
+    monkeypatch.setenv(session_catalog.SESSION_ENV, "from-env")
+    session_catalog.replace_pids({os.getppid(): "from-registry"})
+    assert _mcp_common.find_my_session_id() == "from-env"
+
+
+def test_find_my_session_id_walks_ancestors_and_caches_hits_only(lookup, monkeypatch):
+    # the walk starts at an unregistered PID (the child) and reaches its parent, this process
+    child = subprocess.Popen(["sleep", "5"])
+    try:
+        monkeypatch.setattr(_mcp_common.os, "getppid", lambda: child.pid)
+        assert _mcp_common.find_my_session_id() is None  # warm process, not claimed yet
+        session_catalog.replace_pids({os.getpid(): "claimed"})
+        assert _mcp_common.find_my_session_id() == "claimed"
+        session_catalog.replace_pids({})
+        assert _mcp_common.find_my_session_id() == "claimed"
+    finally:
+        child.kill()
+        child.wait()
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
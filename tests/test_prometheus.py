@@ -0,0 +1,36 @@
+"""Tests for the /metrics Prometheus exposition."""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import src.services.prometheus as prometheus
+
+
+def test_histogram_buckets_are_cumulative():
+    hist = prometheus.Histogram(buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 0.7, 3.0):
+        hist.observe("notes", seconds)
+    samples = {(suffix, labels.get("le")): value for suffix, labels, value in hist.samples("upstream")}
+    assert samples[("_bucket", "0.1")] == 1
+    assert samples[("_bucket", "1.0")] == 3
+    assert samples[("_bucket", "+Inf")] == 4 == samples[("_count", None)]
+    assert abs(samples[("_sum", None)] - 4.25) < 1e-9
+
+
+def test_render_formats_families_and_isolates_failing_sections(monkeypatch):
+    def broken(w):
+        raise RuntimeError("service down")
+
+    monkeypatch.setattr(prometheus, "_pty", broken)
+    prometheus.socketio_emits.inc('say "hi"')
+    text = prometheus.render()
+    assert "# TYPE fernando_acp_sessions gauge" in text
+    assert 'fernando_socketio_emits_total{event="say \\"hi\\""} 1' in text
+    assert "fernando_pty_sessions" not in text
+    assert text.endswith("fernando_metrics_section_errors 1\n")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-v"]))
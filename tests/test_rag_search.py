@@ -0,0 +1,360 @@
+"""Tests for the lexical index, hybrid (RRF) search fusion and the embedding cache."""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import src.services.embedding_cache as embedding_cache
+import src.services.history_store as history_store
+import src.services.lexical_index as lexical_index
+import src.services.rag as rag
+import src.services.rag_reindex as rag_reindex
+
+
+@pytest.fixture
+def lexical_db(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        monkeypatch.setattr(lexical_index, "DB_PATH", os.path.join(tmp, "lexical.db"))
+        monkeypatch.setattr(lexical_index, "_conn", None)
+        yield
+        if lexical_index._conn is not None:
+            lexical_index._conn.close()
+            lexical_index._conn = None
+
+
+def _wait(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def _add(session_id, turn_index, text, **extra):
+    meta = {"session_id": session_id, "session_name": f"name {session_id}", "turn_index": turn_index, **extra}
+    lexical_index.upsert([f"{session_id}_{turn_index}_0"], [text], [meta])
+
+
+def test_lexical_matches_identifiers(lexical_db):
+    _add("a", 0, "User: the deploy failed with E_ACCESS_DENIED on bucket logs")
+    _add("a", 1, "User: access was denied, see JIRA-1234")
+    _add("b", 0, "User: edit src/services/rag.py to add search")
+    assert [h["id"] for h in lexical_index.search("E_ACCESS_DENIED")] == ["a_0_0"]
+    assert [h["id"] for h in lexical_index.search("jira-1234")] == ["a_1_0"]
+    assert [h["id"] for h in lexical_index.search("rag.py")] == ["b_0_0"]
+    assert lexical_index.search('"unbalanced AND (') == []
+
+
+def test_lexical_delete_rename_and_upsert(lexical_db):
+    for turn in range(3):
+        _add("a", turn, f"turn {turn} about widgets")
+    lexical_index.delete("a", min_turn=1)
+    assert [h["turn_index"] for h in lexical_index.search("widgets")] == [0]
+    _add("a", 0, "turn 0 now about gadgets")
+    assert lexical_index.search("widgets") == []
+    lexical_index.rename("a", "renamed")
+    assert lexical_index.search("gadgets")[0]["session_name"] == "renamed"
+    lexical_index.delete("a")
+    assert lexical_index.count() == 0
+
+
+def test_lexical_filters(lexical_db):
+    _add("a", 0, "deploy broke", ts=100.0, model="m1")
+    _add("a", 1, "deploy fixed", ts=200.0, model="m2")
+    _add("b", 0, "deploy again", ts=300.0, model="m1")
+    _add("c", 0, "deploy legacy")  # indexed before ts/model were recorded
+    ids = lambda **f: sorted(h["id"] for h in lexical_index.search("deploy", 10, **f))
+    assert ids(session_ids=["a"]) == ["a_0_0", "a_1_0"]
+    assert ids(since=150, until=300) == ["a_1_0"]
+    assert ids(model="m1") == ["a_0_0", "b_0_0"]
+    assert ids(session_ids=["b", "c"], since=0) == ["b_0_0"]
+    assert rag.search("deploy", session_ids=[]) == []
+    assert rag._where(session_ids=["a"], since=1) == {"$and": [{"session_id": {"$in": ["a"]}}, {"ts": {"$gte": 1}}]}
+    assert rag._where() is None
+
+
+def test_hybrid_fuses_both_rankers(lexical_db, monkeypatch):
+    _add("a", 0, "User: error E_QUOTA when uploading")
+    _add("b", 0, "User: upload keeps failing")
+    vector_hits = [
+        {"id": "b_0_0", "session_id": "b", "session_name": "", "turn_index": 0, "document": "b", "distance": 0.2},
+        {"id": "a_0_0", "session_id": "a", "session_name": "", "turn_index": 0, "document": "a", "distance": 0.4},
+    ]
+    monkeypatch.setattr(rag, "_vector_search", lambda query, limit, **filters: vector_hits[:limit])
+    hits = rag.search("E_QUOTA", limit=2)
+    assert hits[0]["session_id"] == "a"
+    assert hits[0]["lexical_rank"] == 1 and hits[0]["vector_distance"] == 0.4
+    assert [h["session_id"] for h in rag.search("E_QUOTA", limit=2, mode="vector")] == ["b", "a"]
+    assert [h["session_id"] for h in rag.search("E_QUOTA", limit=2, mode="lexical")] == ["a"]
+    with pytest.raises(ValueError):
+        rag.search("x", mode="fuzzy")
+
+
+def test_snippet_centers_on_match_with_offsets():
+    document = "intro " * 200 + "the E_QUOTA error again " + "outro " * 100
+    snippet, start, matches = rag._snippet(document, rag._query_terms("what is E_QUOTA"))
+    assert start > 0 and len(snippet) == rag.SNIPPET_CHARS
+    assert [snippet[a:b] for a, b in matches] == ["E_QUOTA"]
+    assert rag._snippet("short doc", {"missing"}) == ("short doc", 0, [])
+
+
+def test_search_context_turns(lexical_db, monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        monkeypatch.setattr(history_store, "HISTORY_DIR", tmp)
+        monkeypatch.setattr(history_store, "_stores", {})
+        events = []
+        for t in range(6):
+            events.append({"type": "user_prompt", "text": f"question {t}"})
+            events.append({"id": t, "result": {"stopReason": "end_turn"}})
+        history_store.get_store("a").append(events)
+        _add("a", 3, "User: question 3 about widgets")
+        hits = rag.search("widgets", mode="lexical", context_turns=1)
+        assert [t["turn_index"] for t in hits[0]["context"]] == [2, 3, 4]
+        assert hits[0]["context"][1]["user"] == "question 3"
+        assert "context" not in rag.search("widgets", mode="lexical")[0]
+
+
+# --- Chunking ---
+
+def test_chunker_keeps_sentences_and_code_fences():
+    prose = " ".join(f"Sentence {i} explains one more detail of the change." for i in range(40))
+    code = "```python\n" + "\n".join(f"value_{i} = compute({i})" for i in range(10)) + "\n```"
+    text = f"Assistant: {prose}\n\n{code}\n\n{prose}"
+    chunks = rag._chunk_text(text)
+    assert len(chunks) > 1
+    assert all(n <= rag.CHUNK_TOKENS for n in rag._count_tokens(chunks))
+    assert sum(code in c for c in chunks) == 1
+    assert all(c.endswith((".", "```")) for c in chunks)
+    assert chunks[0].startswith("Assistant:") and chunks[-1].endswith("detail of the change.")
+    assert rag._chunk_text("short turn") == ["short turn"]
+
+
+def test_chunker_cuts_words_longer_than_the_budget():
+    blob = "a" * 3000
+    code = "```\nshort()\n" + "x = '" + "f0" * 1500 + "'\n```"
+    for text in (blob, f"Assistant: see {blob} for details.", f"Intro.\n\n{code}"):
+        chunks = rag._chunk_text(text)
+        assert len(chunks) > 1
+        assert all(n <= rag.CHUNK_TOKENS for n in rag._count_tokens(chunks))
+    assert "".join(rag._chunk_text(blob)) == blob
+
+
+# --- Incremental session indexing ---
+
+class _FakeCollection:
+    """The slice of the Chroma collection API that index_session uses."""
+
+    def __init__(self):
+        self.rows = {}  # id -> (document, metadata)
+        self.upserted = []  # ids of every upsert call, in order
+
+    @staticmethod
+    def _match(meta, where):
+        if "$and" in where:
+            return all(_FakeCollection._match(meta, w) for w in where["$and"])
+        (key, cond), = where.items()
+        if isinstance(cond, dict):
+            return meta.get(key, -1) >= cond["$gte"]
+        return meta.get(key) == cond
+
+    def get(self, where, include=()):
+        ids = [i for i, (_, m) in self.rows.items() if self._match(m, where)]
+        return {"ids": ids, "metadatas": [self.rows[i][1] for i in ids]}
+
+    def update(self, ids, metadatas):
+        for i, m in zip(ids, metadatas):
+            self.rows[i] = (self.rows[i][0], m)
+
+    def delete(self, where):
+        for i in self.get(where)["ids"]:
+            del self.rows[i]
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        self.upserted.append(list(ids))
+        self.rows.update(zip(ids, zip(documents, metadatas)))
+
+
+@pytest.fixture
+def fake_index(lexical_db, monkeypatch):
+    collection = _FakeCollection()
+    with tempfile.TemporaryDirectory() as tmp:
+        monkeypatch.setattr(rag, "INDEX_STATE_FILE", os.path.join(tmp, "state.json"))
+        monkeypatch.setattr(rag, "_get_collection", lambda: collection)
+        monkeypatch.setattr(rag, "_embed", lambda docs: [[0.0] for _ in docs])
+        yield collection
+
+
+def _history(*turns):
+    events = []
+    for user, answer in turns:
+        events += [{"type": "user_prompt", "text": user, "ts": 1},
+                   {"method": "session/update", "params": {"update": {
+                       "sessionUpdate": "agent_message_chunk", "content": {"type": "text", "text": answer}}}},
+                   {"result": {"stopReason": "end_turn"}}]
+    return events
+
+
+def test_index_session_skips_unchanged_and_adds_new_turns(fake_index):
+    history = _history(("q0", "zero"), ("q1", "one"))
+    rag.index_session("s", "chat", history)
+    assert sorted(fake_index.rows) == ["s_0_0", "s_1_0"]
+    assert rag.index_resume_turn("s") == 1
+
+    fake_index.upserted.clear()
+    first = rag.index_resume_turn("s")
+    rag.index_session("s", "chat", history_store.coalesce_text_chunks(history)[3 * first:], first_turn=first)
+    assert fake_index.upserted == []  # unchanged tail: nothing re-embedded
+
+    history += _history(("q2", "two"))
+    first = rag.index_resume_turn("s")
+    rag.index_session("s", "chat", history[3 * first:], first_turn=first)
+    assert fake_index.upserted == [["s_2_0"]]
+    assert sorted(fake_index.rows) == ["s_0_0", "s_1_0", "s_2_0"]
+    assert rag.index_resume_turn("s") == 2
+
+
+def test_index_session_reembeds_an_extended_last_turn(fake_index):
+    rag.index_session("s", "chat", _history(("q0", "zero"), ("q1", "partial")))
+    extended = _history(("q0", "zero"), ("q1", "partial answer, now finished"))
+    first = rag.index_resume_turn("s")
+    fake_index.upserted.clear()
+    rag.index_session("s", "chat", extended[3 * first:], first_turn=first)
+    assert fake_index.upserted == [["s_1_0"]]
+    assert "now finished" in fake_index.rows["s_1_0"][0]
+    assert [h["session_id"] for h in lexical_index.search("finished", 5)] == ["s"]
+    assert lexical_index.search("partial", 5)[0]["document"].endswith("now finished")
+
+
+def test_index_session_replaces_legacy_chunks_of_an_unindexed_session(fake_index):
+    for sid in ("s", "other"):
+        legacy = {"session_id": sid, "session_name": "chat"}
+        fake_index.rows[f"{sid}_chunk_0"] = ("legacy fixed-size chunk", legacy)
+        lexical_index.upsert([f"{sid}_chunk_0"], ["legacy fixed-size chunk"], [legacy])
+    rag.index_session("s", "chat", _history(("q0", "zero")))
+    assert sorted(fake_index.rows) == ["other_chunk_0", "s_0_0"]
+    assert [h["session_id"] for h in lexical_index.search("legacy", 5)] == ["other"]
+
+
+# --- Indexer queue ---
+
+def test_index_queue_coalesces_and_drains():
+    queue = rag.IndexQueue(workers=1, max_pending=2)
+    gate, ran = threading.Event(), []
+    queue.schedule("busy", lambda: gate.wait(5) and ran.append("busy-1"))
+    assert _wait(lambda: queue.stats()["running"] == 1)
+    assert queue.schedule("busy", lambda: ran.append("busy-stale"))
+    assert queue.schedule("busy", lambda: ran.append("busy-2"))  # replaces the stale re-run
+    assert queue.schedule("other", lambda: ran.append("other-stale"))
+    assert queue.schedule("other", lambda: ran.append("other"))  # replaces the pending job
+    assert queue.schedule("third", lambda: ran.append("third"))
+    assert not queue.schedule("fourth", lambda: ran.append("fourth"))  # pending is full: shed
+    assert queue.queue_depth() == 2
+    gate.set()
+    assert queue.drain(timeout=5)
+    assert ran == ["busy-1", "other", "third", "busy-2"]
+    stats = queue.stats()
+    assert (stats["coalesced"], stats["dropped"], stats["completed"]) == (2, 1, 4)
+    queue.shutdown(timeout=5)
+
+
+def test_index_queue_shutdown_finishes_queued_jobs():
+    queue = rag.IndexQueue(workers=2)
+    gate, ran = threading.Event(), []
+    for name in ("a", "b", "c"):
+        queue.schedule(name, lambda name=name: gate.wait(5) and ran.append(name))
+    gate.set()
+    assert queue.shutdown(timeout=5)
+    assert sorted(ran) == ["a", "b", "c"]
+    assert not queue.schedule("late", lambda: ran.append("late"))
+    assert queue.drain(timeout=0) and "late" not in ran
+
+
+# --- Bulk reindex ---
+
+class _FakeClient:
+    def __init__(self):
+        self.collections = {}
+
+    def create_collection(self, name, embedding_function=None):
+        collection = self.collections[name] = _FakeCollection()
+        return collection
+
+    def delete_collection(self, name):
+        self.collections.pop(name, None)
+
+
+def test_reindex_stages_lexical_rows_and_holds_live_indexing(lexical_db, monkeypatch):
+    client = _FakeClient()
+    with tempfile.TemporaryDirectory() as tmp:
+        history_dir = os.path.join(tmp, "chat_history")
+        monkeypatch.setattr(history_store, "HISTORY_DIR", history_dir)
+        monkeypatch.setattr(history_store, "_stores", {})
+        monkeypatch.setattr(rag, "HISTORY_DIR", history_dir)
+        for name in ("INDEX_STATE_FILE", "ACTIVE_COLLECTION_FILE", "REINDEX_LOCK_FILE"):
+            monkeypatch.setattr(rag, name, os.path.join(tmp, name.lower()))
+        monkeypatch.setattr(rag, "REINDEX_POLL_SECONDS", 0.01)
+        monkeypatch.setattr(rag, "_get_client", lambda: client)
+        monkeypatch.setattr(rag, "_embed_fn", lambda docs: [[0.0] for _ in docs])
+        monkeypatch.setattr(rag, "embed_namespace", lambda: "test")
+        monkeypatch.setattr(embedding_cache.cache, "embed", lambda docs, fn, namespace: fn(docs))
+        monkeypatch.setattr(rag_reindex, "_session_names", lambda: {})
+        for sid in ("s1", "s2", "gone"):
+            history_store.get_store(sid).append(_history((f"question {sid}", f"answer {sid}")))
+        _add("stale", 0, "left over from the old index")
+
+        queue = rag.IndexQueue()
+        ran = []
+        seen = []
+
+        def progress(stats):
+            if not seen:
+                queue.schedule("s1", lambda: ran.append("s1"))
+                history_store.delete_history("gone")
+            # the live index is untouched and background jobs wait until the swap
+            seen.append((rag.reindex_in_progress(), lexical_index.count(), list(ran)))
+
+        stats = rag_reindex.reindex_all(workers=1, batch_size=1, progress=progress)
+
+        assert seen and all(entry == (True, 1, []) for entry in seen)
+        assert stats["chunks"] == 3 and not rag.reindex_in_progress()
+        assert rag.active_collection_name() == stats["collection"]
+        assert {m["session_id"] for _, m in client.collections[stats["collection"]].rows.values()} == {"s1", "s2"}
+        assert sorted(rag._load_index_state()) == ["s1", "s2"]
+        assert sorted(h["session_id"] for h in lexical_index.search("question", limit=10)) == ["s1", "s2"]
+        assert not lexical_index.search("left over")
+        assert queue.drain(timeout=5) and ran == ["s1"]
+        queue.shutdown(timeout=5)
+
+
+# --- Embedding cache ---
+
+def test_embedding_cache_reuses_and_evicts():
+    calls = []
+
+    def embed_fn(docs):
+        calls.append(list(docs))
+        return [[float(len(d)), 1.0] for d in docs]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = embedding_cache.EmbeddingCache(os.path.join(tmp, "emb.db"), max_entries=4)
+        assert cache.embed(["aa", "b", "aa"], embed_fn) == [[2.0, 1.0], [1.0, 1.0], [2.0, 1.0]]
+        assert calls == [["aa", "b"]]
+        assert cache.embed(["b", "ccc"], embed_fn) == [[1.0, 1.0], [3.0, 1.0]]
+        assert calls[-1] == ["ccc"]
+        assert cache.embed(["b"], embed_fn, namespace="other-model") == [[1.0, 1.0]]
+        assert calls[-1] == ["b"]
+        cache.embed(["dddd", "eeeee"], embed_fn)
+        assert cache.stats()["entries"] <= 4 and cache.evictions
+        n = len(calls)
+        cache.embed(["eeeee", "dddd"], embed_fn)
+        assert len(calls) == n  # most recently used entries survive eviction
+        cache.embed(["aa"], embed_fn)
+        assert calls[-1] == ["aa"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,109 @@
+"""Tests for the ACP chat Socket.IO handlers: subscribe replay and history paging."""
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pytest
+import src.routes.websocket as websocket
+import src.services.acp as acp
+import src.services.history_store as history_store
+
+
+def _chunk(text):
+    return {"method": "session/update", "params": {"update": {
+        "sessionUpdate": "agent_message_chunk", "content": {"type": "text", "text": text}}}}
+
+
+def _turns(n):
+    events = []
+    for t in range(n):
+        events += [{"type": "user_prompt", "text": f"q{t}", "ts": t}, _chunk(f"a{t} "), _chunk("more"),
+                   {"id": t, "result": {"stopReason": "end_turn"}}]
+    return events
+
+
+class _FakeSocketIO:
+    """Collects the handlers register_handlers defines, so tests can call them directly."""
+
+    def __init__(self):
+        self.handlers = {}
+
+    def on(self, event):
+        def decorator(fn):
+            self.handlers[event] = fn
+            return fn
+        return decorator
+
+    def emit(self, *args, **kwargs):
+        pass
+
+
+@pytest.fixture
+def handlers(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        monkeypatch.setattr(history_store, "HISTORY_DIR", tmp)
+        monkeypatch.setattr(history_store, "_stores", {})
+        monkeypatch.setattr(acp.rag.indexer, "schedule", lambda *a: True)
+        monkeypatch.setattr(acp.acp_manager, "sessions", {})
+        monkeypatch.setattr(acp.acp_manager, "restore_sessions", lambda factory: None)
+        monkeypatch.setattr(acp.acp_manager, "hydrate", lambda session_id: False)
+        monkeypatch.setattr(acp.acp_manager.warm_pool, "start", lambda: None)
+        monkeypatch.setattr(acp.acp_manager, "start_idle_monitor", lambda: None)
+        monkeypatch.setattr(websocket, "csrf_tokens", {"sid1": "token"})
+        monkeypatch.setattr(websocket, "request", SimpleNamespace(sid="sid1", args={}))
+        sent = []
+        monkeypatch.setattr(websocket, "emit", lambda event, data=None, **kw: sent.append((event, data)))
+        socketio = _FakeSocketIO()
+        websocket.register_handlers(socketio)
+        socketio.handlers["sent"] = sent
+        yield socketio.handlers
+
+
+def _received(handlers, name):
+    return [data for event, data in handlers["sent"] if event == name]
+
+
+def _add_session(session_id, events, dormant=False):
+    session = acp.ACPSession(session_id)
+    session.history = list(events)
+    session._save_history(index_rag=True)
+    history_store.writer.flush()
+    if dormant:
+        session.history, session.dormant = [], True
+    acp.acp_manager.sessions[session_id] = session
+    return session
+
+
+def test_history_size_matches_windowed_batch(handlers):
+    _add_session("win", _turns(10))
+    handlers["acp_subscribe"]({"csrf_token": "token", "session_id": "win", "history_offset": 0, "window_turns": 3})
+    (size,) = _received(handlers, "acp_history_size")
+    (batch,) = _received(handlers, "acp_history_batch")
+    assert batch["first_turn"] == 7 and len(batch["events"]) == 9
+    assert size["count"] == len(batch["events"])
+
+
+def test_history_page_of_dormant_session_reads_disk(handlers):
+    _add_session("sleepy", _turns(6), dormant=True)
+    handlers["acp_history_page"]({"csrf_token": "token", "session_id": "sleepy", "before_turn": 4, "window_turns": 2})
+    (page,) = _received(handlers, "acp_history_page")
+    assert page["first_turn"] == 2
+    assert [e["text"] for e in page["events"] if e.get("type") == "user_prompt"] == ["q2", "q3"]
+
+
+def test_reconnect_to_dormant_session_replays_from_disk(handlers):
+    live = _add_session("nap", _turns(3))
+    seen = history_store.CollapsedHistory().length(_turns(2))  # the client saw the first two turns
+    full_length = live.history_length()
+    live.suspend()
+    handlers["acp_subscribe"]({"csrf_token": "token", "session_id": "nap", "history_offset": seen})
+    (batch,) = _received(handlers, "acp_history_batch")
+    assert batch["history_length"] == full_length
+    assert [e["text"] for e in batch["events"] if e.get("type") == "user_prompt"] == ["q2"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))